@@ -0,0 +1,99 @@
+#   See the NOTICE file distributed with this work for additional information
+#   regarding copyright ownership.
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+"""
+Load benchmark of the tables listing endpoint: synchronous ListTables served by one sync worker
+(optionally with --threads, as gunicorn gthread workers) vs the asynchronous list_tables view served
+by one event loop.
+
+MySQL is replaced by a stand-in answering information_schema lookups after --latency seconds, every
+request targeting a different database so that nothing is served from the catalog cache.
+
+    PYTHONPATH=src python benchmarks/bench_async_introspection.py [--requests 200] [--latency 0.05]
+"""
+import argparse
+import asyncio
+import time
+from concurrent import futures
+from unittest import mock
+
+import django
+from django.conf import settings
+
+settings.configure(
+    INSTALLED_APPS=['dal', 'dal_select2', 'django.contrib.contenttypes', 'django.contrib.auth', 'rest_framework',
+                    'ensembl.production.dbcopy'],
+    DATABASES={'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': ':memory:'}},
+)
+django.setup()
+
+from django.test import RequestFactory  # noqa: E402
+
+from ensembl.production.dbcopy import catalog  # noqa: E402
+from ensembl.production.dbcopy.api.async_views import list_tables  # noqa: E402
+from ensembl.production.dbcopy.api.views import ListTables  # noqa: E402
+
+
+def stand_in_mysql(latency):
+    def load_table_names(hostname, port, database, user):
+        time.sleep(latency)
+        return ['assembly', 'meta', 'meta_coord', database]
+
+    return mock.patch.object(catalog, '_load_table_names', side_effect=load_table_names)
+
+
+def make_requests(count):
+    factory = RequestFactory()
+    return [(factory.get('/tables', {'search': 'meta'}), {'host': 'mysql-stand-in', 'port': '3306',
+                                                            'database': 'db_%d' % i}) for i in range(count)]
+
+
+def run_sync(count, threads):
+    view = ListTables.as_view()
+    requests = make_requests(count)
+    started = time.perf_counter()
+    with futures.ThreadPoolExecutor(max_workers=threads) as executor:
+        responses = list(executor.map(lambda request: view(request[0], **request[1]), requests))
+    assert all(response.status_code == 200 for response in responses)
+    return time.perf_counter() - started
+
+
+def run_async(count):
+    requests = make_requests(count)
+
+    async def main():
+        return await asyncio.gather(*(list_tables(request, **kwargs) for request, kwargs in requests))
+
+    started = time.perf_counter()
+    responses = asyncio.run(main())
+    assert all(response.status_code == 200 for response in responses)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200, help='concurrent lookups')
+    parser.add_argument('--latency', type=float, default=0.05, help='stand-in MySQL latency (s)')
+    parser.add_argument('--threads', type=int, default=1, help='sync worker threads')
+    args = parser.parse_args()
+    with stand_in_mysql(args.latency):
+        catalog.catalog.invalidate()
+        sync_elapsed = run_sync(args.requests, args.threads)
+        catalog.catalog.invalidate()
+        async_elapsed = run_async(args.requests)
+    print('%-28s %10s %12s' % ('worker', 'elapsed(s)', 'requests/s'))
+    for label, elapsed in (('sync (%d thread(s))' % args.threads, sync_elapsed), ('async', async_elapsed)):
+        print('%-28s %10.2f %12.1f' % (label, elapsed, args.requests / elapsed))
+    print('speedup x%.1f' % (sync_elapsed / async_elapsed))
+
+
+if __name__ == '__main__':
+    main()
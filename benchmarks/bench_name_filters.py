@@ -0,0 +1,74 @@
+#   See the NOTICE file distributed with this work for additional information
+#   regarding copyright ownership.
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+"""
+Micro-benchmark of databases names filtering over a synthetic server content.
+
+Compares the previous path (`%` translated to `.*` then ensembl.production.core.db_introspects filtering)
+with ensembl.production.dbcopy.patterns.NamePatterns.
+
+    PYTHONPATH=src python benchmarks/bench_name_filters.py [--names 10000] [--repeat 200]
+"""
+import argparse
+import itertools
+import timeit
+
+from ensembl.production.core.db_introspects import _apply_filters
+
+from ensembl.production.dbcopy.patterns import NamePatterns
+
+SCENARIOS = {
+    'prefix': (['homo_sapiens%'], []),
+    'patterns': (['%_core_%', '%_variation_%', 'mus_musculus%'], ['%_mart_%', 'information_schema']),
+    'names': (['species_42_core_99_1', 'species_1337_funcgen_98_1', 'unknown_db'], []),
+    'skip only': ([], ['information_schema', 'mysql', 'performance_schema', 'sys', '%_mart_%']),
+}
+
+
+def make_names(count):
+    groups = ('core', 'variation', 'funcgen', 'otherfeatures', 'rnaseq', 'mart')
+    species = itertools.chain(['homo_sapiens', 'mus_musculus'], ('species_%d' % i for i in itertools.count()))
+    names = ['information_schema', 'mysql', 'performance_schema', 'sys']
+    for name in species:
+        for group, release in itertools.product(groups, (98, 99)):
+            names.append('%s_%s_%d_1' % (name, group, release))
+            if len(names) >= count:
+                return names
+
+
+def legacy(names, incl, skip):
+    return _apply_filters(names, [p.replace('%', '.*') for p in incl], [p.replace('%', '.*') for p in skip])
+
+
+def compiled(names, incl, skip):
+    return NamePatterns(incl, skip).filter(names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--names', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+    names = make_names(args.names)
+    print("%d names, best of 5 x %d runs (ms per call)" % (len(names), args.repeat))
+    print("%-12s %10s %10s %10s %8s" % ('scenario', 'legacy', 'compiled', 'reused', 'speedup'))
+    for scenario, (incl, skip) in SCENARIOS.items():
+        assert legacy(names, incl, skip) == compiled(names, incl, skip), scenario
+        patterns = NamePatterns(incl, skip)
+        timings = [min(timeit.repeat(call, number=args.repeat, repeat=5)) / args.repeat * 1000
+                   for call in (lambda: legacy(names, incl, skip),
+                                lambda: compiled(names, incl, skip),
+                                lambda: patterns.filter(names))]
+        print("%-12s %10.3f %10.3f %10.3f %7.1fx" % (scenario, *timings, timings[0] / timings[1]))
+
+
+if __name__ == '__main__':
+    main()
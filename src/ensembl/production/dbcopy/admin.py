@@ -11,15 +11,17 @@
 #   limitations under the License.
 from django.contrib import admin, messages
 from django.contrib.admin.utils import model_ngettext
-from django.core.exceptions import ValidationError
-from django.db.models import F, Q, Count
+from django.db.models import F, Q
 from django.db.models.query import QuerySet
+from django.template.defaultfilters import filesizeformat
 from django.utils.html import format_html
 from django_admin_inline_paginator.admin import TabularInlinePaginated
 
+from ensembl.production.dbcopy.counters import TryProgress
 from ensembl.production.dbcopy.filters import DBCopyUserFilter, OverallStatusFilter
 from ensembl.production.dbcopy.forms import RequestJobForm, GroupInlineForm
 from ensembl.production.dbcopy.models import Host, RequestJob, HostGroup, TargetHostGroup, TransferLog
+from ensembl.production.dbcopy.validation import ValidationContext
 from ensembl.production.djcore.admin import SuperUserAdmin
 
 
@@ -148,7 +150,8 @@ class RequestJobAdmin(admin.ModelAdmin):
               'src_incl_db', 'src_skip_db', 'src_incl_tables', 'src_skip_tables', 'tgt_db_name',
               'skip_optimize', 'wipe_target', 'convert_innodb', 'dry_run']
     readonly_fields = ['global_status', 'request_date', 'start_date', 'end_date', 'completion',
-                       'skip_optimize', 'wipe_target', 'convert_innodb', 'dry_run']
+                       'skip_optimize', 'wipe_target', 'convert_innodb', 'dry_run', 'estimated_tables',
+                       'estimated_size']
 
     def has_view_permission(self, request, obj=None):
         return request.user.is_staff
@@ -198,9 +201,15 @@ class RequestJobAdmin(admin.ModelAdmin):
         Bulk resubmit jobs as they were initially.
         :return: None
         """
+        context = ValidationContext()
         for query in queryset:
             new_job = RequestJob.objects.get(pk=query.pk)
             new_job.pk = None
+            new_job._state.adding = True
+            new_job.expected = None
+            new_job.completed = None
+            for field in TryProgress._fields:
+                setattr(new_job, field, None)
             new_job.request_date = None
             new_job.start_date = None
             new_job.end_date = None
@@ -208,24 +217,12 @@ class RequestJobAdmin(admin.ModelAdmin):
             if not new_job.email_list:
                 new_job.email_list = request.user.email
             new_job.status = None
-            new_job.save()
+            new_job.save(context=context)
             message = 'Job {} resubmitted [new job_id {}]'.format(query.pk, new_job.pk)
             messages.add_message(request, messages.SUCCESS, message, extra_tags='', fail_silently=False)
 
     resubmit_jobs.short_description = 'Resubmit Jobs'
 
-    def get_object(self, request, object_id, from_field=None):
-        queryset = self.get_queryset(request)
-        try:
-            # only annotate query when retrieving a single object.
-            obj = queryset.annotate(
-                __nb_transfers=Count('transfer_logs'),
-                __running_transfers=Count('transfer_logs',
-                                          filter=Q(end_date__isnull=True))).get(**{'job_id': object_id})
-            return obj
-        except (queryset.model.DoesNotExist, ValidationError, ValueError):
-            return None
-
     def change_view(self, request, object_id, form_url='', extra_context=None):
         extra_context = extra_context or {}
         for field in self.readonly_fields:
@@ -290,6 +287,12 @@ class RequestJobAdmin(admin.ModelAdmin):
         if self._is_deletable(obj):
             super().log_deletion(request, obj, obj_display)
 
+    @staticmethod
+    def estimated_size(obj):
+        if obj and obj.estimated_bytes is not None:
+            return '{} ({:,} rows)'.format(filesizeformat(obj.estimated_bytes), obj.estimated_rows or 0)
+        return '-'
+
     @staticmethod
     def global_status(obj):
         if obj:
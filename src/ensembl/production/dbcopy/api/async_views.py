@@ -0,0 +1,121 @@
+#   See the NOTICE file distributed with this work for additional information
+#   regarding copyright ownership.
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+"""
+Asynchronous counterparts of the introspection endpoints, and the job events long-poll, for deployments served
+through ASGI (see ensembl_prodinf_dbcopy.asgi).
+
+Django ORM lookups run through sync_to_async, remote introspection in the dedicated introspection
+thread pool (see ensembl.production.dbcopy.utils.run_introspection), so a slow MySQL host only holds
+a pool thread and never the event loop.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotAllowed, JsonResponse
+from django.utils.http import http_date
+from rest_framework import status
+
+from ensembl.production.dbcopy.api.views import list_database_names, list_table_names, table_filters
+from ensembl.production.dbcopy.counters import ENDED_STATUSES
+from ensembl.production.dbcopy.models import Dbs2Exclude, Host
+from ensembl.production.dbcopy.progress import job_progress, job_snapshot, wait_job_version
+from ensembl.production.dbcopy.utils import run_introspection
+
+
+def _response(data, status_code=status.HTTP_200_OK):
+    return JsonResponse(data, status=status_code, safe=False)
+
+
+def _async_api_view(view):
+    # django.views.decorators don't support coroutines before Django 4.1
+    view.csrf_exempt = True
+    return view
+
+
+@_async_api_view
+async def list_databases(request, host, port):
+    """
+    Return a list of all schema names, see ListDatabases
+    """
+    if request.method not in ('GET', 'POST'):
+        return HttpResponseNotAllowed(['GET', 'POST'])
+    search = request.GET.get('search', '')
+    name_matches = set(request.GET.getlist('matches[]')).difference({''})
+    limit = request.GET.get('limit')
+    if limit is not None and not limit.isdigit():
+        return _response("limit should be a positive integer", status.HTTP_400_BAD_REQUEST)
+    limit = int(limit) if limit else None
+    try:
+        srv_host = await sync_to_async(Host.objects.get)(name=host, port=port)
+        exclude = await sync_to_async(Dbs2Exclude.objects.excluded_schemas)()
+        result = await run_introspection(list_database_names, host, port, srv_host.mysql_user, search,
+                                         name_matches, limit, exclude=exclude)
+    except ValueError as e:
+        return _response(str(e), status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return _response(str(e), status.HTTP_400_BAD_REQUEST)
+    return _response(result)
+
+
+@_async_api_view
+async def list_tables(request, host, port, database):
+    """
+    Return a list of tables, see ListTables
+    """
+    if request.method not in ('GET', 'POST'):
+        return HttpResponseNotAllowed(['GET', 'POST'])
+    try:
+        result = await run_introspection(list_table_names, host, port, database, table_filters(request.GET))
+    except ValueError as e:
+        return _response(str(e), status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return _response(str(e), status.HTTP_400_BAD_REQUEST)
+    return _response(result)
+
+
+def _versioned(response, version):
+    response['ETag'] = '"{}"'.format(version[0])
+    response['Last-Modified'] = http_date(version[1].timestamp())
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+@_async_api_view
+async def job_events(request, job_id):
+    """
+    Long-polled job progress (see ensembl.production.dbcopy.progress.job_progress), with its version.
+    Answers at once when the version parameter is not set or is not the job current version, otherwise when
+    the job changes or, with 304 Not Modified, after wait seconds (at most DBCOPY_PROGRESS_WAIT). Clients poll
+    again with the returned version until the progress reports the job "ended".
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    max_wait = getattr(settings, 'DBCOPY_PROGRESS_WAIT', 25)
+    wait = request.GET.get('wait')
+    if wait is not None and not wait.isdigit():
+        return _response("wait should be a positive integer", status.HTTP_400_BAD_REQUEST)
+    wait = min(int(wait), max_wait) if wait else max_wait
+    since = request.GET.get('version')
+    version = await wait_job_version(job_id, since, wait if since else 0,
+                                     interval=getattr(settings, 'DBCOPY_PROGRESS_POLL_INTERVAL', 2))
+    if version is None:
+        return _response({'detail': 'Not found.'}, status.HTTP_404_NOT_FOUND)
+    if version[0] == since:
+        return _versioned(HttpResponse(status=status.HTTP_304_NOT_MODIFIED), version)
+    snapshot = await sync_to_async(job_snapshot)(job_id)
+    if snapshot is None:
+        return _response({'detail': 'Not found.'}, status.HTTP_404_NOT_FOUND)
+    progress = await sync_to_async(job_progress)(job_id, snapshot)
+    return _versioned(_response({
+        'version': version[0],
+        'ended': progress['overall_status'] in ENDED_STATUSES,
+        'progress': progress,
+    }), version)
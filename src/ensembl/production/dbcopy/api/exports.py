@@ -0,0 +1,105 @@
+#   See the NOTICE file distributed with this work for additional information
+#   regarding copyright ownership.
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+"""
+Streamed exports of large querysets, as NDJSON or CSV, in bounded memory.
+
+Rows are read in primary key order, one chunk per query (keyset pagination): mysqlclient buffers whole
+result sets client side, so iterating a single query would not bound the memory.
+
+Chunks are queried while the response is sent, by the server iterating it. Django 3.2 ASGI handler iterates
+streamed responses in its event loop, where ORM queries are not allowed, so exports are only served through WSGI.
+"""
+import csv
+import json
+
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+
+class ExportUnavailable(APIException):
+    status_code = status.HTTP_501_NOT_IMPLEMENTED
+    default_detail = 'Exports are only streamed when served through WSGI.'
+    default_code = 'export_unavailable'
+
+
+def check_streamable(request):
+    """
+    :param request: HttpRequest or rest_framework Request
+    :raise: ExportUnavailable when request is served through ASGI
+    """
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        raise ExportUnavailable()
+
+
+def iter_chunks(queryset, chunk_size=2000):
+    """
+    :param queryset: QuerySet, its ordering being replaced by the primary key one
+    :return: generator of lists of at most chunk_size instances
+    """
+    pk_name = queryset.model._meta.pk.name
+    last_pk = None
+    while True:
+        chunk = queryset.order_by(pk_name)
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        chunk = list(chunk[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_pk = chunk[-1].pk
+
+
+class _Echo:
+    # csv.writer file like object, returning the written line
+    def write(self, value):
+        return value
+
+
+def _ndjson_lines(records):
+    for record in records:
+        yield json.dumps(record, cls=DjangoJSONEncoder) + '\n'
+
+
+def _csv_lines(records, fields):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for record in records:
+        yield writer.writerow([record[field] for field in fields])
+
+
+def streaming_export(queryset, serializer_class, export_format, filename, chunk_size=2000, prepare=None):
+    """
+    :param serializer_class: Serializer class or factory (e.g. GenericAPIView.get_serializer), rendering each
+    chunk of instances
+    :param export_format: str, one of EXPORT_FORMATS
+    :param filename: str, without extension
+    :param prepare: callable, called on each chunk of instances before rendering them
+    :return: StreamingHttpResponse
+    """
+    def records():
+        for chunk in iter_chunks(queryset, chunk_size):
+            if prepare is not None:
+                prepare(chunk)
+            yield from serializer_class(chunk, many=True).data
+
+    if export_format == 'csv':
+        lines = _csv_lines(records(), list(serializer_class().fields))
+    else:
+        lines = _ndjson_lines(records())
+    response = StreamingHttpResponse(lines, content_type=EXPORT_FORMATS[export_format])
+    response['Content-Disposition'] = 'attachment; filename="{}.{}"'.format(filename, export_format)
+    return response
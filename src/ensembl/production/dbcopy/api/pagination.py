@@ -0,0 +1,46 @@
+#   See the NOTICE file distributed with this work for additional information
+#   regarding copyright ownership.
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+from rest_framework.pagination import CursorPagination
+
+
+class OptInCursorPagination(CursorPagination):
+    """
+    Keyset pagination, only applied when the cursor or page_size parameter is set, existing clients
+    (e.g. dbcopy-client) expecting the whole list.
+    """
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param not in request.query_params \
+                and self.page_size_query_param not in request.query_params:
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_ordering(self, request, queryset, view):
+        # ?ordering is ignored: cursors need a unique or nearly unique, non null, position
+        return self.ordering
+
+
+class RequestJobCursorPagination(OptInCursorPagination):
+    """
+    Jobs pages, on the (request_date, job_id) index, newest first
+    """
+    ordering = ('-request_date', '-job_id')
+
+
+class TransferLogCursorPagination(OptInCursorPagination):
+    """
+    Job transfers pages, in insertion order
+    """
+    ordering = ('auto_id',)
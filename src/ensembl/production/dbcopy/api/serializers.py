@@ -9,10 +9,12 @@
 #   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.exceptions import ObjectDoesNotExist
+from django.core.exceptions import FieldDoesNotExist, ObjectDoesNotExist
+from ensembl.production.dbcopy.counters import TryProgress
 from ensembl.production.dbcopy.models import TransferLog, RequestJob, Host
-from rest_framework import serializers
+from rest_framework import permissions, serializers
 from rest_framework import status
 from rest_framework.exceptions import APIException
 from rest_framework.reverse import reverse
@@ -36,7 +38,48 @@ class BaseUserTimestampSerializer(serializers.Serializer):
         return data
 
 
-class TransferLogSerializer(serializers.ModelSerializer):
+class SparseFieldsMixin:
+    """
+    Serializer fields restricted with the fields=a,b,... and / or omit=c,... query parameters of safe requests,
+    fields not rendered being never evaluated.
+    computed_columns maps the fields not backed by a model column to the columns their value is computed from.
+    """
+    computed_columns = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in permissions.SAFE_METHODS:
+            return
+        query_params = getattr(request, 'query_params', request.GET)
+        requested = set(query_params.get('fields', '').split(',')).difference({''})
+        omitted = set(query_params.get('omit', '').split(',')).difference({''})
+        for name in list(self.fields):
+            if (requested and name not in requested) or name in omitted:
+                self.fields.pop(name)
+
+    def model_columns(self):
+        """
+        :return: list of the model columns needed to render the fields, None when unknown
+        """
+        opts = self.Meta.model._meta
+        columns = {opts.pk.name}
+        for name, field in self.fields.items():
+            if name in self.computed_columns:
+                columns.update(self.computed_columns[name])
+            elif isinstance(field, serializers.HyperlinkedIdentityField):
+                columns.add(field.lookup_field)
+            else:
+                try:
+                    columns.add(opts.get_field(field.source.split('.')[0]).name)
+                except FieldDoesNotExist:
+                    return None
+        return sorted(columns)
+
+
+class TransferLogSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    computed_columns = {'table_status': ('end_date', 'job_id')}
+
     class Meta:
         model = TransferLog
         fields = (
@@ -53,8 +96,16 @@ class TransferLogSerializer(serializers.ModelSerializer):
             'table_status')
 
 
-class RequestJobSerializer(serializers.HyperlinkedModelSerializer,
+class RequestJobSerializer(SparseFieldsMixin,
+                           serializers.HyperlinkedModelSerializer,
                            BaseUserTimestampSerializer):
+    computed_columns = {
+        'transfer_logs': ('job_id',),
+        'overall_status': ('status', 'overall_status', 'expected', 'completed') + TryProgress._fields,
+        'detailed_status': ('status', 'overall_status', 'expected', 'completed', 'estimated_bytes',
+                            'end_date') + TryProgress._fields,
+    }
+
     class Meta:
         model = RequestJob
         fields = (
@@ -76,8 +127,13 @@ class RequestJobSerializer(serializers.HyperlinkedModelSerializer,
             'end_date',
             'user',
             'transfer_logs',
-            'overall_status')
-        read_only_fields = ['job_id', 'url', 'transfers', 'overall_status']
+            'overall_status',
+            'current_try',
+            'max_tries',
+            'copied',
+            'total_copies')
+        read_only_fields = ['job_id', 'url', 'transfers', 'overall_status', 'current_try', 'max_tries', 'copied',
+                            'total_copies']
         extra_kwargs = {
             'url': {'view_name': 'dbcopy_api:requestjob-detail', 'lookup_field': 'job_id'},
             "user": {"required": True, "source": "username"},
@@ -93,6 +149,11 @@ class RequestJobSerializer(serializers.HyperlinkedModelSerializer,
 
 
 class RequestJobDetailSerializer(RequestJobSerializer):
+    """
+    Single job, its detailed status adding the job throughput computed from its progress samples
+    """
+    detailed_status = serializers.SerializerMethodField(read_only=True)
+
     class Meta:
         model = RequestJob
         fields = (
@@ -115,15 +176,82 @@ class RequestJobDetailSerializer(RequestJobSerializer):
             'user',
             'transfer_logs',
             'overall_status',
-            'detailed_status')
-        read_only_fields = ['job_id', 'url', 'transfers', 'overall_status']
+            'current_try',
+            'max_tries',
+            'copied',
+            'total_copies',
+            'detailed_status',
+            'estimated_tables',
+            'estimated_rows',
+            'estimated_bytes')
+        read_only_fields = ['job_id', 'url', 'transfers', 'overall_status', 'current_try', 'max_tries', 'copied',
+                            'total_copies', 'estimated_tables', 'estimated_rows', 'estimated_bytes']
         extra_kwargs = {
             'url': {'view_name': 'dbcopy_api:requestjob-detail', 'lookup_field': 'job_id'},
             "user": {"required": True, "source": "username"},
         }
 
+    def get_detailed_status(self, obj):
+        throughput = obj.throughput
+        return dict(obj.detailed_status,
+                    bytes_per_second=throughput and throughput.bytes_per_second,
+                    tables_per_second=throughput and throughput.tables_per_second,
+                    eta=throughput and throughput.eta)
+
 
-class HostSerializer(serializers.ModelSerializer):
+class HostSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Host
         fields = '__all__'
+
+
+class IntrospectionLookupSerializer(serializers.Serializer):
+    """
+    One host databases listing, or database tables listing when database is set
+    """
+    host = serializers.RegexField(regex=r'^[\w-]+$', max_length=64)
+    port = serializers.IntegerField(min_value=1, max_value=65535)
+    database = serializers.CharField(required=False, max_length=64)
+    incl_filters = serializers.ListField(child=serializers.CharField(), required=False, default=list)
+    skip_filters = serializers.ListField(child=serializers.CharField(), required=False, default=list)
+    contains = serializers.BooleanField(required=False, default=False)
+    fresh = serializers.BooleanField(required=False, default=False)
+
+
+class BatchIntrospectionSerializer(serializers.Serializer):
+    lookups = IntrospectionLookupSerializer(many=True, allow_empty=False)
+
+    def validate_lookups(self, lookups):
+        max_lookups = getattr(settings, 'DBCOPY_BATCH_MAX_LOOKUPS', 500)
+        if len(lookups) > max_lookups:
+            raise serializers.ValidationError("At most %d lookups can be batched" % max_lookups)
+        return lookups
+
+
+class JobStatusSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    Compact job status, computed from the job row only (see RequestJob._COUNTER_FIELDS)
+    """
+    global_status = serializers.ReadOnlyField()
+    progress = serializers.ReadOnlyField()
+    table_copied = serializers.ReadOnlyField(source='done_transfers')
+    total_tables = serializers.ReadOnlyField(source='nb_transfers')
+
+    FIELDS = ('job_id', 'status', 'overall_status', 'expected', 'completed', 'current_try', 'max_tries', 'copied',
+              'total_copies', 'request_date', 'start_date', 'end_date')
+
+    class Meta:
+        model = RequestJob
+        fields = ('job_id', 'global_status', 'status', 'progress', 'table_copied', 'total_tables', 'current_try',
+                  'max_tries', 'request_date', 'start_date', 'end_date')
+        read_only_fields = fields
+
+
+class BatchStatusSerializer(serializers.Serializer):
+    job_ids = serializers.ListField(child=serializers.CharField(max_length=128), allow_empty=False)
+
+    def validate_job_ids(self, job_ids):
+        max_jobs = getattr(settings, 'DBCOPY_BATCH_MAX_JOBS', 500)
+        if len(job_ids) > max_jobs:
+            raise serializers.ValidationError("At most %d jobs can be looked up at once" % max_jobs)
+        return job_ids
@@ -13,8 +13,9 @@ from django.urls import path, include, re_path
 from drf_yasg import openapi
 from drf_yasg.views import get_schema_view
 from rest_framework import permissions, routers
-from ensembl.production.dbcopy.api import viewsets
-from ensembl.production.dbcopy.api.views import ListDatabases, ListTables
+from ensembl.production.dbcopy.api import async_views, viewsets
+from ensembl.production.dbcopy.api.views import ListDatabases, ListTables, IntrospectionStats, \
+    BatchIntrospection
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -46,9 +47,16 @@ router.register(prefix=r'tgthost',
 
 urlpatterns = [
     path(f'', include(router.urls)),
+    re_path(r'requestjob/(?P<job_id>[^/.]+)/events$', async_views.job_events, name='requestjob-events'),
     re_path(r'transfers/(?P<job_id>[^/.]+)$', viewsets.TransferLogView.as_view(), name='transfers-list'),
+    re_path(r'async/databases/(?P<host>[\w-]+)/(?P<port>\d+)', async_views.list_databases,
+            name='databaselist-async'),
+    re_path(r'async/tables/(?P<host>[\w-]+)/(?P<port>\d+)/(?P<database>\w+)', async_views.list_tables,
+            name='tablelist-async'),
     re_path(r'databases/(?P<host>[\w-]+)/(?P<port>\d+)', ListDatabases.as_view(), name='databaselist'),
     re_path(r'tables/(?P<host>[\w-]+)/(?P<port>\d+)/(?P<database>\w+)', ListTables.as_view(), name='tablelist'),
+    path('introspection/batch', BatchIntrospection.as_view(), name='introspection-batch'),
+    path('introspection/stats', IntrospectionStats.as_view(), name='introspection-stats'),
     re_path(r'swagger(?P<format>\.json|\.yaml)$', schema_view.without_ui(cache_timeout=0), name='schema-json'),
     path(f'docs', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
 ]
\ No newline at end of file
@@ -9,14 +9,50 @@
 #   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
-from ensembl.production.dbcopy.lookups import get_database_set, get_table_set, get_excluded_schemas
+from ensembl.production.dbcopy.catalog import catalog, get_database_set, get_table_set
+from ensembl.production.dbcopy.engines import registry
 
 from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.views.decorators.csrf import csrf_exempt
 
-from ensembl.production.dbcopy.models import Host
+from ensembl.production.dbcopy.api.serializers import BatchIntrospectionSerializer
+from ensembl.production.dbcopy.models import Dbs2Exclude, Host
+from ensembl.production.dbcopy.search import search_database_names
+from ensembl.production.dbcopy.utils import fan_out
+
+
+def list_database_names(hostname, port, user, search='', matches=None, limit=None, exclude=()):
+    """
+    Databases names best matching search, followed by the ones matching any of matches (all of them when
+    no search is set), as returned by the databases listing endpoints
+    :return: list
+    :raise: ValueError when the server can't be introspected
+    """
+    result = []
+    if search:
+        result = search_database_names(hostname, port, search, user=user, limit=limit, exclude=exclude)
+    if matches or not search:
+        names = get_database_set(hostname=hostname, port=port, user=user, incl_filters=matches,
+                                 skip_filters=exclude, contains=True)
+        result += sorted(names.difference(result))
+    return result[:limit]
+
+
+def table_filters(query_params):
+    name_filter = {query_params.get('search', '')}
+    name_matches = query_params.getlist('matches[]')
+    return name_filter.union(name_matches).difference({''})
+
+
+def list_table_names(hostname, port, database, filters):
+    """
+    :return: list of tables names matching any of filters
+    :raise: ValueError when the database does not exist
+    """
+    return list(get_table_set(hostname=hostname, port=port, database=database, incl_filters=filters,
+                              contains=True))
 
 
 class ListDatabases(APIView):
@@ -34,21 +70,21 @@ class ListDatabases(APIView):
         """
         hostname = kwargs.get('host')
         port = kwargs.get('port')
-        name_filter = {request.query_params.get('search', '').replace('%', '.*')}
-        name_matches = request.query_params.getlist('matches[]')
-        filters = name_filter.union(name_matches).difference({''})
-        filters_regexes = [f".*{name}.*" for name in filters]
+        search = request.query_params.get('search', '')
+        name_matches = set(request.query_params.getlist('matches[]')).difference({''})
+        limit = request.query_params.get('limit')
+        if limit is not None and not limit.isdigit():
+            return Response("limit should be a positive integer", status=status.HTTP_400_BAD_REQUEST)
+        limit = int(limit) if limit else None
         try:
             srv_host = Host.objects.get(name=hostname, port=port)
-            result = get_database_set(hostname=hostname, port=port,
-                                      user=srv_host.mysql_user,
-                                      incl_filters=filters_regexes,
-                                      skip_filters=get_excluded_schemas())
+            result = list_database_names(hostname, port, srv_host.mysql_user, search, name_matches, limit,
+                                         exclude=Dbs2Exclude.objects.excluded_schemas())
         except ValueError as e:
             return Response(str(e), status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
             return Response(str(e), status=status.HTTP_400_BAD_REQUEST)
-        return Response(list(result))
+        return Response(result)
 
 
 class ListTables(APIView):
@@ -67,16 +103,69 @@ class ListTables(APIView):
         hostname = kwargs.get('host')
         port = kwargs.get('port')
         database = kwargs.get('database')
-        name_filter = {request.query_params.get('search', '')}
-        name_matches = request.query_params.getlist('matches[]')
-        filters = name_filter.union(name_matches).difference({''})
-        filters_regexes = [f".*{name}.*" for name in filters]
+        filters = table_filters(request.query_params)
         try:
-            result = get_table_set(hostname=hostname, port=port,
-                                   database=database,
-                                   incl_filters=filters_regexes)
+            result = list_table_names(hostname, port, database, filters)
         except ValueError as e:
             return Response(str(e), status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
             return Response(str(e), status=status.HTTP_400_BAD_REQUEST)
-        return Response(list(result))
+        return Response(result)
+
+
+class IntrospectionStats(APIView):
+    """
+    View to report the introspection cache and connection pools usage
+    """
+    def get(self, request, *args, **kwargs):
+        return Response({'catalog': catalog.stats(), 'pools': registry.stats()})
+
+
+class BatchIntrospection(APIView):
+    """
+    View to list databases and / or tables from many servers in one call
+    """
+    @csrf_exempt
+    def post(self, request, *args, **kwargs):
+        """
+        Expect {"lookups": [{"host", "port", "database" (optional), "incl_filters", "skip_filters",
+        "contains", "fresh"}, ...]}, lookups running concurrently.
+        Return {"results": [...]} in lookups order, each one holding either the "databases" or "tables" names
+        or the "error" which prevented listing them.
+        """
+        serializer = BatchIntrospectionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        lookups = serializer.validated_data['lookups']
+        users = {(name, port): user for name, port, user in Host.objects.filter(
+            name__in={lookup['host'] for lookup in lookups}).values_list('name', 'port', 'mysql_user')}
+        exclude = Dbs2Exclude.objects.excluded_schemas()
+
+        def introspect(key):
+            hostname, port, database, incl_filters, skip_filters, contains, fresh = key
+            if database:
+                return sorted(get_table_set(hostname, port, database, user=users.get((hostname, port), 'ensro'),
+                                            incl_filters=incl_filters, skip_filters=skip_filters,
+                                            contains=contains, fresh=fresh))
+            if (hostname, port) not in users:
+                raise ValueError('Unknown host: {}:{}'.format(hostname, port))
+            return sorted(get_database_set(hostname, port, user=users[(hostname, port)],
+                                           incl_filters=incl_filters, skip_filters=exclude.union(skip_filters),
+                                           contains=contains, fresh=fresh))
+
+        keys = [(lookup['host'], lookup['port'], lookup.get('database'), tuple(lookup['incl_filters']),
+                 tuple(lookup['skip_filters']), lookup['contains'], lookup['fresh']) for lookup in lookups]
+        # identical lookups are only run once
+        outcomes = {key: (names, error) for key, names, error in fan_out(introspect, dict.fromkeys(keys))}
+        results = []
+        for key in keys:
+            names, error = outcomes[key]
+            result = {'host': key[0], 'port': key[1]}
+            if key[2]:
+                result['database'] = key[2]
+            if error is not None:
+                result['error'] = str(error)
+            else:
+                result['tables' if key[2] else 'databases'] = names
+            results.append(result)
+        return Response({'results': results})
+
@@ -9,20 +9,100 @@
 #   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
+import datetime
+
 import django.core.exceptions
 import rest_framework.exceptions
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import http_date, quote_etag
+from ensembl.production.dbcopy.api.exports import EXPORT_FORMATS, check_streamable, streaming_export
+from ensembl.production.dbcopy.api.pagination import RequestJobCursorPagination, TransferLogCursorPagination
 from ensembl.production.dbcopy.api.serializers import (
     RequestJobSerializer,
     RequestJobDetailSerializer,
     HostSerializer,
-    TransferLogSerializer
+    TransferLogSerializer,
+    JobStatusSerializer,
+    BatchStatusSerializer
 )
+from ensembl.production.dbcopy.counters import TryProgress
 from ensembl.production.dbcopy.models import RequestJob, Host, TransferLog
-from rest_framework import viewsets, mixins, response, status, generics
+from ensembl.production.dbcopy.planner import plan_job
+from ensembl.production.dbcopy.progress import job_version
+from ensembl.production.dbcopy.utils import fan_out
+from ensembl.production.dbcopy.validation import ValidationContext
+from rest_framework import viewsets, mixins, response, status, generics, filters, permissions
+from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny
 
 
-class RequestJobViewSet(mixins.CreateModelMixin,
+def _parse_date(name, value):
+    """
+    :return: datetime, midnight for dates, in the current time zone when naive
+    :raise: ValidationError when value is not an ISO 8601 date or datetime
+    """
+    try:
+        date = parse_datetime(value)
+        if date is None:
+            day = parse_date(value)
+            date = datetime.datetime.combine(day, datetime.time.min) if day else None
+    except ValueError:
+        date = None
+    if date is None:
+        raise rest_framework.exceptions.ValidationError({name: "should be an ISO 8601 date or datetime"})
+    if settings.USE_TZ and timezone.is_naive(date):
+        date = timezone.make_aware(date)
+    return date
+
+
+def _error_details(err):
+    """
+    :param err: django ValidationError
+    :return: dict or list, its messages
+    """
+    try:
+        return err.message_dict
+    except AttributeError:
+        return err.messages
+
+
+def _conditional_job_response(request, job_id, respond):
+    """
+    304 Not Modified when the request If-None-Match / If-Modified-Since match the job version
+    (see ensembl.production.dbcopy.progress.job_version), respond() otherwise, stamped with the version
+    :param respond: callable returning the full response
+    """
+    version = job_version(job_id)
+    if version is None:
+        return respond()
+    etag, last_modified = quote_etag(version[0]), int(version[1].timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = respond()
+    if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+    return response
+
+
+class SparseFieldsViewMixin:
+    """
+    Only load the model columns needed by the serializer fields of safe requests (see SparseFieldsMixin)
+    """
+    def sparse_queryset(self, queryset):
+        if self.request.method in permissions.SAFE_METHODS:
+            columns = self.get_serializer().model_columns()
+            if columns is not None:
+                queryset = queryset.only(*columns)
+        return queryset
+
+
+class RequestJobViewSet(SparseFieldsViewMixin,
+                        mixins.CreateModelMixin,
                         mixins.RetrieveModelMixin,
                         mixins.ListModelMixin,
                         mixins.DestroyModelMixin,
@@ -31,18 +111,60 @@ class RequestJobViewSet(mixins.CreateModelMixin,
     permission_classes = [AllowAny]
 
     queryset = RequestJob.objects.all()
-    pagination_class = None
+    pagination_class = RequestJobCursorPagination
     lookup_field = 'job_id'
 
     def create(self, request, *args, **kwargs):
         try:
             return super().create(request, *args, **kwargs)
         except django.core.exceptions.ValidationError as err:
-            try:
-                errors = err.message_dict
-            except AttributeError:
-                errors = err.messages
-            raise rest_framework.exceptions.ValidationError(errors) from err
+            raise rest_framework.exceptions.ValidationError(_error_details(err)) from err
+
+    @action(detail=False, methods=['post'], url_path='bulk', url_name='bulk-create')
+    def bulk_create(self, request, *args, **kwargs):
+        """
+        Submit many jobs at once, as {"jobs": [...]}, each job being validated as by the job creation endpoint,
+        the hosts being loaded and the jobs sources introspected (see RequestJob.estimate) once for all.
+        Valid jobs are inserted in one transaction.
+        Return {"results": [...]} in jobs order, each one holding either the created "job" or its "errors",
+        with 201 when all jobs were created, 207 when some were, 400 otherwise.
+        """
+        items = request.data.get('jobs') if isinstance(request.data, dict) else None
+        max_jobs = getattr(settings, 'DBCOPY_BATCH_MAX_JOBS', 500)
+        if not isinstance(items, list) or not items:
+            raise rest_framework.exceptions.ValidationError({'jobs': "should be a non empty list of jobs"})
+        if len(items) > max_jobs:
+            raise rest_framework.exceptions.ValidationError(
+                {'jobs': "At most %d jobs can be submitted at once" % max_jobs})
+        serializer_context = self.get_serializer_context()
+        submitted = [RequestJobSerializer(data=item, context=serializer_context) for item in items]
+        jobs = {index: RequestJob(**serializer.validated_data)
+                for index, serializer in enumerate(submitted) if serializer.is_valid()}
+        context = ValidationContext()
+        context.prefetch_hosts({host.split(':')[0] for job in jobs.values()
+                                for host in [job.src_host] + job.tgt_host.split(',')})
+        if getattr(settings, 'DBCOPY_PLAN_ON_SUBMIT', False):
+            # distinct sources are planned concurrently, then found in the context by each job save
+            fan_out(lambda job: plan_job(job, context), jobs.values())
+        results = []
+        with transaction.atomic():
+            for index, serializer in enumerate(submitted):
+                if index not in jobs:
+                    results.append({'errors': serializer.errors})
+                    continue
+                try:
+                    jobs[index].save(context=context)
+                except django.core.exceptions.ValidationError as err:
+                    results.append({'errors': _error_details(err)})
+                    continue
+                serializer.instance = jobs[index]
+                results.append({'job': serializer.data})
+        created = sum('job' in result for result in results)
+        if created == len(results):
+            status_code = status.HTTP_201_CREATED
+        else:
+            status_code = status.HTTP_207_MULTI_STATUS if created else status.HTTP_400_BAD_REQUEST
+        return response.Response({'results': results}, status=status_code)
 
     def destroy(self, request, *args, **kwargs):
         """
@@ -59,13 +181,75 @@ class RequestJobViewSet(mixins.CreateModelMixin,
         else:
             return response.Response(status=status.HTTP_406_NOT_ACCEPTABLE)
 
+    filter_backends = [filters.OrderingFilter]
+    ordering_fields = ('request_date', 'start_date', 'end_date') + TryProgress._fields
+    progress_filters = tuple(field + lookup for field in TryProgress._fields
+                             for lookup in ('', '__gt', '__gte', '__lt', '__lte'))
+
+    host_filters = {'user': 'username', 'src_host': 'src_host', 'tgt_host': 'tgt_host'}
+    date_filters = {'submitted_after': 'request_date__gte', 'submitted_before': 'request_date__lt'}
+
+    def get_queryset(self):
+        """
+        Jobs, filtered on their overall status(es) when the status=Running,Scheduled parameter is set, on their
+        submitter (user), source / target hosts as submitted (src_host, tgt_host), on their submission date with
+        submitted_after / submitted_before (ISO 8601 date or datetime), and on their progress with
+        e.g. current_try__gt=1 (see TryProgress)
+        """
+        queryset = super().get_queryset()
+        overall_status = self.request.query_params.get('status')
+        if overall_status:
+            queryset = queryset.filter(overall_status__in=overall_status.split(','))
+        for name, lookup in self.host_filters.items():
+            value = self.request.query_params.get(name)
+            if value:
+                queryset = queryset.filter(**{lookup: value})
+        for name, lookup in self.date_filters.items():
+            value = self.request.query_params.get(name)
+            if value:
+                queryset = queryset.filter(**{lookup: _parse_date(name, value)})
+        progress_filters = {}
+        for name in self.progress_filters:
+            value = self.request.query_params.get(name)
+            if value is not None:
+                if not value.isdigit():
+                    raise rest_framework.exceptions.ValidationError({name: "should be a positive integer"})
+                progress_filters[name] = int(value)
+        return self.sparse_queryset(queryset.filter(**progress_filters))
+
+    @action(detail=False, methods=['get', 'post'], url_path='status', url_name='bulk-status')
+    def bulk_status(self, request, *args, **kwargs):
+        """
+        Compact status of many jobs in one query, the job ids being set as job_ids=a,b,... (GET) or
+        {"job_ids": [...]} (POST).
+        Return {"results": [...]} in job ids order, and the unknown job ids in "not_found".
+        """
+        if request.method == 'GET':
+            data = {'job_ids': [job_id for job_id in request.query_params.get('job_ids', '').split(',') if job_id]}
+        else:
+            data = request.data
+        serializer = BatchStatusSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        job_ids = list(dict.fromkeys(serializer.validated_data['job_ids']))
+        jobs = {job.job_id: job for job in RequestJob.objects.filter(job_id__in=job_ids).only(
+            *JobStatusSerializer.FIELDS)}
+        return response.Response({
+            'results': JobStatusSerializer([jobs[job_id] for job_id in job_ids if job_id in jobs], many=True,
+                                           context=self.get_serializer_context()).data,
+            'not_found': [job_id for job_id in job_ids if job_id not in jobs],
+        })
+
+    def retrieve(self, request, *args, **kwargs):
+        return _conditional_job_response(request, kwargs.get(self.lookup_field),
+                                         lambda: super(RequestJobViewSet, self).retrieve(request, *args, **kwargs))
+
     def get_serializer_class(self):
         if self.action == 'retrieve':
             return RequestJobDetailSerializer
         return RequestJobSerializer
 
 
-class SourceHostViewSet(viewsets.ReadOnlyModelViewSet):
+class SourceHostViewSet(SparseFieldsViewMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = HostSerializer
     lookup_field = 'name'
 
@@ -73,23 +257,58 @@ class SourceHostViewSet(viewsets.ReadOnlyModelViewSet):
         """
         Return a list of hosts according to a keyword
         """
-        return Host.objects.qs_src_host(self.request.query_params.get('name', self.kwargs.get('name')), active=False)
+        return self.sparse_queryset(
+            Host.objects.qs_src_host(self.request.query_params.get('name', self.kwargs.get('name')), active=False))
 
 
-class TargetHostViewSet(viewsets.ReadOnlyModelViewSet):
+class TargetHostViewSet(SparseFieldsViewMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = HostSerializer
     lookup_field = 'name'
 
     def get_queryset(self):
         # WARNING request now need a user to perform the listing. This breaks dbcopy-client tool validation.
-        return Host.objects.qs_tgt_host_for_user(self.request.query_params.get('name', self.kwargs.get('name')),
-                                                 self.request.user,
-                                                 active=False)
+        return self.sparse_queryset(
+            Host.objects.qs_tgt_host_for_user(self.request.query_params.get('name', self.kwargs.get('name')),
+                                              self.request.user,
+                                              active=False))
 
 
-class TransferLogView(generics.ListAPIView):
+class TransferLogView(SparseFieldsViewMixin, generics.ListAPIView):
     serializer_class = TransferLogSerializer
     lookup_field = 'job_id'
+    pagination_class = TransferLogCursorPagination
+    export_chunk_size = 2000
 
     def get_queryset(self):
-        return TransferLog.objects.filter(job_id=self.kwargs.get('job_id'))
+        queryset = self.sparse_queryset(TransferLog.objects.filter(job_id=self.kwargs.get('job_id')))
+        if 'table_status' in self.get_serializer().fields:
+            queryset = queryset.select_related('job_id')
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        """
+        Job transfers, streamed as NDJSON or CSV when the export=ndjson|csv parameter is set (WSGI only, see
+        ensembl.production.dbcopy.api.exports)
+        """
+        return _conditional_job_response(request, self.kwargs.get('job_id'),
+                                         lambda: self.render_list(request, *args, **kwargs))
+
+    def render_list(self, request, *args, **kwargs):
+        export_format = request.query_params.get('export')
+        if export_format is None:
+            return super().list(request, *args, **kwargs)
+        if export_format not in EXPORT_FORMATS:
+            raise rest_framework.exceptions.ValidationError(
+                {'export': "should be one of {}".format(', '.join(EXPORT_FORMATS))})
+        check_streamable(request)
+        job_id = self.kwargs.get('job_id')
+        job = RequestJob.objects.filter(pk=job_id).first()
+
+        def share_job(transfer_logs):
+            # transfers table_status reads their job, the same for all of them
+            for transfer_log in transfer_logs:
+                transfer_log.job_id = job
+
+        return streaming_export(self.sparse_queryset(TransferLog.objects.filter(job_id=job_id)),
+                                self.get_serializer, export_format, 'transfers_{}'.format(job_id),
+                                self.export_chunk_size, share_job)
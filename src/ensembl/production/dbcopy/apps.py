@@ -16,3 +16,6 @@ class EnsemblDbCopyConfig(AppConfig):
     name = 'ensembl.production.dbcopy'
     label = 'ensembl_dbcopy'
     verbose_name = "Ensembl DB Copy"
+
+    def ready(self):
+        from ensembl.production.dbcopy import signals  # noqa: F401
@@ -0,0 +1,104 @@
+#   See the NOTICE file distributed with this work for additional information
+#   regarding copyright ownership.
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+"""
+Asynchronous counterparts of the DbLookup / TableLookup autocomplete views, answering in the same
+Select2 format. Meant to be served through ASGI (see ensembl.production.dbcopy.api.async_views).
+"""
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import ObjectDoesNotExist
+from django.http import HttpResponseBadRequest, HttpResponseNotAllowed, JsonResponse
+from sqlalchemy.exc import DBAPIError
+
+from .catalog import get_table_set
+from .lookups import DbLookup
+from .models import Dbs2Exclude, Host
+from .search import search_database_names
+from .utils import run_introspection
+
+logger = logging.getLogger(__name__)
+
+
+def _is_staff_member(request):
+    return request.user.is_active and request.user.is_staff
+
+
+def _async_lookup(lookup):
+    """
+    Equivalent of staff_member_required plus dal ViewMixin forwarded values parsing for coroutines,
+    the lookup being called with (request, forwarded, q) and returning the list of values.
+    """
+    async def view(request, *args, **kwargs):
+        if request.method not in ('GET', 'POST'):
+            return HttpResponseNotAllowed(['GET', 'POST'])
+        if not await sync_to_async(_is_staff_member)(request):
+            return redirect_to_login(request.get_full_path(), 'admin:login')
+        try:
+            forwarded = json.loads(getattr(request, request.method).get('forward', '{}'))
+        except ValueError:
+            return HttpResponseBadRequest('Invalid JSON data')
+        if not isinstance(forwarded, dict):
+            return HttpResponseBadRequest('Not a JSON object')
+        results = await lookup(request, forwarded, request.GET.get('q', ''))
+        return JsonResponse({'results': [dict(id=x, text=x) for x in results]}, content_type='application/json')
+
+    view.__name__ = lookup.__name__
+    view.__doc__ = lookup.__doc__
+    return view
+
+
+@_async_lookup
+async def db_lookup(request, forwarded, q):
+    """
+    Best ranked schema names matching the search, see DbLookup
+    """
+    result = []
+    if q:
+        try:
+            host, port = forwarded.get('db_host').split(':')
+            srv_host = await sync_to_async(Host.objects.get)(name=host, port=port)
+            exclude = await sync_to_async(Dbs2Exclude.objects.excluded_schemas)()
+            result = await run_introspection(search_database_names, host, port, q, user=srv_host.mysql_user,
+                                             limit=DbLookup.paginate_by, exclude=exclude)
+        except (ValueError, ObjectDoesNotExist) as e:
+            logger.error("Db Lookup query error: %s", str(e))
+        except DBAPIError as e:
+            logger.error("Db Lookup query error: %s", str(e.orig))
+    return result
+
+
+@_async_lookup
+async def table_lookup(request, forwarded, q):
+    """
+    Table names containing the search, see TableLookup
+    """
+    included_dbs = forwarded.get('src_incl_db', [])
+    if len(included_dbs) > 1 or any('%' in incl_db for incl_db in included_dbs):
+        result = ['', 'Cannot filter on table name on multiple/patterned dbs!!']
+    elif len(included_dbs) > 0 and q and len(q) >= 2:
+        try:
+            host, port = forwarded.get('db_host').split(':')
+            logger.debug("Inspecting %s:%s/%s w/ %s", host, port, included_dbs[0], q)
+            result = await run_introspection(get_table_set, host, port, included_dbs[0], incl_filters=[q],
+                                             contains=True)
+        except (ValueError, ObjectDoesNotExist) as e:
+            logger.error("Db Table Lookup query error: %s ", str(e))
+            result = []
+        except DBAPIError as e:
+            logger.error("TableLookup query error: %s ", str(e.orig))
+            result = []
+    else:
+        result = []
+    return [name for name in result if q.lower() in name.lower()] if q else list(result)
@@ -0,0 +1,217 @@
+#   See the NOTICE file distributed with this work for additional information
+#   regarding copyright ownership.
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+"""
+Process wide cache of database / table names introspected from the registered MySQL servers.
+
+Entries are keyed by (hostname, port, database), `database` being None for the server schema list.
+They expire after `DBCOPY_CATALOG_TTL` seconds and the least recently used ones are evicted once
+`DBCOPY_CATALOG_SIZE` entries are stored.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import sqlalchemy as sa
+from django.conf import settings
+from ensembl.production.core.db_introspects import get_schema_names, get_table_names
+
+from ensembl.production.dbcopy.engines import get_engine
+from ensembl.production.dbcopy.patterns import NamePatterns
+
+logger = logging.getLogger(__name__)
+
+
+class SchemaCatalog:
+    """
+    Thread safe TTL / LRU cache of names sets.
+    """
+
+    def __init__(self, ttl=300, max_entries=512):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.ttl > 0 and self.max_entries > 0
+
+    @staticmethod
+    def make_key(hostname, port, database=None):
+        return hostname, str(port), database
+
+    def get(self, key, loader):
+        """
+        Retrieve names stored for key, calling loader to fetch them when missing or expired.
+        Loader exceptions are propagated and nothing is stored.
+        :param key: tuple (hostname, port, database)
+        :param loader: callable returning an iterable of names
+        :return: frozenset of names
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        names = frozenset(loader())
+        self.set(key, names)
+        return names
+
+    def set(self, key, names):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, frozenset(names))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, hostname=None, port=None, database=None):
+        """
+        Drop entries matching all the specified parameters, everything when called without parameter.
+        Invalidating a server (no database) drops its tables lists as well.
+        :return: number of dropped entries
+        """
+        port = str(port) if port is not None else None
+        with self._lock:
+            keys = [key for key in self._entries
+                    if (hostname is None or key[0] == hostname)
+                    and (port is None or key[1] == port)
+                    and (database is None or key[2] == database)]
+            for key in keys:
+                del self._entries[key]
+        logger.debug("Invalidated %s catalog entries for %s:%s/%s", len(keys), hostname, port, database)
+        return len(keys)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+catalog = SchemaCatalog(ttl=getattr(settings, 'DBCOPY_CATALOG_TTL', 300),
+                        max_entries=getattr(settings, 'DBCOPY_CATALOG_SIZE', 512))
+
+
+def _load_database_names(hostname, port, user):
+    from ensembl.production.dbcopy.indexer import snapshot_database_names
+    names = snapshot_database_names(hostname, port)
+    if names is None:
+        names = get_schema_names(get_engine(hostname, port, user))
+    return names
+
+
+def _load_table_names(hostname, port, database, user):
+    from ensembl.production.dbcopy.indexer import snapshot_table_names
+    names = snapshot_table_names(hostname, port, database)
+    if names is None:
+        names = get_table_names(get_engine(hostname, port, user), database)
+    return names
+
+
+def get_database_names(hostname, port, user='ensro'):
+    """
+    Retrieve all schema names present on a server, from the local index when up to date.
+    :return: frozenset
+    """
+    return catalog.get(SchemaCatalog.make_key(hostname, port),
+                       lambda: _load_database_names(hostname, port, user))
+
+
+def get_table_names_set(hostname, port, database, user='ensro'):
+    """
+    Retrieve all table names present in a database, from the local index when up to date.
+    :return: frozenset
+    :raise: ValueError when database does not exist
+    """
+    return catalog.get(SchemaCatalog.make_key(hostname, port, database),
+                       lambda: _load_table_names(hostname, port, database, user))
+
+
+def query_database_names(hostname, port, user='ensro', patterns=None):
+    """
+    Fetch matching schema names from the server, filters being pushed down to information_schema
+    :return: set
+    """
+    patterns = patterns or NamePatterns()
+    predicate, params = patterns.sql('SCHEMA_NAME')
+    sql = "SELECT SCHEMA_NAME FROM information_schema.SCHEMATA"
+    if predicate:
+        sql += " WHERE " + predicate
+    with get_engine(hostname, port, user).connect() as connection:
+        return patterns.filter(row[0] for row in connection.exec_driver_sql(sql, tuple(params)))
+
+
+def query_table_names(hostname, port, database, user='ensro', patterns=None):
+    """
+    Fetch matching table names from the server, filters being pushed down to information_schema
+    :return: set
+    :raise: ValueError when database does not exist
+    """
+    patterns = patterns or NamePatterns()
+    predicate, params = patterns.sql('TABLE_NAME')
+    sql = "SELECT TABLE_NAME FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s"
+    if predicate:
+        sql += " AND " + predicate
+    try:
+        with get_engine(hostname, port, user).connect() as connection:
+            names = patterns.filter(row[0] for row in connection.exec_driver_sql(sql, (database, *params)))
+            if not names and not connection.exec_driver_sql(
+                    "SELECT 1 FROM information_schema.SCHEMATA WHERE SCHEMA_NAME = %s", (database,)).first():
+                raise ValueError('Invalid database: {}'.format(database))
+    except sa.exc.OperationalError as e:
+        raise ValueError('Invalid database: {}'.format(database)) from e
+    return names
+
+
+def get_database_set(hostname, port, user='ensro', incl_filters=None, skip_filters=None, contains=False,
+                     fresh=False):
+    """
+    Schema names matching the filters (see ensembl.production.dbcopy.patterns)
+    :param contains: include filters match anywhere in the names
+    :param fresh: bypass the cache and query the server, filters being pushed down
+    :return: set
+    """
+    patterns = NamePatterns(incl_filters, skip_filters, contains)
+    if fresh or not catalog.enabled:
+        return query_database_names(hostname, port, user, patterns)
+    return patterns.filter(get_database_names(hostname, port, user))
+
+
+def get_table_set(hostname, port, database, user='ensro', incl_filters=None, skip_filters=None, contains=False,
+                  fresh=False):
+    """
+    Table names matching the filters (see ensembl.production.dbcopy.patterns)
+    :param contains: include filters match anywhere in the names
+    :param fresh: bypass the cache and query the server, filters being pushed down
+    :return: set
+    :raise: ValueError when database does not exist
+    """
+    patterns = NamePatterns(incl_filters, skip_filters, contains)
+    if fresh or not catalog.enabled:
+        return query_table_names(hostname, port, database, user, patterns)
+    return patterns.filter(get_table_names_set(hostname, port, database, user))
@@ -0,0 +1,225 @@
+#   See the NOTICE file distributed with this work for additional information
+#   regarding copyright ownership.
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+"""
+Jobs transfer counters: request_job.expected (transfer_log rows) and request_job.completed (ended ones), and
+jobs overall status (request_job.overall_status) computed from the copy service status, the copy progress
+(request_job current_try, max_tries, copied, total_copies) and the counters.
+Workers still reporting their progress in the status only (Try:2/3. 140/200 Transferred) have it parsed into the
+progress columns on write, values written to the columns directly being kept otherwise.
+
+They are maintained as request_job and transfer_log rows change: by triggers on MySQL, both tables being written
+by the copy service outside of Django, by RequestJob.save and the TransferLog signals
+(see ensembl.production.dbcopy.signals) on other database backends. refresh_counters and refresh_overall_status
+recompute them from scratch. request_job.last_changed is stamped the same way on every job or transfers change.
+"""
+import collections
+import re
+
+from django.db.models import Count, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+ENDED_STATUSES = ('Complete', 'Failed')
+
+_TRY_STATUS = re.compile(
+    r"^Try:(?P<current_try>\d+)/(?P<max_tries>\d+). (?P<copied>\d+)/(?P<total_copies>\d+) Transferred$")
+
+TryProgress = collections.namedtuple('TryProgress', ('current_try', 'max_tries', 'copied', 'total_copies'))
+
+
+def parse_try_status(status):
+    """
+    Compatibility shim for the workers writing their progress in the status only, e.g. Try:2/3. 140/200 Transferred
+    :return: TryProgress or None
+    """
+    m = _TRY_STATUS.match(status.strip()) if status else None
+    return TryProgress(*(int(value) for value in m.groups())) if m else None
+
+
+def overall_status(status, running_transfers, progress=None):
+    """
+    :param status: str, copy service status message
+    :param running_transfers: int, transfers not ended yet
+    :param progress: TryProgress, parsed from a legacy status when not set
+    :return: str, one of Submitted, Scheduled, Running, Complete, Failed
+    """
+    progress = progress or parse_try_status(status)
+    if status == 'Transfer Ended':
+        return "Complete"
+    elif status and status.strip().lower().startswith("error"):
+        return "Failed"
+    elif progress:
+        if progress.copied == progress.total_copies:
+            return "Complete"
+        if progress.current_try == progress.max_tries and progress.copied < progress.total_copies:
+            return "Failed"
+        if progress.current_try < progress.max_tries:
+            return "Failed" if running_transfers == 0 else "Running"
+    elif status == 'Processing Requests':
+        return 'Running'
+    elif status == 'Creating Requests':
+        return 'Scheduled'
+    return 'Submitted'
+
+
+def _overall_status_sql():
+    # SQL counterpart of parse_try_status and overall_status, setting the NEW request_job row
+    status = "TRIM(NEW.status)"
+    head = "SUBSTRING_INDEX(%s, ' ', 1)" % status  # Try:<current_try>/<max_tries>.
+    tail = "SUBSTRING_INDEX(SUBSTRING_INDEX(%s, ' ', 2), ' ', -1)" % status  # <copied>/<total_copies>
+    legacy_progress = ', '.join((
+        "NEW.current_try = CAST(SUBSTRING_INDEX(SUBSTRING_INDEX(%s, '/', 1), ':', -1) AS UNSIGNED)" % head,
+        "NEW.max_tries = CAST(LEFT(SUBSTRING_INDEX({0}, '/', -1), CHAR_LENGTH(SUBSTRING_INDEX({0}, '/', -1)) - 1) "
+        "AS UNSIGNED)".format(head),
+        "NEW.copied = CAST(SUBSTRING_INDEX(%s, '/', 1) AS UNSIGNED)" % tail,
+        "NEW.total_copies = CAST(SUBSTRING_INDEX(%s, '/', -1) AS UNSIGNED)" % tail,
+    ))
+    return (
+        "BEGIN "
+        "IF REGEXP_LIKE({status}, '^Try:[0-9]+/[0-9]+. [0-9]+/[0-9]+ Transferred$', 'c') THEN "
+        "SET {legacy_progress}; "
+        "END IF; "
+        "SET NEW.overall_status = CASE "
+        "WHEN BINARY NEW.status = 'Transfer Ended' THEN 'Complete' "
+        "WHEN LOWER(LEFT({status}, 5)) = 'error' THEN 'Failed' "
+        "WHEN NEW.current_try IS NOT NULL AND NEW.max_tries IS NOT NULL AND NEW.copied IS NOT NULL "
+        "AND NEW.total_copies IS NOT NULL THEN CASE "
+        "WHEN NEW.copied = NEW.total_copies THEN 'Complete' "
+        "WHEN NEW.current_try = NEW.max_tries AND NEW.copied < NEW.total_copies THEN 'Failed' "
+        "WHEN NEW.current_try < NEW.max_tries AND COALESCE(NEW.expected, 0) - COALESCE(NEW.completed, 0) = 0 "
+        "THEN 'Failed' "
+        "WHEN NEW.current_try < NEW.max_tries THEN 'Running' "
+        "ELSE 'Submitted' END "
+        "WHEN BINARY NEW.status = 'Processing Requests' THEN 'Running' "
+        "WHEN BINARY NEW.status = 'Creating Requests' THEN 'Scheduled' "
+        "ELSE 'Submitted' END; "
+        "END"
+    ).format(status=status, legacy_progress=legacy_progress)
+
+
+TRIGGERS = {
+    'transfer_log_counters_insert': (
+        "CREATE TRIGGER transfer_log_counters_insert AFTER INSERT ON transfer_log FOR EACH ROW "
+        "UPDATE request_job SET expected = COALESCE(expected, 0) + 1, "
+        "completed = COALESCE(completed, 0) + (NEW.end_date IS NOT NULL) "
+        "WHERE job_id = NEW.job_id"
+    ),
+    'transfer_log_counters_update': (
+        "CREATE TRIGGER transfer_log_counters_update AFTER UPDATE ON transfer_log FOR EACH ROW "
+        "UPDATE request_job SET completed = COALESCE(completed, 0) + (NEW.end_date IS NOT NULL) "
+        "- (OLD.end_date IS NOT NULL) "
+        "WHERE job_id = NEW.job_id"
+    ),
+    'transfer_log_counters_delete': (
+        "CREATE TRIGGER transfer_log_counters_delete AFTER DELETE ON transfer_log FOR EACH ROW "
+        "UPDATE request_job SET expected = COALESCE(expected, 0) - 1, "
+        "completed = COALESCE(completed, 0) - (OLD.end_date IS NOT NULL) "
+        "WHERE job_id = OLD.job_id"
+    ),
+    # transfer_log changes reach request_job through the counters triggers
+    'request_job_last_changed_insert': (
+        "CREATE TRIGGER request_job_last_changed_insert BEFORE INSERT ON request_job FOR EACH ROW "
+        "SET NEW.last_changed = UTC_TIMESTAMP(6)"
+    ),
+    'request_job_last_changed_update': (
+        "CREATE TRIGGER request_job_last_changed_update BEFORE UPDATE ON request_job FOR EACH ROW "
+        "SET NEW.last_changed = UTC_TIMESTAMP(6)"
+    ),
+    'request_job_overall_status_insert': (
+        "CREATE TRIGGER request_job_overall_status_insert BEFORE INSERT ON request_job FOR EACH ROW "
+        + _overall_status_sql()
+    ),
+    'request_job_overall_status_update': (
+        "CREATE TRIGGER request_job_overall_status_update BEFORE UPDATE ON request_job FOR EACH ROW "
+        + _overall_status_sql()
+    ),
+}
+
+
+COUNTER_TRIGGERS = ('transfer_log_counters_insert', 'transfer_log_counters_update', 'transfer_log_counters_delete')
+
+STATUS_TRIGGERS = ('request_job_overall_status_insert', 'request_job_overall_status_update')
+
+LAST_CHANGED_TRIGGERS = ('request_job_last_changed_insert', 'request_job_last_changed_update')
+
+
+def uses_triggers(connection):
+    return connection.vendor == 'mysql'
+
+
+def install_triggers(schema_editor, names=COUNTER_TRIGGERS):
+    """
+    :param names: triggers to (re)create, the transfer counters ones by default
+    """
+    if uses_triggers(schema_editor.connection):
+        for name in names:
+            schema_editor.execute("DROP TRIGGER IF EXISTS %s" % name, None)
+            schema_editor.execute(TRIGGERS[name], None)
+
+
+def drop_triggers(schema_editor, names=COUNTER_TRIGGERS):
+    if uses_triggers(schema_editor.connection):
+        for name in names:
+            schema_editor.execute("DROP TRIGGER IF EXISTS %s" % name, None)
+
+
+def add_to_counters(jobs, expected=0, completed=0):
+    """
+    :param jobs: RequestJob QuerySet
+    :param expected: int, transfers added (removed when negative)
+    :param completed: int, ended transfers added (removed when negative)
+    :return: number of jobs updated
+    """
+    changes = {name: Coalesce(F(name), Value(0)) + delta
+               for name, delta in (('expected', expected), ('completed', completed)) if delta}
+    return jobs.update(**changes) if changes else 0
+
+
+def touch_jobs(jobs):
+    """
+    Stamp jobs last_changed, for their transfers changes
+    :param jobs: RequestJob QuerySet
+    :return: number of jobs updated
+    """
+    return jobs.update(last_changed=timezone.now())
+
+
+def refresh_counters(jobs, transfer_logs):
+    """
+    Recompute jobs counters from transfer_log, in one UPDATE
+    :param jobs: RequestJob QuerySet
+    :param transfer_logs: TransferLog QuerySet
+    :return: number of jobs updated
+    """
+    logs = transfer_logs.filter(job_id=OuterRef('pk')).order_by().values('job_id')
+
+    def count(condition=Q()):
+        return Coalesce(Subquery(logs.filter(condition).annotate(total=Count('pk')).values('total')), Value(0))
+
+    return jobs.update(expected=count(), completed=count(Q(end_date__isnull=False)))
+
+
+def refresh_overall_status(jobs):
+    """
+    Recompute jobs overall status from their status and counters
+    :param jobs: RequestJob QuerySet
+    :return: number of jobs updated
+    """
+    # the migrations historical models predating the progress columns parse the status only
+    columns = {field.name for field in jobs.model._meta.concrete_fields}
+    progress_fields = TryProgress._fields if columns.issuperset(TryProgress._fields) else ()
+    job_ids = {}
+    for job_id, status, expected, completed, *progress in jobs.values_list(
+            'pk', 'status', 'expected', 'completed', *progress_fields).iterator():
+        progress = TryProgress(*progress) if progress and None not in progress else None
+        job_ids.setdefault(overall_status(status, (expected or 0) - (completed or 0), progress), []).append(job_id)
+    return sum(jobs.filter(pk__in=ids).update(overall_status=value) for value, ids in job_ids.items())
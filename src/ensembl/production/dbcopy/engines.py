@@ -0,0 +1,110 @@
+#   See the NOTICE file distributed with this work for additional information
+#   regarding copyright ownership.
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+"""
+Process wide registry of SQLAlchemy engines to the registered hosts.
+
+One engine is kept per (hostname, port, mysql user) with a bounded connection pool, checked with a ping
+before use and recycled after `pool_recycle` seconds. Pool settings can be overridden with
+the `DBCOPY_ENGINE_POOL` setting dict.
+"""
+import logging
+import threading
+
+import sqlalchemy as sa
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_OPTIONS = {
+    'pool_size': 2,
+    'max_overflow': 4,
+    'pool_timeout': 10,
+    'pool_recycle': 1800,
+    'connect_timeout': 10,
+}
+
+
+class EngineRegistry:
+
+    def __init__(self, **options):
+        self.options = {**DEFAULT_POOL_OPTIONS, **options}
+        self._engines = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(hostname, port, user):
+        return hostname, str(port), user
+
+    def _create(self, hostname, port, user):
+        options = dict(self.options)
+        connect_timeout = options.pop('connect_timeout')
+        logger.debug("Creating engine for %s@%s:%s", user, hostname, port)
+        return sa.create_engine(f'mysql://{user}:@{hostname}:{port}', pool_pre_ping=True,
+                                connect_args={'connect_timeout': connect_timeout}, **options)
+
+    def get(self, hostname, port, user='ensro'):
+        key = self.make_key(hostname, port, user)
+        with self._lock:
+            engine = self._engines.get(key)
+            if engine is None:
+                engine = self._create(hostname, port, user)
+                self._engines[key] = engine
+        return engine
+
+    def dispose(self, hostname=None, port=None, user=None):
+        """
+        Close and forget engines matching all the specified parameters, every one when called without parameter.
+        :return: number of disposed engines
+        """
+        port = str(port) if port is not None else None
+        with self._lock:
+            keys = [key for key in self._engines
+                    if (hostname is None or key[0] == hostname)
+                    and (port is None or key[1] == port)
+                    and (user is None or key[2] == user)]
+            engines = [self._engines.pop(key) for key in keys]
+        for engine in engines:
+            engine.dispose()
+        if keys:
+            logger.debug("Disposed engines %s", keys)
+        return len(keys)
+
+    def stats(self):
+        with self._lock:
+            engines = list(self._engines.items())
+        return [{
+            'host': hostname,
+            'port': port,
+            'user': user,
+            'size': engine.pool.size(),
+            'checked_in': engine.pool.checkedin(),
+            'checked_out': engine.pool.checkedout(),
+            'overflow': engine.pool.overflow(),
+        } for (hostname, port, user), engine in engines]
+
+
+registry = EngineRegistry(**getattr(settings, 'DBCOPY_ENGINE_POOL', {}))
+
+
+def get_engine(hostname, port, user='ensro'):
+    try:
+        return registry.get(hostname, port, user)
+    except (RuntimeError, sa.exc.ArgumentError) as e:
+        raise ValueError('Invalid hostname: {} or port: {}'.format(hostname, port)) from e
+
+
+def get_host_engine(host):
+    """
+    :param host: Host
+    :return: pooled engine connecting as the host mysql_user
+    """
+    return get_engine(host.name, host.port, host.mysql_user)
@@ -11,7 +11,6 @@
 #   limitations under the License.
 import logging
 from django.contrib.admin import SimpleListFilter
-from django.db.models import Count, Q
 
 logger = logging.getLogger(__name__)
 
@@ -85,22 +84,10 @@ class OverallStatusFilter(SimpleListFilter):
             ("Complete", "Completed"),
             ("Failed", "Failed"),
             ("Running", "Running"),
+            ("Scheduled", "Scheduled"),
             ("Submitted", "Submitted"),
         ]
 
     def queryset(self, request, queryset):
-        if self.value() == 'Failed':
-            qs = queryset.filter(end_date__isnull=False)
-            qs = qs.annotate(failed_transfers=Count('transfer_logs', filter=Q(transfer_logs__size__isnull=True)))
-            qs = qs.annotate(all_transfers=Count('transfer_logs'))
-            return qs.filter(Q(failed_transfers__gt=0) | Q(all_transfers=0))
-        elif self.value() == 'Complete':
-            qs = queryset.filter(end_date__isnull=False, status="Transfer Ended")
-            return qs
-        elif self.value() == 'Running':
-            qs = queryset.filter(start_date__isnull=False, end_date__isnull=True)
-            return qs
-        elif self.value() == 'Submitted':
-            qs = queryset.filter(start_date__isnull=True, end_date__isnull=True)
-            return qs
-
+        if self.value():
+            return queryset.filter(overall_status=self.value())
@@ -128,8 +128,9 @@ class RequestJobForm(forms.ModelForm):
             tgt_group_host.widget.attrs = {'onblur': "targetHosts()"}
             tgt_group_host.label = 'Host Target HostGroup'
             tgt_group_host.help_text = "Select HostGroup to autofill the target host"
+            # moved to the end, form fields being a plain dict (without move_to_end) since Django 3.0
+            self.fields.pop('tgt_group_host', None)
             self.fields['tgt_group_host'] = tgt_group_host
-            self.fields.move_to_end('tgt_group_host')
 
 
 class GroupInlineForm(forms.ModelForm):
@@ -0,0 +1,155 @@
+#   See the NOTICE file distributed with this work for additional information
+#   regarding copyright ownership.
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+"""
+Local index of the registered hosts information_schema.
+
+`index_host` snapshots SCHEMATA / TABLES into SchemaSnapshot / TableSnapshot rows. Subsequent runs only
+re-fetch the tables of schemas whose tables count or CREATE_TIME changed, and the rows whose UPDATE_TIME
+moved since the previous run.
+Snapshots younger than `DBCOPY_SCHEMA_INDEX_MAX_AGE` seconds are served instead of the live server.
+"""
+import datetime
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from ensembl.production.dbcopy.engines import get_host_engine
+from ensembl.production.dbcopy.models import Host, SchemaSnapshot, TableSnapshot
+
+logger = logging.getLogger(__name__)
+
+_SCHEMATA_SQL = "SELECT SCHEMA_NAME FROM information_schema.SCHEMATA"
+_TABLES_STATS_SQL = ("SELECT TABLE_SCHEMA, COUNT(*), MAX(CREATE_TIME), MAX(UPDATE_TIME) "
+                     "FROM information_schema.TABLES GROUP BY TABLE_SCHEMA")
+_TABLES_SQL = ("SELECT TABLE_NAME, CREATE_TIME, UPDATE_TIME, TABLE_ROWS, DATA_LENGTH, INDEX_LENGTH "
+               "FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s")
+_TABLES_UPDATED_SQL = _TABLES_SQL + " AND UPDATE_TIME > %s"
+
+
+def _aware(value):
+    # information_schema returns naive datetime in the server timezone
+    if value is None or timezone.is_aware(value):
+        return value
+    return timezone.make_aware(value, timezone.get_default_timezone(), is_dst=False)
+
+
+def _naive(value):
+    return timezone.make_naive(value, timezone.get_default_timezone())
+
+
+def _table_snapshot(schema, row):
+    return TableSnapshot(schema=schema, table_name=row[0], create_time=_aware(row[1]), update_time=_aware(row[2]),
+                         table_rows=row[3], data_length=row[4], index_length=row[5])
+
+
+def index_host(host, full=False):
+    """
+    Refresh host snapshot from its information_schema
+    :param host: Host
+    :param full: re-fetch all the tables even for unchanged schemas
+    :return: dict of counters (created / resynced / updated / dropped schemas)
+    """
+    summary = {'created': 0, 'resynced': 0, 'updated': 0, 'dropped': 0}
+    local = {snapshot.table_schema: snapshot for snapshot in host.schema_snapshots.all()}
+    resync = {}
+    updated = {}
+    engine = get_host_engine(host)
+    with engine.connect() as connection:
+        schemas = [row[0] for row in connection.exec_driver_sql(_SCHEMATA_SQL)]
+        stats = {row[0]: (row[1], _aware(row[2]), _aware(row[3]))
+                 for row in connection.exec_driver_sql(_TABLES_STATS_SQL)}
+        for name in schemas:
+            table_count, last_create, last_update = stats.get(name, (0, None, None))
+            snapshot = local.get(name)
+            if full or snapshot is None or snapshot.table_count != table_count \
+                    or snapshot.last_create_time != last_create \
+                    or (snapshot.last_update_time is None and last_update is not None):
+                resync[name] = list(connection.exec_driver_sql(_TABLES_SQL, (name,)))
+            elif snapshot.last_update_time != last_update:
+                updated[name] = list(connection.exec_driver_sql(_TABLES_UPDATED_SQL,
+                                                                (name, _naive(snapshot.last_update_time))))
+    now = timezone.now()
+    with transaction.atomic():
+        dropped = set(local).difference(schemas)
+        host.schema_snapshots.filter(table_schema__in=dropped).delete()
+        summary['dropped'] = len(dropped)
+        for name in schemas:
+            table_count, last_create, last_update = stats.get(name, (0, None, None))
+            snapshot = local.get(name)
+            if snapshot is not None and name not in resync and name not in updated:
+                continue
+            if snapshot is None:
+                snapshot = SchemaSnapshot(host=host, table_schema=name)
+                summary['created'] += 1
+            elif name in resync:
+                snapshot.tables.all().delete()
+                summary['resynced'] += 1
+            snapshot.table_count = table_count
+            snapshot.last_create_time = last_create
+            snapshot.last_update_time = last_update
+            snapshot.indexed_at = now
+            snapshot.save()
+            if name in resync:
+                TableSnapshot.objects.bulk_create([_table_snapshot(snapshot, row) for row in resync[name]])
+            elif updated.get(name):
+                changes = {row[0]: _table_snapshot(snapshot, row) for row in updated[name]}
+                tables = list(snapshot.tables.filter(table_name__in=changes.keys()))
+                for table in tables:
+                    change = changes[table.table_name]
+                    table.update_time = change.update_time
+                    table.table_rows = change.table_rows
+                    table.data_length = change.data_length
+                    table.index_length = change.index_length
+                TableSnapshot.objects.bulk_update(tables, ['update_time', 'table_rows', 'data_length',
+                                                           'index_length'])
+                summary['updated'] += 1
+        host.schema_snapshots.update(indexed_at=now)
+        host.schemas_indexed_at = now
+        host.save(update_fields=['schemas_indexed_at'])
+    logger.info("Indexed %s: %s", host, summary)
+    return summary
+
+
+def get_fresh_host(hostname, port):
+    max_age = getattr(settings, 'DBCOPY_SCHEMA_INDEX_MAX_AGE', 900)
+    if max_age <= 0:
+        return None
+    return Host.objects.filter(name=hostname, port=port, active=True,
+                               schemas_indexed_at__gte=timezone.now() - datetime.timedelta(seconds=max_age)).first()
+
+
+def snapshot_database_names(hostname, port):
+    """
+    Schema names from the local index
+    :return: list of names or None when the host index is missing or outdated
+    """
+    host = get_fresh_host(hostname, port)
+    if host is None:
+        return None
+    return list(host.schema_snapshots.values_list('table_schema', flat=True))
+
+
+def snapshot_table_names(hostname, port, database):
+    """
+    Table names from the local index
+    :return: list of names or None when the host index is missing or outdated, or when database is not in the
+    index, as it may have been created since the last index run
+    """
+    host = get_fresh_host(hostname, port)
+    if host is None:
+        return None
+    schema = host.schema_snapshots.filter(table_schema=database).first()
+    if schema is None:
+        return None
+    return list(schema.tables.values_list('table_name', flat=True))
@@ -13,27 +13,14 @@ import logging
 
 from dal import autocomplete
 from django.core.exceptions import ObjectDoesNotExist
-from ensembl.production.core.db_introspects import get_database_set, get_table_set
+from .catalog import get_table_set
 from .models import Host, Dbs2Exclude
+from .search import search_database_names
 from sqlalchemy.exc import DBAPIError
 
 logger = logging.getLogger(__name__)
 
 
-def make_excluded_schemas():
-    schemas = set()
-
-    def closure():
-        if not schemas:
-            schemas.update(Dbs2Exclude.objects.values_list('table_schema', flat=True))
-        return schemas
-
-    return closure
-
-
-get_excluded_schemas = make_excluded_schemas()
-
-
 class SrcHostLookup(autocomplete.Select2QuerySetView):
     model = Host
     paginate_by = 10
@@ -68,21 +55,22 @@ class TgtHostLookup(autocomplete.Select2ListView):
 
 
 class DbLookup(autocomplete.Select2ListView):
+    paginate_by = 20
+
     def get_list(self):
         """
-        Return a list of all schema names
+        Return the best ranked schema names matching the search
         """
         search = self.q or ''
         result = []
         if self.q:
             try:
                 host, port = self.forwarded.get('db_host').split(':')
-                name_filter = f".*{search.replace('%', '.*')}.*"
-                logger.debug("Filter set to %s", name_filter)
+                logger.debug("Search set to %s", search)
                 srv_host = Host.objects.get(name=host, port=port)
-                result = get_database_set(host, port, user=srv_host.mysql_user,
-                                          incl_filters=[name_filter],
-                                          skip_filters=get_excluded_schemas())
+                result = search_database_names(host, port, search, user=srv_host.mysql_user,
+                                               limit=self.paginate_by,
+                                               exclude=Dbs2Exclude.objects.excluded_schemas())
 
             except (ValueError, ObjectDoesNotExist) as e:
                 # TODO manage proper error
@@ -92,6 +80,10 @@ class DbLookup(autocomplete.Select2ListView):
                 logger.error("Db Lookup query error: ", str(e.orig))
         return result
 
+    def autocomplete_results(self, results):
+        # results are already matched and ranked against the search
+        return results
+
 
 class TableLookup(autocomplete.Select2ListView):
     def get_list(self):
@@ -105,8 +97,7 @@ class TableLookup(autocomplete.Select2ListView):
                 database = self.forwarded.get('src_incl_db')[0]
                 # TODO See if we could managed a set of default excluded tables
                 logger.debug("Inspecting %s:%s/%s w/ %s", host, port, database, self.q)
-                table_filter = f".*{self.q.replace('%', '.*')}.*"
-                result = get_table_set(host, port, database, incl_filters=[table_filter])
+                result = get_table_set(host, port, database, incl_filters=[self.q], contains=True)
             except (ValueError, ObjectDoesNotExist) as e:
                 # TODO manage proper error
                 logger.error("Db Table Lookup query error: %s ", str(e))
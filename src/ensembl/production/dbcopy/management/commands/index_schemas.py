@@ -0,0 +1,57 @@
+#   See the NOTICE file distributed with this work for additional information
+#   regarding copyright ownership.
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from sqlalchemy.exc import DBAPIError
+
+from ensembl.production.dbcopy.indexer import index_host
+from ensembl.production.dbcopy.models import Host
+
+
+class Command(BaseCommand):
+    help = "Snapshot information_schema SCHEMATA and TABLES of the active hosts into the local index"
+
+    def add_arguments(self, parser):
+        parser.add_argument('hosts', nargs='*', metavar='host:port',
+                            help="Hosts to index (default: all active hosts)")
+        parser.add_argument('--full', action='store_true',
+                            help="Re-fetch every table instead of the changed ones only")
+        parser.add_argument('--loop', type=int, default=0, metavar='SECONDS',
+                            help="Keep running and refresh the index every SECONDS")
+
+    def get_hosts(self, names):
+        hosts = Host.objects.filter(active=True)
+        if not names:
+            return list(hosts)
+        selected = []
+        for name in names:
+            try:
+                hostname, port = name.split(':')
+                selected.append(hosts.get(name=hostname, port=port))
+            except (ValueError, Host.DoesNotExist):
+                raise CommandError("Unknown active host %s" % name)
+        return selected
+
+    def handle(self, *args, **options):
+        while True:
+            for host in self.get_hosts(options['hosts']):
+                try:
+                    summary = index_host(host, full=options['full'])
+                    self.stdout.write("%s: %s" % (host, summary))
+                except (DBAPIError, ValueError) as e:
+                    self.stderr.write("%s: unable to index (%s)" % (host, e))
+            if not options['loop']:
+                break
+            close_old_connections()
+            time.sleep(options['loop'])
@@ -0,0 +1,33 @@
+#   See the NOTICE file distributed with this work for additional information
+#   regarding copyright ownership.
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+from django.core.management.base import BaseCommand
+
+from ensembl.production.dbcopy.counters import refresh_counters, refresh_overall_status
+from ensembl.production.dbcopy.models import RequestJob, TransferLog
+
+
+class Command(BaseCommand):
+    help = "Recompute the jobs transfer counters (expected / completed) from transfer_log, then their overall status"
+
+    def add_arguments(self, parser):
+        parser.add_argument('jobs', nargs='*', metavar='job_id',
+                            help="Jobs to refresh (default: all jobs)")
+        parser.add_argument('--status-only', action='store_true',
+                            help="Only recompute the overall status (e.g. to backfill it)")
+
+    def handle(self, *args, **options):
+        jobs = RequestJob.objects.all()
+        if options['jobs']:
+            jobs = jobs.filter(job_id__in=options['jobs'])
+        if not options['status_only']:
+            self.stdout.write("%d job(s) counters refreshed" % refresh_counters(jobs, TransferLog.objects.all()))
+        self.stdout.write("%d job(s) status refreshed" % refresh_overall_status(jobs))
@@ -0,0 +1,36 @@
+#   See the NOTICE file distributed with this work for additional information
+#   regarding copyright ownership.
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from ensembl.production.dbcopy.throughput import downsample, record_samples
+
+
+class Command(BaseCommand):
+    help = "Sample the running jobs progress (tables and bytes done), then thin out the ended jobs samples"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', type=int, default=0, metavar='SECONDS',
+                            help="Keep running and sample every SECONDS")
+        parser.add_argument('--kept', type=int, default=None, metavar='SAMPLES',
+                            help="Samples kept per ended job (default: DBCOPY_PROGRESS_SAMPLES_KEPT, 20)")
+
+    def handle(self, *args, **options):
+        while True:
+            self.stdout.write("%d job(s) sampled" % record_samples())
+            self.stdout.write("%d sample(s) of ended jobs deleted" % downsample(kept=options['kept']))
+            if not options['loop']:
+                break
+            close_old_connections()
+            time.sleep(options['loop'])
@@ -0,0 +1,54 @@
+# Generated by Django 3.2.25 on 2026-10-17 02:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ensembl_dbcopy', '0011_alter_requestjob_src_incl_db'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='host',
+            name='schemas_indexed_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Schemas indexed on'),
+        ),
+        migrations.CreateModel(
+            name='SchemaSnapshot',
+            fields=[
+                ('auto_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('table_schema', models.CharField(max_length=64)),
+                ('table_count', models.IntegerField(default=0)),
+                ('last_create_time', models.DateTimeField(blank=True, null=True)),
+                ('last_update_time', models.DateTimeField(blank=True, null=True)),
+                ('indexed_at', models.DateTimeField()),
+                ('host', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schema_snapshots', to='ensembl_dbcopy.host')),
+            ],
+            options={
+                'verbose_name': 'Schema snapshot',
+                'db_table': 'schema_snapshot',
+                'unique_together': {('host', 'table_schema')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TableSnapshot',
+            fields=[
+                ('auto_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('table_name', models.CharField(max_length=64)),
+                ('create_time', models.DateTimeField(blank=True, null=True)),
+                ('update_time', models.DateTimeField(blank=True, null=True)),
+                ('table_rows', models.BigIntegerField(blank=True, null=True)),
+                ('data_length', models.BigIntegerField(blank=True, null=True)),
+                ('index_length', models.BigIntegerField(blank=True, null=True)),
+                ('schema', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tables', to='ensembl_dbcopy.schemasnapshot')),
+            ],
+            options={
+                'verbose_name': 'Table snapshot',
+                'db_table': 'table_snapshot',
+                'unique_together': {('schema', 'table_name')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.2.25 on 2026-10-17 02:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ensembl_dbcopy', '0012_schema_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='requestjob',
+            name='estimated_bytes',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name='Estimated size'),
+        ),
+        migrations.AddField(
+            model_name='requestjob',
+            name='estimated_rows',
+            field=models.BigIntegerField(blank=True, editable=False, null=True, verbose_name='Estimated rows'),
+        ),
+        migrations.AddField(
+            model_name='requestjob',
+            name='estimated_tables',
+            field=models.IntegerField(blank=True, editable=False, null=True, verbose_name='Estimated tables'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 3.2.25 on 2026-10-17 03:00
+
+from django.db import migrations, models
+
+from ensembl.production.dbcopy.utils import params_fingerprint
+
+EQ_PARAMS = ('src_host', 'src_incl_db', 'src_skip_db', 'src_incl_tables', 'src_skip_tables', 'tgt_host', 'tgt_db_name')
+
+
+def backfill_fingerprints(apps, schema_editor):
+    """
+    Fingerprint existing jobs, the latest job of each group holding its active fingerprint: when ended,
+    it is released on the next equivalent submission.
+    """
+    RequestJob = apps.get_model('ensembl_dbcopy', 'RequestJob')
+    claimed = set()
+    for job in RequestJob.objects.order_by('-request_date').only('job_id', *EQ_PARAMS).iterator():
+        fingerprint = params_fingerprint({k: getattr(job, k) for k in EQ_PARAMS})
+        active_fingerprint = None if fingerprint in claimed else fingerprint
+        claimed.add(fingerprint)
+        RequestJob.objects.filter(job_id=job.job_id).update(params_fingerprint=fingerprint,
+                                                            active_fingerprint=active_fingerprint)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ensembl_dbcopy', '0013_job_estimates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='requestjob',
+            name='active_fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='requestjob',
+            name='params_fingerprint',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.RunPython(backfill_fingerprints, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.25 on 2026-10-17 04:30
+
+from django.db import migrations
+
+from ensembl.production.dbcopy.counters import drop_triggers, install_triggers, refresh_counters
+
+
+def create_triggers(apps, schema_editor):
+    install_triggers(schema_editor)
+
+
+def remove_triggers(apps, schema_editor):
+    drop_triggers(schema_editor)
+
+
+def backfill_counters(apps, schema_editor):
+    RequestJob = apps.get_model('ensembl_dbcopy', 'RequestJob')
+    TransferLog = apps.get_model('ensembl_dbcopy', 'TransferLog')
+    refresh_counters(RequestJob.objects.all(), TransferLog.objects.all())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ensembl_dbcopy', '0014_job_fingerprint'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_triggers, remove_triggers),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.25 on 2026-10-17 03:07
+
+from django.db import migrations, models
+
+from ensembl.production.dbcopy.counters import refresh_overall_status
+
+
+def backfill_overall_status(apps, schema_editor):
+    RequestJob = apps.get_model('ensembl_dbcopy', 'RequestJob')
+    refresh_overall_status(RequestJob.objects.all())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ensembl_dbcopy', '0015_transfer_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='requestjob',
+            index=models.Index(fields=['overall_status', 'request_date'], name='request_job_status_idx'),
+        ),
+        migrations.RunPython(backfill_overall_status, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 3.2.25 on 2026-10-17 03:09
+
+from django.db import migrations, models
+
+from ensembl.production.dbcopy.counters import STATUS_TRIGGERS, drop_triggers, install_triggers, \
+    parse_try_status, refresh_overall_status
+
+
+def create_triggers(apps, schema_editor):
+    # overall status and progress, from the status and the transfer counters
+    install_triggers(schema_editor, STATUS_TRIGGERS)
+
+
+def remove_triggers(apps, schema_editor):
+    drop_triggers(schema_editor, STATUS_TRIGGERS)
+
+
+def backfill_progress(apps, schema_editor):
+    RequestJob = apps.get_model('ensembl_dbcopy', 'RequestJob')
+    jobs = RequestJob.objects.all()
+    for job_id, status in jobs.filter(status__startswith='Try:').values_list('pk', 'status').iterator():
+        progress = parse_try_status(status)
+        if progress:
+            jobs.filter(pk=job_id).update(**progress._asdict())
+    refresh_overall_status(jobs)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ensembl_dbcopy', '0016_overall_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='requestjob',
+            name='copied',
+            field=models.IntegerField(blank=True, editable=False, null=True, verbose_name='Copies done'),
+        ),
+        migrations.AddField(
+            model_name='requestjob',
+            name='current_try',
+            field=models.IntegerField(blank=True, editable=False, null=True, verbose_name='Current try'),
+        ),
+        migrations.AddField(
+            model_name='requestjob',
+            name='max_tries',
+            field=models.IntegerField(blank=True, editable=False, null=True, verbose_name='Max tries'),
+        ),
+        migrations.AddField(
+            model_name='requestjob',
+            name='total_copies',
+            field=models.IntegerField(blank=True, editable=False, null=True, verbose_name='Copies to do'),
+        ),
+        migrations.RunPython(create_triggers, remove_triggers),
+        migrations.RunPython(backfill_progress, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.25 on 2026-10-17 03:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ensembl_dbcopy', '0017_try_progress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProgressSample',
+            fields=[
+                ('auto_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('sampled_at', models.DateTimeField()),
+                ('tables_done', models.IntegerField()),
+                ('bytes_done', models.BigIntegerField()),
+                ('job', models.ForeignKey(db_column='job_id', db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='progress_samples', to='ensembl_dbcopy.requestjob')),
+            ],
+            options={
+                'verbose_name': 'Progress sample',
+                'db_table': 'progress_sample',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='progresssample',
+            index=models.Index(fields=['job', 'sampled_at'], name='progress_sample_job_idx'),
+        ),
+    ]
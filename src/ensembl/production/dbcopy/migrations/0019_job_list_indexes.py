@@ -0,0 +1,37 @@
+# Generated by Django 3.2.25 on 2026-10-17 03:15
+
+from django.db import migrations, models
+
+HOST_INDEXES = {'request_job_src_host_idx': 'src_host', 'request_job_tgt_host_idx': 'tgt_host'}
+
+
+def create_host_indexes(apps, schema_editor):
+    # MySQL only indexes a TEXT column prefix
+    prefix = '(255)' if schema_editor.connection.vendor == 'mysql' else ''
+    for name, column in HOST_INDEXES.items():
+        schema_editor.execute('CREATE INDEX {} ON request_job ({}{}, request_date)'.format(name, column, prefix), None)
+
+
+def drop_host_indexes(apps, schema_editor):
+    on_table = ' ON request_job' if schema_editor.connection.vendor == 'mysql' else ''
+    for name in HOST_INDEXES:
+        schema_editor.execute('DROP INDEX {}{}'.format(name, on_table), None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ensembl_dbcopy', '0018_progress_sample'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='requestjob',
+            index=models.Index(fields=['request_date', 'job_id'], name='request_job_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='requestjob',
+            index=models.Index(fields=['username', 'request_date'], name='request_job_user_idx'),
+        ),
+        migrations.RunPython(create_host_indexes, drop_host_indexes),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 3.2.25 on 2026-10-17 04:52
+
+from django.db import migrations, models
+from django.utils import timezone
+
+from ensembl.production.dbcopy.counters import LAST_CHANGED_TRIGGERS, drop_triggers, install_triggers
+
+
+def create_triggers(apps, schema_editor):
+    install_triggers(schema_editor, LAST_CHANGED_TRIGGERS)
+
+
+def remove_triggers(apps, schema_editor):
+    drop_triggers(schema_editor, LAST_CHANGED_TRIGGERS)
+
+
+def backfill_last_changed(apps, schema_editor):
+    RequestJob = apps.get_model('ensembl_dbcopy', 'RequestJob')
+    RequestJob.objects.update(last_changed=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ensembl_dbcopy', '0020_cache_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='requestjob',
+            name='last_changed',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Last changed'),
+        ),
+        migrations.RunPython(create_triggers, remove_triggers),
+        migrations.RunPython(backfill_last_changed, migrations.RunPython.noop),
+    ]
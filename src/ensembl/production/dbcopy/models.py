@@ -9,22 +9,31 @@
 #   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
+import datetime
 import logging
-import re
+import threading
+import time
 import uuid
 
+from asgiref.local import Local
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Prefetch
+from django.template.defaultfilters import filesizeformat
 from django.urls import reverse
+from django.utils import timezone
 from django.utils.html import format_html
-from ensembl.production.core.db_introspects import get_database_set
 
-from ensembl.production.dbcopy.utils import get_filters
+from ensembl.production.dbcopy.counters import ENDED_STATUSES, TryProgress, overall_status, parse_try_status
+from ensembl.production.dbcopy.patterns import filter_names
+from ensembl.production.dbcopy.utils import fan_out, get_filters, params_fingerprint
 from ensembl.production.djcore.forms import EmailListFieldValidator, ListFieldRegexValidator
 from ensembl.production.djcore.models import NullTextField
 
@@ -43,13 +52,105 @@ class RequestJobManager(models.Manager):
         "tgt_db_name": "tgt_db_name__iexact",
     }
 
+    @classmethod
+    def fingerprint(cls, **params):
+        """
+        :return: str, params_fingerprint of the equivalence parameters (missing ones being unset)
+        """
+        return params_fingerprint({k: params.get(k) for k in cls._EQ_PARAMS.keys()})
+
     def equivalent_jobs(self, **filters):
-        filters_exact = {self._EQ_PARAMS[k]: filters.get(k) for k in self._EQ_PARAMS.keys()}
         queryset = self.get_queryset()
-        return queryset.filter(**filters_exact).order_by("-request_date")
+        return queryset.filter(params_fingerprint=self.fingerprint(**filters)).order_by("-request_date")
+
+
+class CacheVersion(models.Model):
+    """
+    Version stamps of the data cached in each process, read once per request (on each lookup out of requests) so
+    that a change is seen by all workers from their next request, whatever the Django cache backend
+    """
+    class Meta:
+        db_table = 'cache_version'
+        app_label = 'ensembl_dbcopy'
+
+    key = models.CharField(primary_key=True, max_length=64)
+    version = models.CharField(max_length=32)
+
+
+# version stamps read in the current request: {version_key: version}, None out of requests
+_request = Local()
+
+
+def _cache_version(version_key):
+    """
+    :return: version stamp stored under version_key, '' when never bumped
+    """
+    versions = getattr(_request, 'versions', None)
+    if versions is not None and version_key in versions:
+        return versions[version_key]
+    version = CacheVersion.objects.filter(key=version_key).values_list('version', flat=True).first() or ''
+    if versions is not None:
+        versions[version_key] = version
+    return version
+
+
+def _bump_cache_version(version_key):
+    version = uuid.uuid4().hex
+    CacheVersion.objects.update_or_create(key=version_key, defaults={'version': version})
+    versions = getattr(_request, 'versions', None)
+    if versions is not None:
+        versions[version_key] = version
+
+
+def memoize_cache_versions():
+    """
+    Read each version stamp once until forget_cache_versions, called on each request start
+    (see ensembl.production.dbcopy.signals)
+    """
+    _request.versions = {}
+
+
+def forget_cache_versions():
+    """
+    Read the version stamps on each lookup again, called on each request end
+    """
+    _request.versions = None
+
+
+class Dbs2ExcludeManager(models.Manager):
+    """
+    Excluded schemas are cached in each process, with a version stamp stored in the database (see CacheVersion).
+    Changes are picked up by all workers as soon as the version is bumped (see ensembl.production.dbcopy.signals),
+    and changes made outside Django at most `DBCOPY_EXCLUDED_SCHEMAS_MAX_AGE` seconds later.
+    """
+    version_key = 'ensembl_dbcopy:dbs_2_exclude:version'
+    _cached = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def bump_version(cls):
+        _bump_cache_version(cls.version_key)
+        with cls._lock:
+            cls._cached = None
+
+    def excluded_schemas(self):
+        """
+        :return: frozenset of the schema names never to be listed nor copied
+        """
+        version = _cache_version(self.version_key)
+        max_age = getattr(settings, 'DBCOPY_EXCLUDED_SCHEMAS_MAX_AGE', 300)
+        cached = self._cached
+        if cached is not None and cached[0] == version and time.monotonic() - cached[1] < max_age:
+            return cached[2]
+        schemas = frozenset(self.values_list('table_schema', flat=True))
+        with self._lock:
+            Dbs2ExcludeManager._cached = (version, time.monotonic(), schemas)
+        return schemas
 
 
 class Dbs2Exclude(models.Model):
+    objects = Dbs2ExcludeManager()
+
     table_schema = models.CharField(primary_key=True, db_column='TABLE_SCHEMA',
                                     max_length=64)  # Field name made lowercase.
 
@@ -65,6 +166,11 @@ class RequestJob(models.Model):
         verbose_name = "Copy job"
         verbose_name_plural = "Copy jobs"
         ordering = ('-request_date',)
+        # plus request_job_src_host_idx and request_job_tgt_host_idx, on the TEXT hosts columns prefix
+        # (see migration 0019_job_list_indexes)
+        indexes = [models.Index(fields=['overall_status', 'request_date'], name='request_job_status_idx'),
+                   models.Index(fields=['request_date', 'job_id'], name='request_job_date_idx'),
+                   models.Index(fields=['username', 'request_date'], name='request_job_user_idx')]
 
     objects = RequestJobManager()
 
@@ -95,14 +201,29 @@ class RequestJob(models.Model):
     end_date = models.DateTimeField("Ended on", blank=True, null=True, editable=False)
     username = models.CharField("Submitter", max_length=64, blank=False, null=True, db_column='user')
     status = models.CharField("Status", max_length=40, blank=True, null=True, editable=False)
+    # copy service progress, parsed from legacy Try:<current_try>/<max_tries>. <copied>/<total_copies> statuses
+    current_try = models.IntegerField("Current try", blank=True, null=True, editable=False)
+    max_tries = models.IntegerField("Max tries", blank=True, null=True, editable=False)
+    copied = models.IntegerField("Copies done", blank=True, null=True, editable=False)
+    total_copies = models.IntegerField("Copies to do", blank=True, null=True, editable=False)
+    # computed from status and the transfer counters, see ensembl.production.dbcopy.counters
     overall_status = models.CharField("Overall Status", max_length=48, blank=True, null=True, editable=False)
     expected = models.IntegerField("Expected to transfer", blank=True, null=True, editable=False)
     completed = models.IntegerField("Transfers completed", blank=True, null=True, editable=False)
+    estimated_tables = models.IntegerField("Estimated tables", blank=True, null=True, editable=False)
+    estimated_rows = models.BigIntegerField("Estimated rows", blank=True, null=True, editable=False)
+    estimated_bytes = models.BigIntegerField("Estimated size", blank=True, null=True, editable=False)
+    # Equivalence parameters hash, see RequestJobManager. Also held, uniquely, by the job active in its group.
+    params_fingerprint = models.CharField(max_length=64, blank=True, null=True, editable=False, db_index=True)
+    active_fingerprint = models.CharField(max_length=64, blank=True, null=True, editable=False, unique=True)
 
     request_date = models.DateTimeField("Submitted on", editable=False, auto_now_add=True)
+    # set on every job or transfers change, by the database triggers or Django (see ensembl.production.dbcopy.counters)
+    last_changed = models.DateTimeField("Last changed", blank=True, null=True, editable=False)
 
-    __running_transfers = None
-    __nb_transfers = None
+    # transfer_log counters, maintained by the database (see ensembl.production.dbcopy.counters)
+    _COUNTER_FIELDS = ('expected', 'completed')
+    _validation_context = None
 
     def __str__(self):
         return "[%s]:%s" % (self.job_id, self.src_host)
@@ -131,50 +252,27 @@ class RequestJob(models.Model):
 
     @property
     def running_transfers(self):
-        if self.__running_transfers is None:
-            self.__running_transfers = self.transfer_logs.filter(end_date__isnull=True).count()
-        return self.__running_transfers
+        return self.nb_transfers - self.done_transfers
 
     @property
     def nb_transfers(self):
-        if self.__nb_transfers is None:
-            self.__nb_transfers = self.transfer_logs.count()
-        return self.__nb_transfers
+        return self.expected or 0
+
+    @property
+    def try_progress(self):
+        """
+        :return: TryProgress or None when the copy service did not report its progress
+        """
+        progress = TryProgress(self.current_try, self.max_tries, self.copied, self.total_copies)
+        return progress if None not in progress else None
 
     @property
     def global_status(self):
-        if self.status:
-            if self.status == 'Transfer Ended':
-                return "Complete"
-            elif self.status.strip().startswith("Try:"):
-                m = re.match(
-                    r"^Try:(?P<tries>\d+)/(?P<total_tries>\d+). (?P<copied>\d+)/(?P<total_copies>\d+) Transferred$",
-                    self.status.strip()
-                )
-                if m:
-                    tries = int(m.group("tries"))
-                    total_tries = int(m.group("total_tries"))
-                    copied = int(m.group("copied"))
-                    total_copies = int(m.group("total_copies"))
-                    if copied == total_copies:
-                        return "Complete"
-                    if (tries == total_tries) and (copied < total_copies):
-                        return "Failed"
-                    if tries < total_tries:
-                        if self.running_transfers == 0:
-                            return "Failed"
-                        return "Running"
-            elif self.status == 'Processing Requests':
-                return 'Running'
-            elif self.status == 'Creating Requests':
-                return 'Scheduled'
-            elif self.status.strip().lower().startswith("error"):
-                return "Failed"
-        return 'Submitted'
+        return self.overall_status or overall_status(self.status, self.running_transfers, self.try_progress)
 
     @property
     def done_transfers(self):
-        return self.nb_transfers - self.running_transfers
+        return self.completed or 0
 
     @property
     def progress(self):
@@ -184,26 +282,43 @@ class RequestJob(models.Model):
 
     @property
     def is_active(self):
-        return not (self.global_status in ("Complete", "Failed"))
+        return self.global_status not in ENDED_STATUSES
 
     @property
     def detailed_status(self):
+        """
+        Job status from its row only, see RequestJobDetailSerializer for the throughput added to it on the job detail
+        """
         return {'status_msg': self.global_status,
                 'status': self.status,
                 'table_copied': self.done_transfers,
                 'total_tables': self.nb_transfers,
+                'current_try': self.current_try,
+                'max_tries': self.max_tries,
                 'progress': self.progress}
 
+    @property
+    def validation_context(self):
+        """
+        Hosts introspection memo used by the clean_* steps, see full_clean
+        :return: ValidationContext
+        """
+        if self._validation_context is None:
+            from ensembl.production.dbcopy.validation import ValidationContext
+            self._validation_context = ValidationContext()
+        return self._validation_context
+
     def _clean_db_set_for_filters(self, from_host, field):
         host, port = from_host.split(':')
-        name_filters = get_filters(getattr(self, field))
-        filters_regexes = [f".*{name}.*" for name in name_filters]
+        name_filters = get_filters(getattr(self, field).split(','))
+        context = self.validation_context
         try:
-            srv_host = Host.objects.get(name=host, port=port)
-            src_db_set = get_database_set(hostname=host, port=port,
-                                          user=srv_host.mysql_user,
-                                          incl_filters=filters_regexes,
-                                          skip_filters=Dbs2Exclude.objects.values_list('table_schema', flat=True))
+            if context.host(host, port) is None:
+                raise ValueError('Unknown host: {}'.format(from_host))
+            src_db_set = context.database_set(host, port,
+                                              incl_filters=name_filters,
+                                              skip_filters=context.excluded_schemas(),
+                                              contains=True)
             if len(src_db_set) == 0:
                 raise ValidationError({'src_incl_db': 'No db matching incl. %s' % (name_filters,)})
         except ValueError as e:
@@ -231,17 +346,16 @@ class RequestJob(models.Model):
         :return: None
         :raise: ValidationError
         """
-        from ensembl.production.core.db_introspects import get_database_set
-
         if self.src_host in self.tgt_host:
 
             hostname, port = self.src_host.split(':')
+            context = self.validation_context
             try:
-                srv_host = Host.objects.get(name=hostname, port=port)
-                present_dbs = get_database_set(hostname, port,
-                                               user=srv_host.mysql_user,
-                                               skip_filters=Dbs2Exclude.objects.values_list('table_schema',
-                                                                                            flat=True))
+                if context.host(hostname, port) is None:
+                    raise ValueError('Unknown host: {}'.format(self.src_host))
+                # the source host being a target, its names are read live as for the wipe target check
+                present_dbs = context.database_set(hostname, port, skip_filters=context.excluded_schemas(),
+                                                   fresh=True)
             except ValueError as e:
                 raise ValidationError({'src_host': 'Invalid source hostname or port'},
                                       'invalid')
@@ -280,23 +394,23 @@ class RequestJob(models.Model):
 
     def clean_wipe_target(self):
         """
-        Check wipe target values
+        Check wipe target values, targets being introspected concurrently, from the servers and not the catalog
         :return: None
         :raise: ValidationError
         """
-        from ensembl.production.core.db_introspects import get_engine, get_schema_names
         incl_db = _text_field_as_set(self.src_incl_db)
         tgt_db_names = _text_field_as_set(self.tgt_db_name)
         new_db_names = _text_field_as_set(self.tgt_db_name) if self.tgt_db_name else incl_db
         if (self.wipe_target is False) and (not self.src_incl_tables) and new_db_names:
-            for tgt_host in self.tgt_host.split(','):
-                hostname, port = tgt_host.split(':')
-                try:
-                    db_engine = get_engine(hostname, port)
-                except RuntimeError as e:
-                    raise ValidationError({'tgt_host': 'Invalid host: %(tgt_host)s'}, 'invalid',
-                                          {'tgt_host', tgt_host})
-                tgt_present_db_names = set(get_schema_names(db_engine))
+            targets = [tuple(tgt_host.split(':')) for tgt_host in self.tgt_host.split(',')]
+            context = self.validation_context
+            context.prefetch_hosts(hostname for hostname, _ in targets)
+            for (hostname, port), tgt_present_db_names, error in fan_out(
+                    lambda target: context.database_names(*target, fresh=True), targets):
+                if error is not None:
+                    logger.debug("Unable to introspect %s:%s: %s", hostname, port, error)
+                    raise ValidationError({'tgt_host': ValidationError('Invalid host: %(tgt_host)s', 'invalid', {
+                        'tgt_host': '{}:{}'.format(hostname, port)})})
                 if tgt_present_db_names.intersection(new_db_names):
                     field_name = 'tgt_db_name' if tgt_db_names else 'src_incl_db'
                     raise ValidationError({field_name: 'One or more database names already present on'
@@ -308,22 +422,54 @@ class RequestJob(models.Model):
         :return: None
         :raise: ValidationError
         """
-        for tgt_host in self.tgt_host.split(','):
-            hostname = tgt_host.split(':')[0]
-            hosts = Host.objects.filter(name=hostname)
-            if not hosts:
-                raise ValidationError({'tgt_host': "%(hostname)s is not present in our system"},
-                                      'invalid',
-                                      {'hostname': hostname})
-            group = HostGroup.objects.filter(host_id=hosts[0].auto_id)
-            if group:
-                host_groups = group.values_list('group_name', flat=True)
-                user_groups = self.user.groups.values_list('name', flat=True)
-                common_groups = set(host_groups).intersection(set(user_groups))
-                if not common_groups and not self.user.is_superuser:
-                    raise ValidationError({'tgt_host': "You are not allowed to copy to %(hostname)s"},
-                                          'forbidden',
-                                          {'hostname': hostname})
+        hostnames = [tgt_host.split(':')[0] for tgt_host in self.tgt_host.split(',')]
+        context = self.validation_context
+        context.prefetch_hosts(hostnames)
+        hosts = {hostname: context.hosts(hostname)[0].auto_id for hostname in hostnames if context.hosts(hostname)}
+        forbidden_ids = None
+        for hostname in hostnames:
+            if hostname not in hosts:
+                raise ValidationError({'tgt_host': ValidationError("%(hostname)s is not present in our system",
+                                                                   'invalid',
+                                                                   {'hostname': hostname})})
+            if forbidden_ids is None:
+                user = self.user
+                forbidden_ids = set() if user.is_superuser else \
+                    {host_id for host_id, _ in HostGroup.objects.forbidden_hosts(user)}
+            if hosts[hostname] in forbidden_ids:
+                raise ValidationError({'tgt_host': ValidationError("You are not allowed to copy to %(hostname)s",
+                                                                   'forbidden',
+                                                                   {'hostname': hostname})})
+
+    def clean_hosts(self, context=None):
+        """
+        Check the job against the source and target hosts content and the user permissions on the targets.
+        These checks are not part of full_clean, model clean_<field> methods being never called by Django.
+        :param context: ValidationContext shared with other validations, this job's one by default
+        :return: None
+        :raise: ValidationError gathering all the checks errors
+        """
+        if context is not None:
+            self._validation_context = context
+        errors = {}
+        for check in (self.clean_src_incl_db, self.clean_src_skip_db, self.clean_tgt_host, self.clean_tgt_db_name,
+                      self.clean_wipe_target, self.clean_username):
+            try:
+                check()
+            except ValidationError as e:
+                errors = e.update_error_dict(errors)
+        if errors:
+            raise ValidationError(errors)
+
+    def full_clean(self, exclude=None, validate_unique=True, context=None):
+        """
+        :param context: ValidationContext to share with other validations, e.g. when checking many jobs
+        """
+        if context is not None:
+            self._validation_context = context
+        # fingerprints are set by save, their uniqueness being enforced by the database
+        exclude = list(exclude or []) + ['params_fingerprint', 'active_fingerprint']
+        super().full_clean(exclude, validate_unique)
 
     def clean(self):
         """
@@ -342,32 +488,123 @@ class RequestJob(models.Model):
                                       'forbidden')
         super().clean()
 
-    def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
+    def save(self, force_insert=False, force_update=False, using=None, update_fields=None, context=None):
         """ Override default save.
         Enforce clean to be called on every save
+        :param context: ValidationContext shared with other saves, e.g. when resubmitting many jobs
         """
 
         if not self.email_list and self.username:
             self.email_list = ','.join(
                 [user.email for user in User.objects.filter(username__in=self.username.split(','))])
-        self.full_clean()
+        self.full_clean(context=context)
+        if not self._state.adding:
+            self.refresh_from_db(fields=self._COUNTER_FIELDS)
+        legacy_progress = parse_try_status(self.status)
+        if legacy_progress:
+            self.current_try, self.max_tries, self.copied, self.total_copies = legacy_progress
+        self.overall_status = overall_status(self.status, self.running_transfers, self.try_progress)
+        self.last_changed = timezone.now()
+        params = {k: getattr(self, k) for k in self.__class__.objects._EQ_PARAMS.keys()}
+        fingerprint = self.__class__.objects.fingerprint(**params)
+        changed = fingerprint != self.params_fingerprint
+        self.params_fingerprint = fingerprint
         if self._state.adding:
-            for job in self.get_equivalent_jobs():
-                if job.is_active:
-                    raise ValidationError(
-                        {"error": "A job with the same parameters is already in the system.", "job_id": job.job_id},
-                        'invalid'
-                    )
-        super().save(force_insert, force_update, using, update_fields)
+            holder = self._active_equivalent_job()
+            if holder is not None:
+                raise self._equivalent_job_error(holder)
+            self.active_fingerprint = fingerprint
+            if self.estimated_tables is None and getattr(settings, 'DBCOPY_PLAN_ON_SUBMIT', False):
+                self.estimate()
+        elif not self.is_active:
+            self.active_fingerprint = None
+        elif changed or self.active_fingerprint is None:
+            # an updated job only claims its group when no other job is active in it
+            self.active_fingerprint = fingerprint if self._active_equivalent_job() is None else None
+        if update_fields is not None:
+            update_fields = set(update_fields).union({'params_fingerprint', 'active_fingerprint', 'last_changed'})
+        elif not self._state.adding and not force_insert:
+            # never overwrite the counters with possibly outdated values
+            update_fields = [field.attname for field in self._meta.concrete_fields
+                             if not field.primary_key and field.attname not in self._COUNTER_FIELDS]
+        try:
+            with transaction.atomic(using=using):
+                super().save(force_insert, force_update, using, update_fields)
+        except IntegrityError:
+            # an equivalent job was submitted concurrently
+            holder = self._active_equivalent_job() if self.active_fingerprint else None
+            if holder is None:
+                raise
+            if self._state.adding:
+                raise self._equivalent_job_error(holder)
+            self.active_fingerprint = None
+            super().save(force_insert, force_update, using, update_fields)
+
+    def _active_equivalent_job(self):
+        """
+        Active job holding this job's fingerprint, the one of a job found ended being released.
+        :return: RequestJob or None
+        """
+        holder = self.__class__.objects.filter(active_fingerprint=self.params_fingerprint).exclude(
+            job_id=self.job_id).first()
+        if holder is None or holder.is_active:
+            return holder
+        self.__class__.objects.filter(job_id=holder.job_id, active_fingerprint=self.params_fingerprint).update(
+            active_fingerprint=None)
+        return None
+
+    @staticmethod
+    def _equivalent_job_error(job):
+        return ValidationError(
+            {"error": "A job with the same parameters is already in the system.", "job_id": job.job_id},
+            'invalid'
+        )
+
+    def estimate(self, context=None):
+        """
+        Set estimated tables / rows / bytes from the source information_schema.
+        Estimation failures are logged and leave the fields unset.
+        :param context: ValidationContext shared with other jobs estimates, this job's one by default
+        :return: JobPlan or None
+        """
+        from ensembl.production.dbcopy.planner import plan_job
+        if context is not None:
+            self._validation_context = context
+        try:
+            plan = plan_job(self, self.validation_context)
+        except Exception as e:
+            logger.warning("Unable to estimate job %s size: %s", self.job_id, e)
+            return None
+        self.estimated_tables = plan.tables
+        self.estimated_rows = plan.rows
+        self.estimated_bytes = plan.bytes
+        return plan
+
+    @property
+    def throughput(self):
+        """
+        Two progress samples queries, to be read on a single job view only
+        :return: Throughput or None, see ensembl.production.dbcopy.throughput.job_throughput
+        """
+        from ensembl.production.dbcopy.throughput import job_throughput
+        return job_throughput(self)
 
     @property
     def completion(self):
+        throughput = self.throughput
+        if throughput is None:
+            rate = ''
+        else:
+            rate = '{}/s'.format(filesizeformat(throughput.bytes_per_second))
+            if throughput.eta is not None:
+                rate += ', ETA {}'.format(datetime.timedelta(seconds=round(throughput.eta)))
         return format_html(
             '''
             <progress value="{0}" max="100"></progress>
-            <div><span class="progress_value" style="font-weight:bold">{0}%</span></div>
+            <div><span class="progress_value" style="font-weight:bold">{0}%</span> {1}</div>
             ''',
-            self.progress
+            self.progress,
+            rate
         )
 
     def get_equivalent_jobs(self):
@@ -419,6 +656,24 @@ class TransferLog(models.Model):
         return 'Submitted'
 
 
+class ProgressSample(models.Model):
+    """
+    Running job progress at a point in time, see ensembl.production.dbcopy.throughput
+    """
+    class Meta:
+        db_table = 'progress_sample'
+        app_label = 'ensembl_dbcopy'
+        verbose_name = 'Progress sample'
+        indexes = [models.Index(fields=['job', 'sampled_at'], name='progress_sample_job_idx')]
+
+    auto_id = models.BigAutoField(primary_key=True)
+    job = models.ForeignKey("RequestJob", db_column='job_id', on_delete=models.CASCADE,
+                            related_name='progress_samples', db_index=False)
+    sampled_at = models.DateTimeField()
+    tables_done = models.IntegerField()
+    bytes_done = models.BigIntegerField()
+
+
 def clean_host_pattern(pattern):
     if ":" in pattern:
         pattern = pattern.split(':')[0]
@@ -436,20 +691,14 @@ class HostManager(models.Manager):
         :return:
         """
         host_queryset = self.all()
-        group_queryset = HostGroup.objects.all()
         if pattern:
             host_queryset = host_queryset.filter(name__icontains=clean_host_pattern(pattern)).order_by(
                 'name')
         if active:
             host_queryset = host_queryset.filter(active=True)
-        for host in host_queryset:
-            group = group_queryset.filter(host_id=host.auto_id)
-            if group:
-                host_groups = group.values_list('group_name', flat=True)
-                user_groups = user.groups.values_list('name', flat=True)
-                common_groups = set(host_groups).intersection(set(user_groups))
-                if not common_groups:
-                    host_queryset = host_queryset.exclude(name=host.name)
+        forbidden_names = HostGroup.objects.forbidden_host_names(user)
+        if forbidden_names:
+            host_queryset = host_queryset.exclude(name__in=forbidden_names)
         return host_queryset
 
     def qs_src_host(self, pattern, active=True):
@@ -478,35 +727,87 @@ class Host(models.Model):
     virtual_machine = models.CharField(max_length=255, blank=True, null=True)
     mysqld_file_owner = models.CharField(max_length=128, null=True, blank=True)
     active = models.BooleanField(default=True, blank=False)
+    schemas_indexed_at = models.DateTimeField("Schemas indexed on", blank=True, null=True, editable=False)
 
     def __str__(self):
         return '{}:{}'.format(self.name, self.port)
 
 
+class SchemaSnapshot(models.Model):
+    """
+    Local copy of a host information_schema.SCHEMATA row, maintained by the index_schemas command.
+    """
+    class Meta:
+        db_table = 'schema_snapshot'
+        unique_together = (('host', 'table_schema'),)
+        app_label = 'ensembl_dbcopy'
+        verbose_name = 'Schema snapshot'
+
+    auto_id = models.BigAutoField(primary_key=True)
+    host = models.ForeignKey(Host, on_delete=models.CASCADE, related_name='schema_snapshots')
+    table_schema = models.CharField(max_length=64)
+    table_count = models.IntegerField(default=0)
+    last_create_time = models.DateTimeField(blank=True, null=True)
+    last_update_time = models.DateTimeField(blank=True, null=True)
+    indexed_at = models.DateTimeField()
+
+    def __str__(self):
+        return '{}/{}'.format(self.host, self.table_schema)
+
+
+class TableSnapshot(models.Model):
+    """
+    Local copy of a host information_schema.TABLES row, maintained by the index_schemas command.
+    """
+    class Meta:
+        db_table = 'table_snapshot'
+        unique_together = (('schema', 'table_name'),)
+        app_label = 'ensembl_dbcopy'
+        verbose_name = 'Table snapshot'
+
+    auto_id = models.BigAutoField(primary_key=True)
+    schema = models.ForeignKey(SchemaSnapshot, on_delete=models.CASCADE, related_name='tables')
+    table_name = models.CharField(max_length=64)
+    create_time = models.DateTimeField(blank=True, null=True)
+    update_time = models.DateTimeField(blank=True, null=True)
+    table_rows = models.BigIntegerField(blank=True, null=True)
+    data_length = models.BigIntegerField(blank=True, null=True)
+    index_length = models.BigIntegerField(blank=True, null=True)
+
+    def __str__(self):
+        return '{}.{}'.format(self.schema, self.table_name)
+
+
 class TargetHostGroupManager(models.Manager):
+    """
+    Each user target groups are cached, with a version stamp (see CacheVersion) bumped on target groups, hosts and
+    users groups changes (see ensembl.production.dbcopy.signals), for at most `DBCOPY_HOST_PERMISSIONS_MAX_AGE`
+    seconds.
+    """
+    version_key = 'ensembl_dbcopy:target_host_group:version'
+
+    @classmethod
+    def bump_version(cls):
+        _bump_cache_version(cls.version_key)
 
     def target_host_group_for_user(self, user):
-        # get groups, current user belongs to
-        user_groups = user.groups.values_list('name', flat=True)
-        logger.debug("User Groups %s", user_groups)
-        # get all host user can copy  based on assigned group
-        user_hosts_ids = Host.objects.filter(targethostgroup__target_group_name__in=list(user_groups)).values_list(
-            'auto_id', flat=True)
-        logger.debug("User Hosts Ids %s", user_hosts_ids)
-
-        # get all host names that target group contains
-        target_host_dict = {}
-        for each_group in self.all():
-            target_host_dict[each_group.target_group_name] = ''
-            for each_host in each_group.target_host.all():
-                target_host_dict[each_group.target_group_name] += each_host.name + ':' + str(each_host.port) + ','
-
-        if logger.isEnabledFor(logging.DEBUG):
-            logger.debug('Target_host_dict %s', target_host_dict)
-            logger.debug('TargetHostGroup %s', TargetHostGroup.objects.all())
-        target_groups = list(set([(target_host_dict[group.target_group_name], group.target_group_name)
-                                  for group in self.filter(target_host__auto_id__in=list(user_hosts_ids))
-                                  ]))
+        """
+        Target groups sharing hosts with the target groups named after the user groups
+        :param user: User or AnonymousUser
+        :return: list of ('host1:port1,host2:port2,', group name) ordered by group name
+        """
+        key = 'ensembl_dbcopy:target_host_group:%s:%s' % (_cache_version(self.version_key), user.pk or '')
+        target_groups = cache.get(key)
+        if target_groups is None:
+            # get all host user can copy based on assigned group
+            user_hosts_ids = Host.objects.filter(
+                targethostgroup__target_group_name__in=user.groups.values('name')).values('auto_id')
+            groups = self.filter(target_host__auto_id__in=user_hosts_ids).distinct().order_by(
+                'target_group_name').prefetch_related(Prefetch('target_host', queryset=Host.objects.order_by('name')))
+            target_groups = [(''.join('%s:%s,' % (host.name, host.port) for host in group.target_host.all()),
+                              group.target_group_name) for group in groups]
+            logger.debug("User %s target groups %s", user, target_groups)
+            cache.set(key, target_groups, getattr(settings, 'DBCOPY_HOST_PERMISSIONS_MAX_AGE', 300))
         return target_groups
 
 
@@ -525,12 +826,44 @@ class TargetHostGroup(models.Model):
         return '{}'.format(self.target_group_name)
 
 
+class HostGroupManager(models.Manager):
+    """
+    Hosts restricted to some user groups: users not in any of a host groups can't copy to it.
+    Each user forbidden hosts are cached, with a version stamp (see CacheVersion) bumped on host groups and users
+    groups changes (see ensembl.production.dbcopy.signals), for at most `DBCOPY_HOST_PERMISSIONS_MAX_AGE` seconds.
+    """
+    version_key = 'ensembl_dbcopy:host_group:version'
+
+    @classmethod
+    def bump_version(cls):
+        _bump_cache_version(cls.version_key)
+
+    def forbidden_hosts(self, user):
+        """
+        :param user: User or AnonymousUser
+        :return: frozenset of (auto_id, name) of the hosts the user is not allowed to copy to
+        """
+        key = 'ensembl_dbcopy:host_group:%s:%s' % (_cache_version(self.version_key), user.pk or '')
+        forbidden = cache.get(key)
+        if forbidden is None:
+            allowed_host_ids = self.filter(group_name__in=user.groups.values('name')).values('host_id')
+            forbidden = frozenset(self.exclude(host_id__in=allowed_host_ids).values_list(
+                'host_id', 'host_id__name').distinct())
+            cache.set(key, forbidden, getattr(settings, 'DBCOPY_HOST_PERMISSIONS_MAX_AGE', 300))
+        return forbidden
+
+    def forbidden_host_names(self, user):
+        return frozenset(name for _, name in self.forbidden_hosts(user))
+
+
 class HostGroup(models.Model):
     class Meta:
         db_table = 'host_group'
         app_label = 'ensembl_dbcopy'
         verbose_name = 'Host HostGroup'
 
+    objects = HostGroupManager()
+
     group_id = models.BigAutoField(primary_key=True)
     host_id = models.ForeignKey(Host, db_column='auto_id', on_delete=models.CASCADE, related_name='groups')
     group_name = models.CharField('User HostGroup', max_length=80)
@@ -540,12 +873,9 @@ class HostGroup(models.Model):
 
 
 def _apply_db_names_filter(db_names, all_db_names):
-    if len(db_names) == 1:
-        db_name = db_names.pop()
-        filter_re = re.compile(db_name.replace('%', '.*'))
-        return set(filter(filter_re.search, all_db_names))
-    return db_names
+    patterns = {db_name for db_name in db_names if '%' in db_name}
+    return db_names.difference(patterns).union(filter_names(all_db_names, patterns)) if patterns else db_names
 
 
 def _text_field_as_set(text):
-    return set(filter(lambda x: x != '', text.split(',')))
+    return set(filter(lambda x: x != '', (text or '').split(',')))
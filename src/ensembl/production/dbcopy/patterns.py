@@ -0,0 +1,122 @@
+#   See the NOTICE file distributed with this work for additional information
+#   regarding copyright ownership.
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+"""
+Database / table names filtering.
+
+Patterns are the ones users type in the copy forms: names where `%` matches any sequence of characters
+(e.g. `homo_sapiens%`, `%_core_99_%`). Every other character is literal, including `_`.
+Patterns containing characters which can't be part of a MySQL identifier (e.g. `.*`) are considered
+regular expressions, as previously accepted by the API.
+All patterns must match the whole name unless `contains` is set, in which case the include patterns
+match anywhere in the name.
+"""
+import re
+
+_SIMPLE_PATTERN = re.compile(r'^[\w$%-]*$')
+
+
+def _is_simple(pattern):
+    return bool(_SIMPLE_PATTERN.match(pattern))
+
+
+def is_regex(pattern):
+    """
+    :return: whether pattern holds characters which can't be part of a MySQL identifier, and is then considered a
+    regular expression
+    """
+    return not _is_simple(pattern)
+
+
+def _pattern_regex(pattern, contains=False):
+    if _is_simple(pattern):
+        regex = '.*'.join(re.escape(piece) for piece in pattern.split('%'))
+    else:
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            raise ValueError('Invalid name_filter: {}'.format(pattern)) from e
+        regex = pattern
+    return '.*(?:{}).*'.format(regex) if contains else '(?:{})'.format(regex)
+
+
+def _like_value(pattern, contains=False):
+    value = pattern.replace('\\', '\\\\').replace('_', '\\_')
+    return '%{}%'.format(value) if contains else value
+
+
+def _compile(patterns, contains=False):
+    if not patterns:
+        return None
+    return re.compile('^(?:{})$'.format('|'.join(_pattern_regex(pattern, contains) for pattern in patterns)),
+                      re.DOTALL)
+
+
+class NamePatterns:
+    """
+    Include / skip patterns compiled into one matcher each.
+    """
+
+    def __init__(self, incl_filters=None, skip_filters=None, contains=False):
+        self.incl = sorted({pattern for pattern in (incl_filters or ()) if pattern})
+        self.skip = sorted({pattern for pattern in (skip_filters or ()) if pattern})
+        self.contains = contains
+        self._incl_re = _compile(self.incl, contains)
+        self._skip_re = _compile(self.skip)
+        # plain names lists are resolved with a set intersection
+        self._incl_names = None
+        if self.incl and not contains and all(_is_simple(p) and '%' not in p for p in self.incl):
+            self._incl_names = frozenset(self.incl)
+
+    def __bool__(self):
+        return bool(self.incl or self.skip)
+
+    def match(self, name):
+        if self._incl_names is not None:
+            if name not in self._incl_names:
+                return False
+        elif self._incl_re is not None and not self._incl_re.match(name):
+            return False
+        return self._skip_re is None or not self._skip_re.match(name)
+
+    def filter(self, names):
+        """
+        :param names: iterable of names
+        :return: set of matching names
+        """
+        if self._incl_names is not None:
+            names = self._incl_names.intersection(names)
+        elif self._incl_re is not None:
+            names = set(filter(self._incl_re.match, names))
+        else:
+            names = set(names)
+        if self._skip_re is not None:
+            names.difference_update(filter(self._skip_re.match, list(names)))
+        return names
+
+    def sql(self, column):
+        """
+        SQL predicate narrowing a query to the names matching the include patterns.
+        Only `%` patterns are pushed down (as LIKE), regular expressions dialects differing between Python
+        and MySQL. LIKE being case insensitive on information_schema columns, the query may return more names
+        than matching: results still need to go through `filter`, which also applies the skip patterns (a NOT
+        LIKE would drop names differing from them in case only).
+        :param column: column name
+        :return: tuple (predicate, params), predicate being '' when there is nothing to push down
+        """
+        if not self.incl or not all(_is_simple(pattern) for pattern in self.incl):
+            return '', []
+        predicate = '({})'.format(' OR '.join(['{} LIKE %s'.format(column)] * len(self.incl)))
+        return predicate, [_like_value(pattern, self.contains) for pattern in self.incl]
+
+
+def filter_names(names, incl_filters=None, skip_filters=None, contains=False):
+    return NamePatterns(incl_filters, skip_filters, contains).filter(names)
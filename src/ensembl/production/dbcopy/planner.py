@@ -0,0 +1,118 @@
+#   See the NOTICE file distributed with this work for additional information
+#   regarding copyright ownership.
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+"""
+Pre-flight estimation of a copy job size.
+
+A job databases / tables filters are expanded against the source information_schema.TABLES, from the
+local index (see ensembl.production.dbcopy.indexer) when up to date, from the server otherwise, the server query
+being given DBCOPY_PLAN_TIMEOUT seconds. Jobs are estimated by the estimate_jobs command, or on submission when
+DBCOPY_PLAN_ON_SUBMIT is set.
+"""
+import collections
+import logging
+
+from django.conf import settings
+
+from ensembl.production.dbcopy.engines import get_engine
+from ensembl.production.dbcopy.indexer import get_fresh_host
+from ensembl.production.dbcopy.counters import ENDED_STATUSES
+from ensembl.production.dbcopy.models import RequestJob, TableSnapshot
+from ensembl.production.dbcopy.patterns import NamePatterns
+from ensembl.production.dbcopy.utils import get_filters
+from ensembl.production.dbcopy.validation import ValidationContext
+
+logger = logging.getLogger(__name__)
+
+JobPlan = collections.namedtuple('JobPlan', ('databases', 'tables', 'rows', 'bytes'))
+
+# MAX_EXECUTION_TIME hint (milliseconds), ignored as a comment by servers not supporting it
+_TABLES_SIZE_SQL = ("SELECT /*+ MAX_EXECUTION_TIME(%d) */ TABLE_SCHEMA, TABLE_NAME, TABLE_ROWS, DATA_LENGTH, INDEX_LENGTH "
+                    "FROM information_schema.TABLES")
+
+
+def _patterns(incl_text, skip_text, extra_skip=()):
+    return NamePatterns(get_filters((incl_text or '').split(',')),
+                        get_filters((skip_text or '').split(',')).union(extra_skip))
+
+
+def _snapshot_tables(hostname, port, db_patterns):
+    host = get_fresh_host(hostname, port)
+    if host is None:
+        return None
+    schemas = db_patterns.filter(host.schema_snapshots.values_list('table_schema', flat=True))
+    return TableSnapshot.objects.filter(schema__host=host, schema__table_schema__in=schemas).values_list(
+        'schema__table_schema', 'table_name', 'table_rows', 'data_length', 'index_length').iterator()
+
+
+def _server_tables(hostname, port, user, db_patterns, table_patterns):
+    clauses = []
+    params = []
+    for patterns, column in ((db_patterns, 'TABLE_SCHEMA'), (table_patterns, 'TABLE_NAME')):
+        predicate, predicate_params = patterns.sql(column)
+        if predicate:
+            clauses.append(predicate)
+            params.extend(predicate_params)
+    timeout = getattr(settings, 'DBCOPY_PLAN_TIMEOUT', 10)
+    sql = _TABLES_SIZE_SQL % (timeout * 1000) + (" WHERE " + " AND ".join(clauses) if clauses else "")
+    with get_engine(hostname, port, user).connect() as connection:
+        return list(connection.exec_driver_sql(sql, tuple(params)))
+
+
+def plan_job(job, context=None):
+    """
+    Expand job source filters into the tables to copy
+    :param job: RequestJob
+    :param context: ValidationContext, jobs with the same source and filters being planned once per context
+    :return: JobPlan, sizes (rows, bytes) being the information_schema estimates
+    :raise: ValueError when the source host can't be introspected
+    """
+    context = context or ValidationContext()
+    key = ('plan', job.src_host, job.src_incl_db, job.src_skip_db, job.src_incl_tables, job.src_skip_tables)
+    plan = context.memo(key, lambda: _plan(job.src_host, job.src_incl_db, job.src_skip_db, job.src_incl_tables,
+                                           job.src_skip_tables, context))
+    logger.debug("Job %s plan: %s", job.job_id, plan)
+    return plan
+
+
+def estimate_jobs(jobs=None):
+    """
+    Estimate the size of the jobs not estimated yet, outside of their submission
+    :param jobs: RequestJob QuerySet, all jobs by default
+    :return: number of jobs estimated
+    """
+    jobs = (RequestJob.objects.all() if jobs is None else jobs).filter(estimated_tables__isnull=True).exclude(
+        overall_status__in=ENDED_STATUSES)
+    context = ValidationContext()
+    estimated = 0
+    for job in jobs.iterator():
+        if job.estimate(context) is not None:
+            job.save(update_fields=('estimated_tables', 'estimated_rows', 'estimated_bytes'))
+            estimated += 1
+    return estimated
+
+
+def _plan(src_host, src_incl_db, src_skip_db, src_incl_tables, src_skip_tables, context):
+    hostname, port = src_host.split(':')
+    db_patterns = _patterns(src_incl_db, src_skip_db, context.excluded_schemas())
+    table_patterns = _patterns(src_incl_tables, src_skip_tables)
+    rows = _snapshot_tables(hostname, port, db_patterns)
+    if rows is None:
+        rows = _server_tables(hostname, port, context.user(hostname, port), db_patterns, table_patterns)
+    databases = set()
+    tables = table_rows = size = 0
+    for schema, table, nb_rows, data_length, index_length in rows:
+        if db_patterns.match(schema) and table_patterns.match(table):
+            databases.add(schema)
+            tables += 1
+            table_rows += nb_rows or 0
+            size += (data_length or 0) + (index_length or 0)
+    return JobPlan(len(databases), tables, table_rows, size)
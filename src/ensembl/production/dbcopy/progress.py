@@ -0,0 +1,100 @@
+#   See the NOTICE file distributed with this work for additional information
+#   regarding copyright ownership.
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+"""
+Job progress, behind the job events long-poll (see ensembl.production.dbcopy.api.async_views.job_events).
+
+job_version stamps a job state in one query on the job row and its transfers and samples indexes: its status,
+progress, transfer counters and last change time are maintained as the copy goes
+(see ensembl.production.dbcopy.counters), so any change in the transfers shows there. The transfer_log aggregates (bytes done, current table) are only queried once it changed.
+The same stamp backs the job detail and transfers endpoints conditional responses.
+"""
+import asyncio
+import hashlib
+
+from asgiref.sync import sync_to_async
+from django.db.models import Max, OuterRef, Q, Subquery, Sum
+
+from ensembl.production.dbcopy.models import ProgressSample, RequestJob, TransferLog
+
+_SNAPSHOT_FIELDS = ('status', 'overall_status', 'expected', 'completed', 'current_try', 'max_tries', 'copied',
+                    'total_copies', 'start_date', 'end_date')
+
+
+def job_snapshot(job_id):
+    """
+    :return: tuple of the job _SNAPSHOT_FIELDS values, None when the job does not exist
+    """
+    return RequestJob.objects.filter(pk=job_id).values_list(*_SNAPSHOT_FIELDS).first()
+
+
+def job_version(job_id):
+    """
+    Version stamp of the job row, its transfers and its progress samples, changing as soon as any of the job
+    columns changes, any of its transfers starts or ends or a progress sample is recorded, read in one query
+    :return: tuple (str ETag, datetime last modified), None when the job does not exist
+    """
+    logs = TransferLog.objects.filter(job_id=OuterRef('pk')).order_by().values('job_id')
+    samples = ProgressSample.objects.filter(job=OuterRef('pk')).order_by().values('job')
+    columns = [field.attname for field in RequestJob._meta.concrete_fields]
+    row = RequestJob.objects.filter(pk=job_id).annotate(
+        last_started=Subquery(logs.annotate(last=Max('start_date')).values('last')),
+        last_ended=Subquery(logs.annotate(last=Max('end_date')).values('last')),
+        last_sampled=Subquery(samples.annotate(last=Max('sampled_at')).values('last')),
+    ).values('last_started', 'last_ended', 'last_sampled', *columns).first()
+    if row is None:
+        return None
+    etag = hashlib.sha1(repr(sorted(row.items())).encode()).hexdigest()
+    dates = (row[name] for name in ('request_date', 'last_changed', 'last_started', 'last_ended', 'last_sampled',
+                                    'start_date', 'end_date'))
+    return etag, max(date for date in dates if date is not None)
+
+
+def job_progress(job_id, snapshot):
+    """
+    :param snapshot: tuple, see job_snapshot
+    :return: dict, the job progress
+    """
+    job = dict(zip(_SNAPSHOT_FIELDS, snapshot))
+    logs = TransferLog.objects.filter(job_id=job_id)
+    current = logs.filter(start_date__isnull=False, end_date__isnull=True).order_by('-start_date').values_list(
+        'table_schema', 'table_name').first()
+    return {
+        'status': job['status'],
+        'overall_status': job['overall_status'],
+        'tables_done': job['completed'] or 0,
+        'total_tables': job['expected'] or 0,
+        'bytes_done': logs.aggregate(total=Sum('size', filter=Q(end_date__isnull=False)))['total'] or 0,
+        'current_table': '.'.join(current) if current else None,
+        'current_try': job['current_try'],
+        'max_tries': job['max_tries'],
+        'copied': job['copied'],
+        'total_copies': job['total_copies'],
+        'start_date': job['start_date'],
+        'end_date': job['end_date'],
+    }
+
+
+async def wait_job_version(job_id, since, timeout, interval=2, sleep=asyncio.sleep):
+    """
+    Poll the job version every interval seconds, up to timeout seconds, until it differs from since.
+    Each poll is one job_version query, run through sync_to_async, so waiting never holds the event loop
+    nor a worker thread.
+    :param since: str, ETag of the job version known to the caller
+    :return: job_version tuple, the last one read when it did not change, None when the job does not exist
+    """
+    version = await sync_to_async(job_version)(job_id)
+    waited = 0
+    while version is not None and version[0] == since and waited < timeout:
+        await sleep(min(interval, timeout - waited))
+        waited += interval
+        version = await sync_to_async(job_version)(job_id)
+    return version
@@ -0,0 +1,119 @@
+#   See the NOTICE file distributed with this work for additional information
+#   regarding copyright ownership.
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+"""
+In memory trigram index over the databases names of a host, used by the autocomplete lookups.
+
+Searches made of names characters and `%` are matched case insensitively, where the lookups used to match them
+case sensitively, so `Homo` now also finds `homo_sapiens_core_99_38`. Other searches are still regular expressions,
+matched case sensitively.
+"""
+import heapq
+import re
+import threading
+from collections import defaultdict
+
+from ensembl.production.dbcopy.catalog import SchemaCatalog, get_database_names
+from ensembl.production.dbcopy.patterns import is_regex
+
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class NameIndex:
+    """
+    Trigram index answering `%` patterns (e.g. `homo%core`) as case insensitive substring queries, and regular
+    expressions (e.g. `homo.*core_9[89]`) by scanning all the names.
+    Matches are ranked: prefix matches first, then earliest match position, then shortest names.
+    """
+
+    def __init__(self, names):
+        self.source = names
+        self.names = sorted(names)
+        self._lowered = [name.lower() for name in self.names]
+        self._grams = defaultdict(set)
+        for position, name in enumerate(self._lowered):
+            for gram in _trigrams(name):
+                self._grams[gram].add(position)
+
+    def __len__(self):
+        return len(self.names)
+
+    def _candidates(self, pieces):
+        grams = set()
+        for piece in pieces:
+            grams.update(_trigrams(piece))
+        if not grams:
+            return range(len(self.names))
+        postings = sorted((self._grams.get(gram, set()) for gram in grams), key=len)
+        return postings[0].intersection(*postings[1:])
+
+    def search(self, pattern, limit=None, exclude=()):
+        """
+        Names matching pattern anywhere
+        :param pattern: str, `%` matching any sequence of characters. Matched case insensitively, unless pattern is
+        a regular expression (see ensembl.production.dbcopy.patterns.is_regex)
+        :param limit: maximum number of names returned
+        :param exclude: names to leave out of the results, compared as is
+        :return: list of ranked names
+        :raise: ValueError when pattern is an invalid regular expression
+        """
+        if is_regex(pattern):
+            try:
+                matcher = re.compile(pattern.replace('%', '.*'))
+            except re.error as e:
+                raise ValueError('Invalid search: {}'.format(pattern)) from e
+            names = self.names
+            positions = range(len(names))
+        else:
+            pieces = [piece for piece in pattern.lower().split('%') if piece]
+            if not pieces:
+                return []
+            matcher = re.compile('.*?'.join(re.escape(piece) for piece in pieces))
+            names = self._lowered
+            positions = self._candidates(pieces)
+        ranked = []
+        for position in positions:
+            match = matcher.search(names[position])
+            if match and self.names[position] not in exclude:
+                ranked.append((match.start() != 0, match.start(), len(names[position]), self.names[position]))
+        if limit is not None:
+            ranked = heapq.nsmallest(limit, ranked)
+        else:
+            ranked.sort()
+        return [rank[-1] for rank in ranked]
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_name_index(hostname, port, user='ensro'):
+    """
+    Index built from the host catalog entry, rebuilt whenever the names change: a refreshed catalog entry, or
+    every lookup with the catalog disabled, holding the same names keeps the index.
+    :return: NameIndex
+    """
+    names = get_database_names(hostname, port, user)
+    key = SchemaCatalog.make_key(hostname, port)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None or (index.source is not names and index.source != names):
+            index = NameIndex(names)
+            _indexes[key] = index
+        else:
+            index.source = names
+    return index
+
+
+def search_database_names(hostname, port, pattern, user='ensro', limit=None, exclude=()):
+    return get_name_index(hostname, port, user).search(pattern, limit=limit, exclude=exclude)
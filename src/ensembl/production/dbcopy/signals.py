@@ -0,0 +1,120 @@
+#   See the NOTICE file distributed with this work for additional information
+#   regarding copyright ownership.
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.signals import request_finished, request_started
+from django.db import connections
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from ensembl.production.dbcopy.catalog import catalog
+from ensembl.production.dbcopy.counters import add_to_counters, refresh_overall_status, touch_jobs, uses_triggers
+from ensembl.production.dbcopy.engines import registry
+from ensembl.production.dbcopy.models import Dbs2Exclude, Dbs2ExcludeManager, Host, HostGroup, HostGroupManager, \
+    RequestJob, TargetHostGroup, TargetHostGroupManager, TransferLog, forget_cache_versions, \
+    memoize_cache_versions
+
+_CONNECTION_FIELDS = ('name', 'port', 'mysql_user', 'active')
+
+
+@receiver(post_save, sender=Host)
+@receiver(post_delete, sender=Host)
+def invalidate_host_catalog(sender, instance, **kwargs):
+    catalog.invalidate(instance.name, instance.port)
+
+
+@receiver(pre_save, sender=Host)
+def keep_host_connection(sender, instance, **kwargs):
+    instance._previous_connection = Host.objects.filter(pk=instance.pk).values(*_CONNECTION_FIELDS).first() \
+        if instance.pk else None
+
+
+@receiver(post_save, sender=Host)
+def dispose_changed_host_engine(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_connection', None)
+    if previous and (any(previous[field] != getattr(instance, field) for field in _CONNECTION_FIELDS)):
+        registry.dispose(previous['name'], previous['port'], previous['mysql_user'])
+        catalog.invalidate(previous['name'], previous['port'])
+
+
+@receiver(post_delete, sender=Host)
+def dispose_deleted_host_engine(sender, instance, **kwargs):
+    registry.dispose(instance.name, instance.port, instance.mysql_user)
+
+
+@receiver(request_started)
+def memoize_request_cache_versions(sender, **kwargs):
+    memoize_cache_versions()
+
+
+@receiver(request_finished)
+def forget_request_cache_versions(sender, **kwargs):
+    forget_cache_versions()
+
+
+@receiver(post_save, sender=Dbs2Exclude)
+@receiver(post_delete, sender=Dbs2Exclude)
+def bump_excluded_schemas_version(sender, instance, **kwargs):
+    Dbs2ExcludeManager.bump_version()
+
+
+@receiver(post_save, sender=HostGroup)
+@receiver(post_delete, sender=HostGroup)
+def bump_host_groups_version(sender, **kwargs):
+    HostGroupManager.bump_version()
+
+
+@receiver(post_save, sender=TargetHostGroup)
+@receiver(post_delete, sender=TargetHostGroup)
+@receiver(m2m_changed, sender=TargetHostGroup.target_host.through)
+def bump_target_host_groups_version(sender, **kwargs):
+    TargetHostGroupManager.bump_version()
+
+
+@receiver(post_save, sender=Host)
+@receiver(post_delete, sender=Host)
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(m2m_changed, sender=get_user_model().groups.through)
+def bump_host_permissions_version(sender, **kwargs):
+    HostGroupManager.bump_version()
+    TargetHostGroupManager.bump_version()
+
+
+@receiver(pre_save, sender=TransferLog)
+def keep_transfer_end_date(sender, instance, using, **kwargs):
+    if instance.pk and not uses_triggers(connections[using]):
+        instance._previous_end_date = TransferLog.objects.using(using).filter(pk=instance.pk).values_list(
+            'end_date', flat=True).first()
+
+
+@receiver(post_save, sender=TransferLog)
+def count_saved_transfer(sender, instance, created, using, **kwargs):
+    if uses_triggers(connections[using]):
+        return
+    ended = int(instance.end_date is not None)
+    jobs = RequestJob.objects.using(using).filter(pk=instance.job_id_id)
+    if created:
+        add_to_counters(jobs, expected=1, completed=ended)
+    else:
+        add_to_counters(jobs, completed=ended - int(getattr(instance, '_previous_end_date', None) is not None))
+    refresh_overall_status(jobs)
+    touch_jobs(jobs)
+
+
+@receiver(post_delete, sender=TransferLog)
+def count_deleted_transfer(sender, instance, using, **kwargs):
+    if not uses_triggers(connections[using]):
+        jobs = RequestJob.objects.using(using).filter(pk=instance.job_id_id)
+        add_to_counters(jobs, expected=-1, completed=-int(instance.end_date is not None))
+        refresh_overall_status(jobs)
+        touch_jobs(jobs)
@@ -10,15 +10,45 @@
 #   See the License for the specific language governing permissions and
 #   limitations under the License.
 
+import csv
+import datetime
 import json
+import re
+import threading
+import time
+from unittest import mock
 
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.urls import reverse
+from django.utils.http import urlencode
 from django.core.exceptions import ValidationError
 from rest_framework import status
 from rest_framework.test import APITestCase
 
-from ensembl.production.dbcopy.models import RequestJob
+from ensembl.production.dbcopy.api.viewsets import TransferLogView
+from ensembl.production.dbcopy.catalog import SchemaCatalog, catalog, get_database_names, get_table_names_set, \
+    query_database_names
+from ensembl.production.dbcopy.counters import COUNTER_TRIGGERS, STATUS_TRIGGERS, TRIGGERS, TryProgress, \
+    install_triggers, overall_status, refresh_counters
+from ensembl.production.dbcopy.engines import EngineRegistry, registry
+from ensembl.production.dbcopy.forms import RequestJobForm
+from ensembl.production.dbcopy.models import RequestJob, Host, SchemaSnapshot, TableSnapshot, Dbs2Exclude, \
+    Dbs2ExcludeManager, RequestJobManager, HostGroup, HostGroupManager, TargetHostGroup, TransferLog, ProgressSample, \
+    TargetHostGroupManager, CacheVersion, forget_cache_versions, memoize_cache_versions
+from ensembl.production.dbcopy.patterns import NamePatterns
+from ensembl.production.dbcopy.planner import JobPlan, estimate_jobs, plan_job
+from ensembl.production.dbcopy.progress import job_version, wait_job_version
+from ensembl.production.dbcopy.throughput import Throughput, downsample, job_throughput, record_samples
+from ensembl.production.dbcopy.search import NameIndex, get_name_index
+from ensembl.production.dbcopy.utils import fan_out
+from ensembl.production.dbcopy.validation import ValidationContext
 
 User = get_user_model()
 
@@ -32,6 +62,31 @@ class RequestJobTest(APITestCase):
         response = self.client.get(reverse('dbcopy_api:requestjob-list'))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def testRequestJobListPages(self):
+        url = reverse('dbcopy_api:requestjob-list')
+        self.assertEqual(3, len(self.client.get(url).json()))
+        response = self.client.get(url, {'page_size': 2})
+        self.assertEqual(['ddbdc15a-07af-11ea-bdcd-9801a79243a5', '8f084180-07ae-11ea-ace0-9801a79243a5'],
+                         [job['job_id'] for job in response.json()['results']])
+        response = self.client.get(response.json()['next'])
+        self.assertEqual(['2e7497e6-07af-11ea-bdcd-9801a79243a5'], [job['job_id'] for job in response.json()['results']])
+        self.assertIsNone(response.json()['next'])
+
+    def testRequestJobListFilters(self):
+        url = reverse('dbcopy_api:requestjob-list')
+
+        def job_ids(**params):
+            return [job['job_id'] for job in self.client.get(url, params).json()]
+
+        self.assertEqual(['8f084180-07ae-11ea-ace0-9801a79243a5'], job_ids(src_host='mysql-ens-sta-1:4519'))
+        self.assertEqual(['ddbdc15a-07af-11ea-bdcd-9801a79243a5'], job_ids(tgt_host='mysql-ens-sta-1:4519'))
+        self.assertEqual(['ddbdc15a-07af-11ea-bdcd-9801a79243a5', '8f084180-07ae-11ea-ace0-9801a79243a5'],
+                         job_ids(user='testuser', submitted_after='2020-06-02'))
+        self.assertEqual(['2e7497e6-07af-11ea-bdcd-9801a79243a5'], job_ids(submitted_before='2020-06-05T10:00:00Z'))
+        self.assertEqual([], job_ids(user='otheruser'))
+        response = self.client.get(url, {'submitted_after': '2020-13-01'})
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
     def testCreateRequestJob(self):
         response = self.client.post(reverse('dbcopy_api:requestjob-list'),
                                     {'src_host': 'mysql-ens-sta-1:4519', 'src_incl_db': 'homo_sapiens_core_99_38',
@@ -45,6 +100,25 @@ class RequestJobTest(APITestCase):
         self.assertEqual("testuser@ensembl.org", las_rq_job.email_list)
         self.assertEqual("testuser", las_rq_job.user.username)
 
+    def testBulkCreateRequestJobs(self):
+        job = {'src_host': 'mysql-ens-sta-1:4519', 'src_incl_db': 'homo_sapiens_core_99_38',
+               'tgt_host': 'mysql-ens-general-dev-1:4484', 'user': 'testuser'}
+        jobs = [job, dict(job, tgt_host='mysql-ens-general-prod-1:4525'), dict(job, src_host=''), job]
+        with mock.patch('ensembl.production.dbcopy.planner._plan', return_value=JobPlan(1, 10, 100, 1000)) as plan, \
+                self.settings(DBCOPY_PLAN_ON_SUBMIT=True):
+            response = self.client.post(reverse('dbcopy_api:requestjob-bulk-create'), {'jobs': jobs}, format='json')
+        self.assertEqual(status.HTTP_207_MULTI_STATUS, response.status_code)
+        self.assertEqual(1, plan.call_count)
+        created, other_target, invalid, equivalent = response.json()['results']
+        self.assertEqual((1000, 1000), tuple(RequestJob.objects.get(job_id=result['job']['job_id']).estimated_bytes
+                                             for result in (created, other_target)))
+        self.assertIn('src_host', invalid['errors'])
+        self.assertEqual(created['job']['job_id'], equivalent['errors']['job_id'][0])
+        response = self.client.post(reverse('dbcopy_api:requestjob-bulk-create'), {'jobs': [job]}, format='json')
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+        response = self.client.post(reverse('dbcopy_api:requestjob-bulk-create'), {'jobs': []}, format='json')
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
     def testCreateRequestJobBadRequest(self):
         response = self.client.post(reverse('dbcopy_api:requestjob-list'),
                                     {'src_host': '', 'src_incl_db': 'homo_sapiens_core_99_38',
@@ -131,6 +205,37 @@ class RequestJobTest(APITestCase):
                                     {**params, "user": "testuser"})
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
+    def testRequestJobFingerprint(self):
+        fingerprint = RequestJobManager.fingerprint(src_host='host1:3306', src_incl_db='db1,db2',
+                                                    tgt_host='host2:3306,host3:3306', tgt_db_name='new1,new2')
+        self.assertEqual(fingerprint, RequestJobManager.fingerprint(src_host='HOST1:3306 ', src_incl_db='db2, db1',
+                                                                    tgt_host='host3:3306,host2:3306',
+                                                                    tgt_db_name='new2,new1', src_skip_db=''))
+        self.assertNotEqual(fingerprint, RequestJobManager.fingerprint(src_host='host1:3306', src_incl_db='db2,db1',
+                                                                       tgt_host='host2:3306,host3:3306',
+                                                                       tgt_db_name='new1,new2'))
+
+    def testActiveFingerprintReleased(self):
+        job = RequestJob.objects.get(job_id='ddbdc15a-07af-11ea-bdcd-9801a79243a5')
+        job.status = 'Processing Requests'
+        job.save()
+        self.assertEqual(job.params_fingerprint, job.active_fingerprint)
+        eq_job = RequestJob(src_host=job.src_host, src_incl_db=job.src_incl_db, tgt_host=job.tgt_host,
+                            tgt_db_name=job.tgt_db_name, username=job.username)
+        with self.assertRaises(ValidationError):
+            eq_job.save()
+        # job ended by the copy service, overall status set by the request_job trigger
+        RequestJob.objects.filter(job_id=job.job_id).update(status='Transfer Ended', overall_status='Complete')
+        eq_job.save()
+        job.refresh_from_db()
+        self.assertIsNone(job.active_fingerprint)
+        self.assertEqual(job.params_fingerprint, eq_job.active_fingerprint)
+        self.assertEqual([eq_job.job_id, job.job_id],
+                         [j.job_id for j in RequestJob.objects.equivalent_jobs(src_host=job.src_host,
+                                                                               src_incl_db=job.src_incl_db,
+                                                                               tgt_host=job.tgt_host,
+                                                                               tgt_db_name=job.tgt_db_name)])
+
     def testCreateRequestJobUser(self):
         response = self.client.post(reverse('dbcopy_api:requestjob-list'),
                                     {'src_host': 'mysql-ens-sta-1:4519', 'src_incl_db': 'homo_sapiens_core_99_38',
@@ -317,6 +422,66 @@ class LookupsTest(APITestCase):
         data = json.loads(response.content)
         self.assertEqual(len(data['results']), 0)
 
+    def testTargetHostsQueries(self):
+        user = User.objects.get(username='testusergroup2')
+        HostGroupManager.bump_version()
+        memoize_cache_versions()
+        self.addCleanup(forget_cache_versions)
+        # version, forbidden hosts, then hosts listing, whatever the number of hosts
+        with self.assertNumQueries(3):
+            hosts = list(Host.objects.qs_tgt_host_for_user('sta-3', user))
+        self.assertEqual([], hosts)
+        with self.assertNumQueries(1):
+            list(Host.objects.qs_tgt_host_for_user('', user))
+        # version bumped by another process: no stale permissions served from the next request
+        CacheVersion.objects.filter(key=HostGroupManager.version_key).update(version='other-worker-version')
+        memoize_cache_versions()
+        with self.assertNumQueries(3):
+            list(Host.objects.qs_tgt_host_for_user('', user))
+        forget_cache_versions()
+        # group membership change
+        user.groups.add(Group.objects.get(name='Production'))
+        self.assertEqual(['mysql-ens-sta-3', 'mysql-ens-sta-3-b'],
+                         sorted(host.name for host in Host.objects.qs_tgt_host_for_user('sta-3', user)))
+        # host groups change
+        HostGroup.objects.filter(host_id__name='mysql-ens-sta-3-b').update(group_name='Web')
+        HostGroup.objects.create(host_id=Host.objects.get(name='mysql-ens-sta-3'), group_name='Web')
+        HostGroup.objects.filter(host_id__name='mysql-ens-sta-3', group_name='Production').delete()
+        self.assertEqual([], list(Host.objects.qs_tgt_host_for_user('sta-3', user)))
+
+
+class TargetHostGroupTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='testuser', email='testuser@ebi.ac.uk')
+        self.user.groups.add(Group.objects.create(name='Production'))
+        hosts = [Host.objects.create(name='host%d' % i, port=3306, mysql_user='ensro') for i in range(6)]
+        TargetHostGroup.objects.create(target_group_name='Production').target_host.set(hosts[:2])
+        for i in range(2, 6):
+            # groups sharing a host with the user one, or not
+            TargetHostGroup.objects.create(target_group_name='Group%d' % i).target_host.set(hosts[i - 1:i + 1])
+
+    def testTargetGroupsQueries(self):
+        form_class = type('UserRequestJobForm', (RequestJobForm,), {'user': self.user})
+        memoize_cache_versions()
+        self.addCleanup(forget_cache_versions)
+        with self.assertNumQueries(3):
+            form = form_class()
+        self.assertEqual([('host1:3306,host2:3306,', 'Group2'), ('host0:3306,host1:3306,', 'Production')],
+                         form.fields['tgt_group_host'].choices)
+        self.assertEqual('tgt_group_host', list(form.fields)[-1])
+        with self.assertNumQueries(0):
+            form_class()
+        # version bumped by another process: groups read again from the next request
+        CacheVersion.objects.filter(key=TargetHostGroupManager.version_key).update(version='other-worker-version')
+        memoize_cache_versions()
+        with self.assertNumQueries(3):
+            form_class()
+        forget_cache_versions()
+        TargetHostGroup.objects.get(target_group_name='Group3').target_host.add(Host.objects.get(name='host0'))
+        self.assertEqual(['Group2', 'Group3', 'Production'],
+                         [name for _, name in TargetHostGroup.objects.target_host_group_for_user(self.user)])
+
 
 class DBIntrospectTest(APITestCase):
     databases = {'default', 'homo_sapiens'}
@@ -368,3 +533,882 @@ class DBIntrospectTest(APITestCase):
         response_list = json.loads(response.content.decode('utf-8'))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response_list), 0)
+
+    def testIndexSchemas(self):
+        call_command('index_schemas', 'localhost:3306')
+        host = Host.objects.get(name='localhost', port=3306)
+        self.assertIsNotNone(host.schemas_indexed_at)
+        schema = SchemaSnapshot.objects.get(host=host, table_schema='test_homo_sapiens')
+        self.assertIn('assembly', schema.tables.values_list('table_name', flat=True))
+        self.assertEqual(schema.table_count, schema.tables.count())
+        # incremental run leaves unchanged schemas untouched
+        call_command('index_schemas', 'localhost:3306')
+        self.assertEqual(schema.table_count, SchemaSnapshot.objects.get(pk=schema.pk).tables.count())
+
+
+class SchemaCatalogTest(SimpleTestCase):
+
+    def testHitMiss(self):
+        cache = SchemaCatalog(ttl=60, max_entries=10)
+        loader = mock.Mock(return_value=['db1', 'db2'])
+        key = SchemaCatalog.make_key('host1', 3306)
+        self.assertEqual(frozenset(['db1', 'db2']), cache.get(key, loader))
+        self.assertEqual(frozenset(['db1', 'db2']), cache.get(key, loader))
+        self.assertEqual(1, loader.call_count)
+        self.assertEqual(1, cache.stats()['hits'])
+        self.assertEqual(1, cache.stats()['misses'])
+
+    def testExpiry(self):
+        cache = SchemaCatalog(ttl=60, max_entries=10)
+        loader = mock.Mock(return_value=['db1'])
+        key = SchemaCatalog.make_key('host1', 3306)
+        with mock.patch('ensembl.production.dbcopy.catalog.time.monotonic', return_value=1000):
+            cache.get(key, loader)
+        with mock.patch('ensembl.production.dbcopy.catalog.time.monotonic', return_value=1061):
+            cache.get(key, loader)
+        self.assertEqual(2, loader.call_count)
+
+    def testLRUEviction(self):
+        cache = SchemaCatalog(ttl=60, max_entries=2)
+        for host in ('host1', 'host2'):
+            cache.get(SchemaCatalog.make_key(host, 3306), lambda: [host])
+        # touch host1 so that host2 is the least recently used
+        cache.get(SchemaCatalog.make_key('host1', 3306), lambda: [])
+        cache.get(SchemaCatalog.make_key('host3', 3306), lambda: ['host3'])
+        self.assertEqual(1, cache.stats()['evictions'])
+        self.assertEqual(frozenset(['host1']), cache.get(SchemaCatalog.make_key('host1', 3306), lambda: []))
+        self.assertEqual(frozenset(), cache.get(SchemaCatalog.make_key('host2', 3306), lambda: []))
+
+    def testInvalidate(self):
+        cache = SchemaCatalog(ttl=60, max_entries=10)
+        cache.get(SchemaCatalog.make_key('host1', 3306), lambda: ['db1'])
+        cache.get(SchemaCatalog.make_key('host1', 3306, 'db1'), lambda: ['table1'])
+        cache.get(SchemaCatalog.make_key('host2', 3306), lambda: ['db2'])
+        self.assertEqual(1, cache.invalidate('host1', 3306, 'db1'))
+        self.assertEqual(1, cache.invalidate('host1', '3306'))
+        self.assertEqual(1, cache.stats()['entries'])
+        cache.invalidate()
+        self.assertEqual(0, cache.stats()['entries'])
+
+    def testLoaderErrorNotCached(self):
+        cache = SchemaCatalog(ttl=60, max_entries=10)
+        key = SchemaCatalog.make_key('host1', 3306)
+        with self.assertRaises(ValueError):
+            cache.get(key, mock.Mock(side_effect=ValueError('Invalid hostname')))
+        self.assertEqual(0, cache.stats()['entries'])
+
+
+class SchemaSnapshotTest(TestCase):
+    fixtures = ('introspect.homo_sapiens.json',)
+
+    def setUp(self):
+        catalog.invalidate()
+        self.host = Host.objects.get(name='localhost', port=3306)
+        schema = SchemaSnapshot.objects.create(host=self.host, table_schema='snapshot_db', table_count=1,
+                                               indexed_at=timezone.now())
+        TableSnapshot.objects.create(schema=schema, table_name='snapshot_table')
+
+    def tearDown(self):
+        catalog.invalidate()
+
+    def testCatalogServedFromSnapshot(self):
+        self.host.schemas_indexed_at = timezone.now()
+        self.host.save()
+        with mock.patch('ensembl.production.dbcopy.catalog.get_schema_names') as live:
+            self.assertEqual(frozenset(['snapshot_db']), get_database_names('localhost', 3306))
+            self.assertEqual(frozenset(['snapshot_table']), get_table_names_set('localhost', 3306, 'snapshot_db'))
+            live.assert_not_called()
+
+    def testCatalogSnapshotMiss(self):
+        # database created since the last index run
+        self.host.schemas_indexed_at = timezone.now()
+        self.host.save()
+        with mock.patch('ensembl.production.dbcopy.catalog.get_engine'), \
+                mock.patch('ensembl.production.dbcopy.catalog.get_table_names', return_value=['new_table']) as live:
+            self.assertEqual(frozenset(['new_table']), get_table_names_set('localhost', 3306, 'new_db'))
+            live.assert_called_once()
+
+    def testWipeTargetNotFromSnapshot(self):
+        self.host.schemas_indexed_at = timezone.now()
+        self.host.save()
+        job = RequestJob(src_host='localhost:3306', src_incl_db='new_db', tgt_host='localhost:3306',
+                         tgt_db_name='created_db')
+        with mock.patch('ensembl.production.dbcopy.validation.query_database_names',
+                        return_value={'snapshot_db', 'created_db'}) as live:
+            with self.assertRaises(ValidationError) as raised:
+                job.clean_wipe_target()
+            live.assert_called_once()
+        self.assertIn('tgt_db_name', raised.exception.message_dict)
+
+    def testCatalogOutdatedSnapshot(self):
+        self.host.schemas_indexed_at = timezone.now() - timezone.timedelta(days=1)
+        self.host.save()
+        with mock.patch('ensembl.production.dbcopy.catalog.get_engine'), \
+                mock.patch('ensembl.production.dbcopy.catalog.get_schema_names', return_value=['live_db']) as live:
+            self.assertEqual(frozenset(['live_db']), get_database_names('localhost', 3306))
+            live.assert_called_once()
+
+
+class NameIndexTest(SimpleTestCase):
+
+    def setUp(self):
+        self.index = NameIndex(['homo_sapiens_core_99_38', 'homo_sapiens_variation_99_38', 'mus_musculus_core_99_39',
+                                'ensembl_compara_99', 'core_homo', 'ho'])
+
+    def testSubstring(self):
+        self.assertEqual(['homo_sapiens_core_99_38', 'homo_sapiens_variation_99_38', 'core_homo'],
+                         self.index.search('homo'))
+        self.assertEqual(['core_homo', 'homo_sapiens_core_99_38', 'mus_musculus_core_99_39'],
+                         self.index.search('core'))
+        self.assertEqual(['homo_sapiens_core_99_38'], self.index.search('HOMO%core'))
+        self.assertEqual(['ho', 'homo_sapiens_core_99_38', 'homo_sapiens_variation_99_38', 'core_homo'],
+                         self.index.search('ho'))
+        self.assertEqual([], self.index.search('rattus'))
+        self.assertEqual([], self.index.search('%'))
+
+    def testRegex(self):
+        self.assertEqual(['homo_sapiens_core_99_38', 'mus_musculus_core_99_39'], self.index.search('s.core_99'))
+        self.assertEqual(['homo_sapiens_core_99_38'], self.index.search('^homo.*core'))
+        self.assertEqual(['homo_sapiens_core_99_38'], self.index.search('sapiens.%core'))
+        # case sensitive, as the lookups regular expressions used to be
+        self.assertEqual([], self.index.search('HOMO.*core'))
+        with self.assertRaises(ValueError):
+            self.index.search('homo[')
+
+    def testLimitExclude(self):
+        self.assertEqual(['homo_sapiens_core_99_38'], self.index.search('homo', limit=1))
+        self.assertEqual(['homo_sapiens_variation_99_38'],
+                         self.index.search('homo', limit=1, exclude={'homo_sapiens_core_99_38'}))
+
+    def testIndexKeptForSameNames(self):
+        names = ['homo_sapiens_core_99_38', 'mus_musculus_core_99_39']
+        with mock.patch('ensembl.production.dbcopy.search.get_database_names',
+                        side_effect=lambda *args: frozenset(names)):
+            index = get_name_index('index-host', 3306)
+            # catalog disabled: equal names loaded again on every lookup
+            self.assertIs(index, get_name_index('index-host', 3306))
+            names.append('rattus_norvegicus_core_99_6')
+            self.assertEqual(['rattus_norvegicus_core_99_6'], get_name_index('index-host', 3306).search('rattus'))
+
+
+class NamePatternsTest(SimpleTestCase):
+    names = ['homo_sapiens_core_99_38', 'homo_sapiens_variation_99_38', 'homoXsapiens_core_99_38',
+             'mus_musculus_core_99_39', 'mus_musculus_mart_99', 'information_schema']
+
+    def testPatterns(self):
+        self.assertEqual({'homo_sapiens_core_99_38', 'homo_sapiens_variation_99_38'},
+                         NamePatterns(['homo_sapiens%']).filter(self.names))
+        self.assertEqual({'homo_sapiens_core_99_38', 'mus_musculus_core_99_39'},
+                         NamePatterns(['%_core_%'], ['homoX%']).filter(self.names))
+        self.assertEqual({'mus_musculus_core_99_39'},
+                         NamePatterns(['mus%'], ['%mart%']).filter(self.names))
+        self.assertEqual({'homo_sapiens_core_99_38', 'unknown'},
+                         NamePatterns(['homo_sapiens_core_99_38', 'unknown']).filter(self.names + ['unknown']))
+        self.assertEqual(set(self.names) - {'information_schema'},
+                         NamePatterns(skip_filters=['information_schema']).filter(self.names))
+        self.assertTrue(NamePatterns(['core'], contains=True).match('mus_musculus_core_99_39'))
+        self.assertFalse(NamePatterns(['core']).match('mus_musculus_core_99_39'))
+
+    def testLegacyRegex(self):
+        self.assertEqual({'homo_sapiens_core_99_38', 'homoXsapiens_core_99_38'},
+                         NamePatterns(['homo.sapiens_core.*']).filter(self.names))
+        with self.assertRaises(ValueError):
+            NamePatterns(['homo_sapiens[core'])
+
+    def testSql(self):
+        predicate, params = NamePatterns(['homo_sapiens%', 'mus%'], ['%mart%', 'a.*']).sql('SCHEMA_NAME')
+        self.assertEqual('(SCHEMA_NAME LIKE %s OR SCHEMA_NAME LIKE %s)', predicate)
+        self.assertEqual(['homo\\_sapiens%', 'mus%'], params)
+        self.assertEqual(('', []), NamePatterns(skip_filters=['%mart%']).sql('SCHEMA_NAME'))
+        predicate, params = NamePatterns(['core'], contains=True).sql('TABLE_NAME')
+        self.assertEqual(['%core%'], params)
+        self.assertEqual(('', []), NamePatterns(['homo.*']).sql('SCHEMA_NAME'))
+
+    @mock.patch('ensembl.production.dbcopy.catalog.get_engine')
+    def testSqlMixedCase(self, get_engine):
+        names = ['Homo_sapiens_core_99_38', 'homo_sapiens_core_99_38', 'HOMO_SAPIENS_CORE_99_38',
+                 'mus_musculus_core_99_39']
+
+        def like(name, pattern):
+            regex = '.*'.join(re.escape(piece.replace('\\_', '_')) for piece in pattern.split('%'))
+            # information_schema columns collation is case insensitive
+            return re.fullmatch(regex, name, re.IGNORECASE | re.DOTALL) is not None
+
+        def exec_driver_sql(sql, params):
+            rows = []
+            for name in names:
+                matches, remaining = [], list(params)
+                for clause in filter(None, sql.partition(' WHERE ')[2].split(' AND ')):
+                    clause_params = [remaining.pop(0) for _ in range(clause.count('LIKE'))]
+                    matched = any(like(name, param) for param in clause_params)
+                    matches.append(not matched if clause.startswith('NOT') else matched)
+                if all(matches):
+                    rows.append((name,))
+            return rows
+
+        get_engine.return_value.connect.return_value.__enter__.return_value.exec_driver_sql.side_effect = \
+            exec_driver_sql
+        self.assertEqual({'Homo_sapiens_core_99_38', 'mus_musculus_core_99_39'}, query_database_names(
+            'host1', 3306, patterns=NamePatterns(['%_core_%'], ['homo_sapiens%', 'HOMO%'])))
+        self.assertEqual({'homo_sapiens_core_99_38'}, query_database_names(
+            'host1', 3306, patterns=NamePatterns(['homo%'])))
+
+
+class EngineRegistryTest(TestCase):
+
+    @mock.patch('ensembl.production.dbcopy.engines.sa.create_engine')
+    def testReuseAndDispose(self, create_engine):
+        create_engine.side_effect = lambda *args, **kwargs: mock.MagicMock()
+        engines = EngineRegistry(pool_size=3)
+        engine = engines.get('host1', 3306, 'ensro')
+        self.assertIs(engine, engines.get('host1', '3306', 'ensro'))
+        self.assertIsNot(engine, engines.get('host1', 3306, 'ensadmin'))
+        self.assertEqual(2, create_engine.call_count)
+        kwargs = create_engine.call_args[1]
+        self.assertTrue(kwargs['pool_pre_ping'])
+        self.assertEqual(3, kwargs['pool_size'])
+        self.assertEqual(2, len(engines.stats()))
+        self.assertEqual(2, engines.dispose('host1', 3306))
+        engine.dispose.assert_called_once()
+        self.assertEqual([], engines.stats())
+
+    def testHostChangeDisposeEngine(self):
+        host = Host.objects.create(name='host1', port=3306, mysql_user='ensro')
+        with mock.patch.object(registry, 'dispose') as dispose:
+            host.virtual_machine = 'vm1'
+            host.save()
+            dispose.assert_not_called()
+            host.active = False
+            host.save()
+            dispose.assert_called_once_with('host1', 3306, 'ensro')
+            host.delete()
+            self.assertEqual(2, dispose.call_count)
+
+
+class FanOutTest(TestCase):
+
+    def testOrderAndErrors(self):
+        def check(delay):
+            time.sleep(delay)
+            if delay == 0.02:
+                raise ValueError('Invalid host')
+            return delay
+
+        started = time.monotonic()
+        results = fan_out(check, [0.2, 0.02, 0.1, 0.15], max_workers=4)
+        self.assertLess(time.monotonic() - started, 0.4)
+        self.assertEqual([0.2, 0.02, 0.1, 0.15], [item for item, _, _ in results])
+        self.assertEqual([0.2, None, 0.1, 0.15], [result for _, result, _ in results])
+        self.assertIsInstance(results[1][2], ValueError)
+
+    def testTimeout(self):
+        results = fan_out(time.sleep, [0.5, 0], timeout=0.1)
+        self.assertIsInstance(results[0][2], TimeoutError)
+        self.assertIsNone(results[1][2])
+
+    @mock.patch('ensembl.production.dbcopy.validation.query_database_names')
+    def testCleanWipeTargetConcurrent(self, query_database_names):
+        Host.objects.create(name='host3', port=3306, mysql_user='ensadmin')
+        Host.objects.create(name='host4', port=3306, mysql_user='ensro')
+        query_database_names.side_effect = lambda hostname, port, user: {'db1'} if hostname == 'host4' else {'db2'}
+        job = RequestJob(src_host='host1:3306', tgt_host='host3:3306,host4:3306', src_incl_db='db1')
+        with self.assertRaises(ValidationError) as context:
+            job.clean_wipe_target()
+        self.assertIn('src_incl_db', context.exception.message_dict)
+        query_database_names.assert_any_call('host3', '3306', user='ensadmin')
+        job.wipe_target = True
+        job.clean_wipe_target()
+
+
+class AsyncIntrospectionTest(TestCase):
+
+    @staticmethod
+    def url(name, kwargs=None, params=None):
+        # Django 3.2 AsyncClient doesn't turn GET data into a query string
+        return reverse(name, kwargs=kwargs) + ('?' + urlencode(params, doseq=True) if params else '')
+
+    async def testAsyncDatabaseList(self):
+        await sync_to_async(Host.objects.create)(name='host1', port=3306, mysql_user='ensadmin')
+        args = {'host': 'host1', 'port': 3306}
+        with mock.patch('ensembl.production.dbcopy.api.views.get_database_set',
+                        return_value={'db_2', 'db_1'}) as get_database_set:
+            response = await self.async_client.get(self.url('dbcopy_api:databaselist-async', args,
+                                                            {'matches[]': ['db_']}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(['db_1', 'db_2'], json.loads(response.content))
+        self.assertEqual('ensadmin', get_database_set.call_args[1]['user'])
+        response = await self.async_client.get(self.url('dbcopy_api:databaselist-async', args, {'limit': 'all'}))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = await self.async_client.get(reverse('dbcopy_api:databaselist-async',
+                                                       kwargs={**args, 'host': 'bad-host'}))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def testAsyncTableList(self):
+        args = {'host': 'host1', 'port': 3306, 'database': 'db_1'}
+        with mock.patch('ensembl.production.dbcopy.api.views.get_table_set',
+                        side_effect=[{'meta'}, ValueError('Invalid database: db_1')]):
+            response = await self.async_client.get(self.url('dbcopy_api:tablelist-async', args, {'search': 'met'}))
+            self.assertEqual(['meta'], json.loads(response.content))
+            response = await self.async_client.get(self.url('dbcopy_api:tablelist-async', kwargs=args))
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def testAsyncTableLookup(self):
+        url = self.url('ensembl_dbcopy:host-db-table-autocomplete-async', params={
+            'q': 'met', 'forward': json.dumps({'db_host': 'host1:3306', 'src_incl_db': ['db_1']})})
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 302)
+        user = await sync_to_async(User.objects.create_user)('staff', password='staff', is_staff=True)
+        await sync_to_async(self.async_client.force_login)(user)
+        with mock.patch('ensembl.production.dbcopy.async_lookups.get_table_set', return_value={'meta', 'Meta_coord'}):
+            response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual({'meta', 'Meta_coord'}, {item['id'] for item in json.loads(response.content)['results']})
+
+
+class BatchIntrospectionTest(APITestCase):
+
+    @mock.patch('ensembl.production.dbcopy.api.views.get_table_set')
+    @mock.patch('ensembl.production.dbcopy.api.views.get_database_set')
+    def testBatch(self, get_database_set, get_table_set):
+        Host.objects.create(name='host1', port=3306, mysql_user='ensadmin')
+        Host.objects.create(name='host2', port=3306, mysql_user='ensro')
+
+        def database_set(hostname, port, **kwargs):
+            if hostname == 'host2':
+                raise ValueError('Invalid hostname: host2 or port: 3306')
+            return {'db_2', 'db_1'}
+
+        get_database_set.side_effect = database_set
+        get_table_set.return_value = {'meta', 'assembly'}
+        lookups = [{'host': 'host1', 'port': 3306, 'incl_filters': ['db_%']},
+                   {'host': 'host2', 'port': 3306},
+                   {'host': 'host1', 'port': 3306, 'database': 'db_1'},
+                   {'host': 'unknown', 'port': 3306},
+                   {'host': 'host1', 'port': 3306, 'incl_filters': ['db_%']}]
+        response = self.client.post(reverse('dbcopy_api:introspection-batch'), {'lookups': lookups}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual(5, len(results))
+        self.assertEqual(['db_1', 'db_2'], results[0]['databases'])
+        self.assertEqual(results[0], results[4])
+        self.assertIn('Invalid hostname', results[1]['error'])
+        self.assertEqual({'host': 'host1', 'port': 3306, 'database': 'db_1', 'tables': ['assembly', 'meta']},
+                         results[2])
+        self.assertIn('Unknown host', results[3]['error'])
+        # identical lookups are run once
+        self.assertEqual(2, get_database_set.call_count)
+        self.assertEqual('ensadmin', get_table_set.call_args[1]['user'])
+        response = self.client.post(reverse('dbcopy_api:introspection-batch'), {'lookups': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class JobPlannerTest(TestCase):
+
+    def setUp(self):
+        now = timezone.now()
+        host = Host.objects.create(name='host1', port=3306, mysql_user='ensro', schemas_indexed_at=now)
+        for name, tables in (('homo_sapiens_core_1', (('dna', 10, 1000), ('meta', 5, 10))),
+                             ('homo_sapiens_variation_1', (('variation', 10, 500),)),
+                             ('mus_musculus_core_1', (('dna', 10, 2000),))):
+            schema = SchemaSnapshot.objects.create(host=host, table_schema=name, table_count=len(tables),
+                                                   indexed_at=now)
+            for table_name, rows, size in tables:
+                TableSnapshot.objects.create(schema=schema, table_name=table_name, table_rows=rows,
+                                             data_length=size, index_length=size // 10)
+
+    def testPlanFromSnapshot(self):
+        job = RequestJob(src_host='host1:3306', src_incl_db='homo_sapiens%', src_skip_db='%_variation_%',
+                         tgt_host='host2:3306,host3:3306')
+        with mock.patch('ensembl.production.dbcopy.planner.get_engine') as get_engine:
+            self.assertEqual(JobPlan(1, 2, 15, 1111), plan_job(job))
+            job.src_incl_db = '%'
+            job.src_skip_db = None
+            job.src_skip_tables = 'dna'
+            self.assertEqual(JobPlan(2, 2, 15, 561), plan_job(job))
+            get_engine.assert_not_called()
+        job.estimate()
+        self.assertEqual((2, 15, 561), (job.estimated_tables, job.estimated_rows, job.estimated_bytes))
+
+    def testPlanFailureIgnored(self):
+        job = RequestJob(src_host='host2:3306', src_incl_db='db1', tgt_host='host3:3306')
+        with mock.patch('ensembl.production.dbcopy.planner.get_engine', side_effect=ValueError('Invalid host')):
+            self.assertIsNone(job.estimate())
+        self.assertIsNone(job.estimated_bytes)
+
+    def testEstimateJobs(self):
+        job = RequestJob.objects.create(src_host='host1:3306', src_incl_db='homo_sapiens%', src_skip_db='%_variation_%',
+                                        tgt_host='host2:3306', username='testuser')
+        unknown = RequestJob.objects.create(src_host='host2:3306', src_incl_db='db1', tgt_host='host3:3306',
+                                            username='testuser')
+        self.assertIsNone(job.estimated_tables)
+        with mock.patch('ensembl.production.dbcopy.planner.get_engine') as get_engine:
+            get_engine.return_value.connect.return_value.__enter__.return_value.exec_driver_sql.return_value = []
+            self.assertEqual(2, estimate_jobs())
+        self.assertIn('MAX_EXECUTION_TIME(10000)',
+                      get_engine.return_value.connect.return_value.__enter__.return_value.exec_driver_sql.call_args[0][0])
+        job.refresh_from_db()
+        self.assertEqual((2, 15, 1111), (job.estimated_tables, job.estimated_rows, job.estimated_bytes))
+        unknown.refresh_from_db()
+        self.assertEqual(0, unknown.estimated_tables)
+
+
+class ExcludedSchemasTest(TestCase):
+
+    def setUp(self):
+        Dbs2ExcludeManager.bump_version()
+
+    def testVersionedCache(self):
+        Dbs2Exclude.objects.create(table_schema='mysql')
+        self.assertEqual(frozenset(['mysql']), Dbs2Exclude.objects.excluded_schemas())
+        # version read once per request
+        memoize_cache_versions()
+        self.addCleanup(forget_cache_versions)
+        Dbs2Exclude.objects.excluded_schemas()
+        with self.assertNumQueries(0):
+            Dbs2Exclude.objects.excluded_schemas()
+        # saving / deleting through the ORM bumps the version
+        Dbs2Exclude.objects.create(table_schema='sys')
+        self.assertEqual(frozenset(['mysql', 'sys']), Dbs2Exclude.objects.excluded_schemas())
+        Dbs2Exclude.objects.filter(table_schema='sys').delete()
+        self.assertEqual(frozenset(['mysql']), Dbs2Exclude.objects.excluded_schemas())
+
+    def testOtherWorkerChange(self):
+        Dbs2Exclude.objects.bulk_create([Dbs2Exclude(table_schema='mysql')])
+        self.assertEqual(frozenset(['mysql']), Dbs2Exclude.objects.excluded_schemas())
+        # no signal sent, still cached
+        Dbs2Exclude.objects.bulk_create([Dbs2Exclude(table_schema='sys')])
+        self.assertEqual(frozenset(['mysql']), Dbs2Exclude.objects.excluded_schemas())
+        # version bumped by another process, whatever the cache backend
+        CacheVersion.objects.filter(key=Dbs2ExcludeManager.version_key).update(version='other-worker-version')
+        self.assertEqual(frozenset(['mysql', 'sys']), Dbs2Exclude.objects.excluded_schemas())
+        # seen from the next request when bumped during a request
+        memoize_cache_versions()
+        self.addCleanup(forget_cache_versions)
+        Dbs2Exclude.objects.excluded_schemas()
+        Dbs2Exclude.objects.bulk_create([Dbs2Exclude(table_schema='performance_schema')])
+        CacheVersion.objects.filter(key=Dbs2ExcludeManager.version_key).update(version='other-worker-version-2')
+        self.assertNotIn('performance_schema', Dbs2Exclude.objects.excluded_schemas())
+        memoize_cache_versions()
+        self.assertIn('performance_schema', Dbs2Exclude.objects.excluded_schemas())
+        forget_cache_versions()
+        Dbs2Exclude.objects.bulk_create([Dbs2Exclude(table_schema='information_schema')])
+        with self.settings(DBCOPY_EXCLUDED_SCHEMAS_MAX_AGE=0):
+            self.assertIn('information_schema', Dbs2Exclude.objects.excluded_schemas())
+
+
+class ValidationContextTest(TestCase):
+
+    def setUp(self):
+        for name in ('host1', 'host2', 'host3'):
+            Host.objects.create(name=name, port=3306, mysql_user='ensro')
+        User.objects.create(username='testuser', email='testuser@ebi.ac.uk')
+        self.schemas = {'host1': ['db1', 'db2'], 'host2': ['db2'], 'host3': []}
+
+    def load_database_names(self, hostname, port, user):
+        return self.schemas[hostname]
+
+    def query_database_names(self, hostname, port, user='ensro', patterns=None):
+        return set(self.schemas[hostname])
+
+    def testIntrospectedOncePerHost(self):
+        context = ValidationContext()
+        job = RequestJob(src_host='host1:3306', src_incl_db='db1', tgt_host='host2:3306,host3:3306',
+                         tgt_db_name='db_new', username='testuser')
+        with mock.patch.object(catalog, 'ttl', 0), \
+                mock.patch('ensembl.production.dbcopy.catalog._load_database_names',
+                           side_effect=self.load_database_names) as load, \
+                mock.patch('ensembl.production.dbcopy.validation.query_database_names',
+                           side_effect=self.query_database_names) as live:
+            job.clean_hosts(context)
+            # source listed from the catalog, targets from the servers
+            self.assertEqual(1, load.call_count)
+            self.assertEqual(2, live.call_count)
+            other_job = RequestJob(src_host='host1:3306', src_incl_db='db1', tgt_host='host3:3306',
+                                   username='testuser')
+            other_job.clean_hosts(context)
+            conflicting_job = RequestJob(src_host='host1:3306', src_incl_db='db2', tgt_host='host2:3306',
+                                         username='testuser')
+            with self.assertRaises(ValidationError):
+                conflicting_job.clean_hosts(context)
+            self.assertEqual(1, load.call_count)
+            self.assertEqual(2, live.call_count)
+
+    def testMemoLoadedOnce(self):
+        context = ValidationContext()
+        loading = threading.Event()
+        release = threading.Event()
+
+        def load():
+            loading.set()
+            release.wait(5)
+            return ['db1']
+
+        loader = mock.Mock(side_effect=load)
+        first = threading.Thread(target=context.memo, args=('key', loader))
+        first.start()
+        loading.wait(5)
+        # looked up while the first lookup is loading
+        second = fan_out(lambda key: context.memo(key, loader), ['key'], timeout=0.1)
+        self.assertIsInstance(second[0][2], TimeoutError)
+        release.set()
+        first.join(5)
+        self.assertEqual(['db1'], context.memo('key', loader))
+        loader.assert_called_once()
+        failing = mock.Mock(side_effect=ValueError('Invalid host'))
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                context.memo('failing', failing)
+        failing.assert_called_once()
+
+    def testWipeTargetNotFromCatalog(self):
+        # database created on the target after the catalog entry was stored
+        catalog.set(SchemaCatalog.make_key('host2', 3306), ['db2'])
+        self.schemas['host2'] = ['db1', 'db2']
+        job = RequestJob(src_host='host1:3306', src_incl_db='db1', tgt_host='host2:3306', username='testuser')
+        try:
+            with mock.patch('ensembl.production.dbcopy.catalog._load_database_names',
+                            side_effect=self.load_database_names), \
+                    mock.patch('ensembl.production.dbcopy.validation.query_database_names',
+                               side_effect=self.query_database_names):
+                with self.assertRaises(ValidationError) as raised:
+                    job.clean_hosts(ValidationContext())
+        finally:
+            catalog.invalidate('host2')
+        self.assertIn('src_incl_db', raised.exception.message_dict)
+
+    def testTargetChecksMessages(self):
+        HostGroup.objects.create(host_id=Host.objects.get(name='host3'), group_name='Production')
+        HostGroupManager.bump_version()
+        job = RequestJob(src_host='host1:3306', src_incl_db='db2', tgt_host='host2:3306', username='testuser')
+        with mock.patch('ensembl.production.dbcopy.catalog._load_database_names',
+                        side_effect=self.load_database_names), \
+                mock.patch('ensembl.production.dbcopy.validation.query_database_names',
+                           side_effect=self.query_database_names):
+            with self.assertRaises(ValidationError) as raised:
+                job.clean_hosts(ValidationContext())
+            self.assertIn('src_incl_db', raised.exception.message_dict)
+            job.wipe_target = True
+            job.clean_hosts(ValidationContext())
+            for tgt_host, message in (('host3:3306', 'You are not allowed to copy to host3'),
+                                      ('host9:3306', 'host9 is not present in our system')):
+                job.tgt_host = tgt_host
+                with self.assertRaises(ValidationError) as raised:
+                    job.clean_hosts(ValidationContext())
+                self.assertEqual([message], raised.exception.message_dict['tgt_host'])
+
+
+class TransferCountersTest(TestCase):
+
+    def setUp(self):
+        with self.settings(DBCOPY_PLAN_ON_SUBMIT=False):
+            self.job = RequestJob.objects.create(src_host='host1:3306', src_incl_db='db1', tgt_host='host2:3306',
+                                                 username='testuser', status='Try:1/3. 0/2 Transferred')
+
+    def add_transfer(self, table_name, **kwargs):
+        return TransferLog.objects.create(job_id=self.job, tgt_host='host2:3306', table_schema='db1',
+                                          table_name=table_name, renamed_table_schema='db1', **kwargs)
+
+    def testCountersMaintained(self):
+        meta = self.add_transfer('meta')
+        self.add_transfer('dna', end_date=timezone.now())
+        self.job.refresh_from_db()
+        with self.assertNumQueries(0):
+            self.assertEqual((2, 1, 1), (self.job.nb_transfers, self.job.done_transfers, self.job.running_transfers))
+            self.assertEqual('50.0', self.job.progress)
+            self.assertEqual('Running', self.job.global_status)
+        # job saved with outdated counters
+        meta.end_date = timezone.now()
+        meta.save()
+        self.job.save()
+        self.job.refresh_from_db()
+        self.assertEqual((2, 2), (self.job.expected, self.job.completed))
+        self.assertEqual('Failed', self.job.global_status)
+        meta.delete()
+        self.job.refresh_from_db()
+        self.assertEqual((1, 1), (self.job.expected, self.job.completed))
+
+    def testResubmitJob(self):
+        self.add_transfer('meta', end_date=timezone.now())
+        RequestJob.objects.filter(pk=self.job.pk).update(status='Transfer Ended', overall_status='Complete')
+        admin_user = User.objects.create_superuser('admin', 'admin@ebi.ac.uk', 'admin')
+        self.client.force_login(admin_user)
+        with self.settings(DBCOPY_PLAN_ON_SUBMIT=False):
+            response = self.client.post(reverse('admin:ensembl_dbcopy_requestjob_changelist') + '?user=All',
+                                        {'action': 'resubmit_jobs', '_selected_action': [self.job.pk]})
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        new_job = RequestJob.objects.exclude(pk=self.job.pk).get()
+        self.assertEqual(('admin', None, None, 'Submitted'), (new_job.username, new_job.expected, new_job.completed,
+                                                              new_job.overall_status))
+
+    def testTriggersDefinitions(self):
+        schema_editor = mock.Mock(connection=mock.Mock(vendor='mysql'))
+        install_triggers(schema_editor)
+        created = [call.args[0] for call in schema_editor.execute.call_args_list if call.args[0].startswith('CREATE')]
+        self.assertEqual([TRIGGERS[name] for name in COUNTER_TRIGGERS], created)
+        for name in STATUS_TRIGGERS:
+            self.assertIn('current_try', TRIGGERS[name])
+            # MySQL 8.0.22+ refuses regular expressions mixing binary and non binary strings
+            self.assertNotRegex(TRIGGERS[name], r'BINARY [^=]* REGEXP')
+            self.assertIn("'c')", TRIGGERS[name])
+
+    def testResetFailedJob(self):
+        RequestJob.objects.filter(pk=self.job.pk).update(status='Error: lost connection', overall_status='Failed',
+                                                         **dict.fromkeys(TryProgress._fields))
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@ebi.ac.uk', 'admin'))
+        response = self.client.get(reverse('ensembl_dbcopy:reset_failed_jobs', args=[self.job.pk]))
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        self.job.refresh_from_db()
+        self.assertEqual(('Manually Launched by Production team', 'Submitted'),
+                         (self.job.status, self.job.overall_status))
+
+    def testResetExhaustedJob(self):
+        self.job.status = 'Try:3/3. 1/2 Transferred'
+        self.job.save()
+        self.assertEqual(('Failed', None), (self.job.overall_status, self.job.active_fingerprint))
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@ebi.ac.uk', 'admin'))
+        self.client.get(reverse('ensembl_dbcopy:reset_failed_jobs', args=[self.job.pk]))
+        self.job.refresh_from_db()
+        self.assertEqual(('Submitted', None), (self.job.overall_status, self.job.try_progress))
+        self.assertTrue(self.job.is_active)
+        self.assertEqual(self.job.params_fingerprint, self.job.active_fingerprint)
+        # the reset job holds its parameters again
+        with self.settings(DBCOPY_PLAN_ON_SUBMIT=False), self.assertRaises(ValidationError):
+            RequestJob.objects.create(src_host='host1:3306', src_incl_db='db1', tgt_host='host2:3306',
+                                      username='testuser')
+
+    def testOverallStatus(self):
+        self.assertEqual(['Submitted', 'Complete', 'Running', 'Failed', 'Complete', 'Scheduled', 'Failed', 'Submitted'],
+                         [overall_status(status, 1) for status in (None, 'Transfer Ended', 'Try:1/3. 1/2 Transferred',
+                                                                   'Try:3/3. 1/2 Transferred',
+                                                                   'Try:2/3. 2/2 Transferred', 'Creating Requests',
+                                                                   'Error: lost connection', 'Try:1/3')])
+        self.add_transfer('meta')
+        self.job.status = 'Processing Requests'
+        self.job.save()
+        response = self.client.get(reverse('dbcopy_api:requestjob-list'), {'status': 'Running,Scheduled'})
+        self.assertEqual([self.job.job_id], [job['job_id'] for job in response.json()])
+        response = self.client.get(reverse('dbcopy_api:requestjob-list'), {'status': 'Failed'})
+        self.assertEqual([], response.json())
+
+    def testTryProgress(self):
+        self.add_transfer('meta')
+        self.job.status = 'Try:2/3. 140/200 Transferred'
+        self.job.save()
+        self.job.refresh_from_db()
+        self.assertEqual(TryProgress(2, 3, 140, 200), self.job.try_progress)
+        self.assertEqual('Running', self.job.overall_status)
+        self.job.status = 'Try:2/3. 200/200 Transferred'
+        self.job.save()
+        self.assertEqual('Complete', self.job.overall_status)
+        self.assertEqual('Running', overall_status('Copying', 1, TryProgress(1, 3, 10, 20)))
+        url = reverse('dbcopy_api:requestjob-list')
+        response = self.client.get(url, {'current_try__gt': 1, 'ordering': '-current_try'})
+        self.assertEqual([self.job.job_id], [job['job_id'] for job in response.json()])
+        self.assertEqual(200, response.json()[0]['copied'])
+        response = self.client.get(url, {'max_tries__lt': 3})
+        self.assertEqual([], response.json())
+        response = self.client.get(url, {'current_try': 'two'})
+        self.assertEqual(400, response.status_code)
+        # progress written to the columns directly is kept whatever the status
+        self.job.status = 'Copying'
+        self.job.current_try, self.job.copied = 3, 150
+        self.job.save()
+        self.job.refresh_from_db()
+        self.assertEqual((TryProgress(3, 3, 150, 200), 'Failed'), (self.job.try_progress, self.job.overall_status))
+
+    async def testWaitJobVersion(self):
+        meta = await sync_to_async(self.add_transfer)('meta')
+        await sync_to_async(self.add_transfer)('dna', start_date=timezone.now())
+        version = await sync_to_async(job_version)(self.job.job_id)
+        sleeps = []
+
+        async def sleep(interval):
+            sleeps.append(interval)
+            if len(sleeps) == 2:
+                await sync_to_async(TransferLog.objects.filter(pk=meta.pk).update)(end_date=timezone.now())
+
+        self.assertEqual(version, await wait_job_version(self.job.job_id, 'stale', 10, sleep=sleep))
+        self.assertEqual([], sleeps)
+        changed = await wait_job_version(self.job.job_id, version[0], 10, sleep=sleep)
+        self.assertNotEqual(version[0], changed[0])
+        self.assertEqual([2, 2], sleeps)
+        self.assertEqual(changed, await wait_job_version(self.job.job_id, changed[0], 5, sleep=sleep))
+        self.assertEqual([2, 2, 2, 2, 1], sleeps)
+        self.assertIsNone(await wait_job_version(0, changed[0], 5, sleep=sleep))
+
+    @override_settings(DBCOPY_PROGRESS_WAIT=1, DBCOPY_PROGRESS_POLL_INTERVAL=0.01)
+    async def testJobEvents(self):
+        # served by the ASGI handler, as in production
+        await sync_to_async(self.add_transfer)('meta', end_date=timezone.now(), size=10)
+        self.job.status = 'Transfer Ended'
+        await sync_to_async(self.job.save)()
+        url = reverse('dbcopy_api:requestjob-events', kwargs={'job_id': self.job.job_id})
+        response = await self.async_client.get(url)
+        self.assertEqual(status.HTTP_200_OK, response.status_code)
+        events = json.loads(response.content)
+        self.assertTrue(events['ended'])
+        self.assertEqual(('Complete', 1, 10), tuple(events['progress'][key] for key in (
+            'overall_status', 'tables_done', 'bytes_done')))
+        self.assertEqual('"{}"'.format(events['version']), response['ETag'])
+        start = time.monotonic()
+        response = await self.async_client.get(url + '?' + urlencode({'version': events['version']}))
+        self.assertEqual(status.HTTP_304_NOT_MODIFIED, response.status_code)
+        self.assertGreaterEqual(time.monotonic() - start, 1)
+        response = await self.async_client.get(url + '?' + urlencode({'version': events['version'], 'wait': 0}))
+        self.assertEqual(status.HTTP_304_NOT_MODIFIED, response.status_code)
+        response = await self.async_client.get(url + '?' + urlencode({'version': 'stale', 'wait': 60}))
+        self.assertEqual(events, json.loads(response.content))
+        response = await self.async_client.get(url + '?wait=long')
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+        response = await self.async_client.post(url)
+        self.assertEqual(status.HTTP_405_METHOD_NOT_ALLOWED, response.status_code)
+        response = await self.async_client.get(reverse('dbcopy_api:requestjob-events', kwargs={'job_id': 0}))
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+
+    def testThroughput(self):
+        self.add_transfer('meta', end_date=timezone.now(), size=1000)
+        self.add_transfer('dna')
+        self.add_transfer('gene')
+        RequestJob.objects.filter(pk=self.job.pk).update(estimated_bytes=5000)
+        start = timezone.now() - datetime.timedelta(seconds=20)
+        ProgressSample.objects.create(job=self.job, sampled_at=start, tables_done=0, bytes_done=0)
+        self.assertEqual(1, record_samples(now=start + datetime.timedelta(seconds=10)))
+        self.job.refresh_from_db()
+        self.assertEqual(Throughput(100, 0.1, 40), self.job.throughput)
+        detailed_status = self.client.get(reverse('dbcopy_api:requestjob-detail',
+                                                  kwargs={'job_id': self.job.job_id})).json()['detailed_status']
+        self.assertEqual((100, 40), (detailed_status['bytes_per_second'], detailed_status['eta']))
+        with self.assertNumQueries(0):
+            self.assertNotIn('eta', self.job.detailed_status)
+        self.assertIn('100\xa0bytes/s, ETA 0:00:40', self.job.completion)
+        RequestJob.objects.filter(pk=self.job.pk).update(estimated_bytes=None)
+        self.job.refresh_from_db()
+        self.assertEqual(20, self.job.throughput.eta)
+        self.assertIsNone(job_throughput(self.job, now=start))
+
+    def testDownsample(self):
+        self.add_transfer('meta')
+        start = timezone.now()
+        ProgressSample.objects.bulk_create([
+            ProgressSample(job=self.job, sampled_at=start + datetime.timedelta(minutes=i), tables_done=i,
+                           bytes_done=i) for i in range(10)])
+        self.assertEqual(0, downsample(kept=4))
+        RequestJob.objects.filter(pk=self.job.pk).update(overall_status='Complete')
+        self.assertEqual(6, downsample(kept=4))
+        self.assertEqual([0, 3, 6, 9], list(self.job.progress_samples.order_by('sampled_at').values_list(
+            'tables_done', flat=True)))
+
+    def testBulkStatus(self):
+        self.add_transfer('meta', end_date=timezone.now())
+        self.add_transfer('dna')
+        url = reverse('dbcopy_api:requestjob-bulk-status')
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {'job_ids': 'unknown,{}'.format(self.job.job_id)})
+        self.assertEqual(['unknown'], response.json()['not_found'])
+        job_status, = response.json()['results']
+        self.assertEqual((self.job.job_id, 'Running', '50.0', 1, 2), tuple(job_status[key] for key in (
+            'job_id', 'global_status', 'progress', 'table_copied', 'total_tables')))
+        response = self.client.post(url, {'job_ids': [self.job.job_id]}, content_type='application/json')
+        self.assertEqual([self.job.job_id], [job['job_id'] for job in response.json()['results']])
+        with self.settings(DBCOPY_BATCH_MAX_JOBS=1):
+            response = self.client.post(url, {'job_ids': ['a', 'b']}, content_type='application/json')
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, response.status_code)
+
+    def testTransfersExport(self):
+        for table_name in ('meta', 'dna', 'gene'):
+            self.add_transfer(table_name, end_date=timezone.now(), size=10)
+        url = reverse('dbcopy_api:transfers-list', kwargs={'job_id': self.job.job_id})
+        with mock.patch.object(TransferLogView, 'export_chunk_size', 2):
+            response = self.client.get(url, {'export': 'ndjson'})
+            # chunks are queried as the content is consumed: 2 transfers, 1 transfer, then none
+            with CaptureQueriesContext(connection) as queries:
+                lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(3, len(queries))
+        self.assertEqual('application/x-ndjson', response['Content-Type'])
+        self.assertEqual([('meta', 'Complete'), ('dna', 'Complete'), ('gene', 'Complete')],
+                         [(row['table_name'], row['table_status']) for row in map(json.loads, lines)])
+        response = self.client.get(url, {'export': 'csv'})
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(['tgt_host', 'table_schema', 'table_name'], rows[0][:3])
+        self.assertEqual(['meta', 'dna', 'gene'], [row[2] for row in rows[1:]])
+        self.assertEqual(status.HTTP_400_BAD_REQUEST, self.client.get(url, {'export': 'xml'}).status_code)
+        response = self.client.get(url, {'page_size': 2})
+        self.assertEqual(['meta', 'dna'], [row['table_name'] for row in response.json()['results']])
+        self.assertEqual(3, len(self.client.get(url).json()))
+
+    async def testTransfersExportAsgi(self):
+        await sync_to_async(self.add_transfer)('meta', end_date=timezone.now(), size=10)
+        url = reverse('dbcopy_api:transfers-list', kwargs={'job_id': self.job.job_id})
+        response = await self.async_client.get(url + '?export=csv')
+        self.assertEqual(status.HTTP_501_NOT_IMPLEMENTED, response.status_code)
+        response = await self.async_client.get(url)
+        self.assertEqual(['meta'], [row['table_name'] for row in json.loads(response.content)])
+
+    def testConditionalResponses(self):
+        transfer = self.add_transfer('meta', start_date=timezone.now())
+        for url in (reverse('dbcopy_api:requestjob-detail', kwargs={'job_id': self.job.job_id}),
+                    reverse('dbcopy_api:transfers-list', kwargs={'job_id': self.job.job_id})):
+            response = self.client.get(url)
+            self.assertEqual(status.HTTP_200_OK, response.status_code)
+            etag, last_modified = response['ETag'], response['Last-Modified']
+            with self.assertNumQueries(1):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(status.HTTP_304_NOT_MODIFIED, response.status_code)
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+            self.assertEqual(status.HTTP_304_NOT_MODIFIED, response.status_code)
+            TransferLog.objects.filter(pk=transfer.pk).update(end_date=timezone.now() + datetime.timedelta(seconds=2))
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(status.HTTP_200_OK, response.status_code)
+            self.assertNotEqual(etag, response['ETag'])
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+            self.assertEqual(status.HTTP_200_OK, response.status_code)
+            TransferLog.objects.filter(pk=transfer.pk).update(end_date=None)
+        url = reverse('dbcopy_api:requestjob-detail', kwargs={'job_id': self.job.job_id})
+        past = timezone.now() - datetime.timedelta(hours=1)
+        RequestJob.objects.filter(pk=self.job.pk).update(request_date=past, last_changed=past)
+        TransferLog.objects.filter(pk=transfer.pk).update(start_date=past)
+        for field, value in (('status', 'Copying'), ('email_list', 'other@ebi.ac.uk'), ('progress_sample', None)):
+            RequestJob.objects.filter(pk=self.job.pk).update(last_changed=past)
+            response = self.client.get(url)
+            etag, last_modified = response['ETag'], response['Last-Modified']
+            job = RequestJob.objects.get(pk=self.job.pk)
+            if field == 'progress_sample':
+                ProgressSample.objects.create(job=job, sampled_at=timezone.now(), tables_done=1, bytes_done=1)
+            else:
+                setattr(job, field, value)
+                job.save()
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(status.HTTP_200_OK, response.status_code)
+            self.assertNotEqual(etag, response['ETag'])
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+            self.assertEqual(status.HTTP_200_OK, response.status_code)
+        response = self.client.get(reverse('dbcopy_api:requestjob-detail', kwargs={'job_id': 'unknown'}))
+        self.assertEqual(status.HTTP_404_NOT_FOUND, response.status_code)
+
+    def testSparseFields(self):
+        self.add_transfer('meta')
+        url = reverse('dbcopy_api:requestjob-list')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'fields': 'job_id,overall_status'})
+        self.assertEqual([{'job_id': self.job.job_id, 'overall_status': 'Running'}], response.json())
+        self.assertNotIn('src_incl_db', queries[0]['sql'])
+        response = self.client.get(url, {'omit': 'transfer_logs,url'})
+        self.assertNotIn('transfer_logs', response.json()[0])
+        self.assertIn('src_incl_db', response.json()[0])
+        with mock.patch.object(RequestJob, 'throughput') as throughput:
+            response = self.client.get(reverse('dbcopy_api:requestjob-detail', kwargs={'job_id': self.job.job_id}),
+                                       {'fields': 'job_id,user'})
+        self.assertEqual({'job_id': self.job.job_id, 'user': 'testuser'}, response.json())
+        self.assertFalse(throughput.called)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('dbcopy_api:transfers-list', kwargs={'job_id': self.job.job_id}),
+                                       {'fields': 'table_name'})
+        self.assertEqual([{'table_name': 'meta'}], response.json())
+        self.assertNotIn('JOIN', queries[-1]['sql'])
+
+    def testRefreshCounters(self):
+        self.add_transfer('meta')
+        RequestJob.objects.update(expected=None, completed=None)
+        refresh_counters(RequestJob.objects.all(), TransferLog.objects.all())
+        self.job.refresh_from_db()
+        self.assertEqual((1, 0), (self.job.expected, self.job.completed))
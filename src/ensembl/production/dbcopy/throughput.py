@@ -0,0 +1,98 @@
+#   See the NOTICE file distributed with this work for additional information
+#   regarding copyright ownership.
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+"""
+Jobs throughput, from periodic progress samples (tables and bytes done) of the running jobs.
+
+Samples are recorded by the sample_job_progress command, and thinned out once their job ended.
+"""
+import collections
+import datetime
+
+from django.conf import settings
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from ensembl.production.dbcopy.counters import ENDED_STATUSES
+from ensembl.production.dbcopy.models import ProgressSample, RequestJob, TransferLog
+
+Throughput = collections.namedtuple('Throughput', ('bytes_per_second', 'tables_per_second', 'eta'))
+
+
+def record_samples(jobs=None, now=None):
+    """
+    Sample the progress of the running jobs
+    :param jobs: RequestJob QuerySet, all jobs by default
+    :param now: datetime, samples timestamp
+    :return: number of samples recorded
+    """
+    jobs = (RequestJob.objects.all() if jobs is None else jobs).filter(overall_status='Running')
+    tables_done = dict(jobs.values_list('pk', 'completed'))
+    if not tables_done:
+        return 0
+    bytes_done = dict(TransferLog.objects.filter(job_id__in=tables_done, end_date__isnull=False).order_by().values(
+        'job_id').annotate(total=Sum('size')).values_list('job_id', 'total'))
+    now = now or timezone.now()
+    return len(ProgressSample.objects.bulk_create([
+        ProgressSample(job_id=job_id, sampled_at=now, tables_done=tables or 0, bytes_done=bytes_done.get(job_id) or 0)
+        for job_id, tables in tables_done.items()
+    ]))
+
+
+def job_throughput(job, window=None, now=None):
+    """
+    Rolling throughput over the job samples of the last window seconds (before the job end for ended jobs), and
+    the resulting time remaining, from the estimated size (see RequestJob.estimate) or from the remaining
+    transfers otherwise
+    :param job: RequestJob
+    :param window: int, seconds, DBCOPY_THROUGHPUT_WINDOW by default
+    :param now: datetime, end of the window
+    :return: Throughput, None without two samples in the window
+    """
+    window = window or getattr(settings, 'DBCOPY_THROUGHPUT_WINDOW', 600)
+    now = now or job.end_date or timezone.now()
+    since = now - datetime.timedelta(seconds=window)
+    samples = job.progress_samples.filter(sampled_at__gte=since, sampled_at__lte=now).order_by('sampled_at')
+    first = samples.first()
+    last = samples.last()
+    if first is None or first.pk == last.pk or last.sampled_at <= first.sampled_at:
+        return None
+    elapsed = (last.sampled_at - first.sampled_at).total_seconds()
+    bytes_per_second = (last.bytes_done - first.bytes_done) / elapsed
+    tables_per_second = (last.tables_done - first.tables_done) / elapsed
+    eta = None
+    if job.global_status in ENDED_STATUSES:
+        eta = 0
+    elif job.estimated_bytes and bytes_per_second > 0:
+        eta = max(job.estimated_bytes - last.bytes_done, 0) / bytes_per_second
+    elif tables_per_second > 0:
+        eta = max(job.nb_transfers - last.tables_done, 0) / tables_per_second
+    return Throughput(bytes_per_second, tables_per_second, eta)
+
+
+def downsample(jobs=None, kept=None):
+    """
+    Thin out the samples of the ended jobs, down to kept evenly spaced samples per job, first and last included
+    :param jobs: RequestJob QuerySet, all jobs by default
+    :param kept: int, DBCOPY_PROGRESS_SAMPLES_KEPT by default
+    :return: number of samples deleted
+    """
+    kept = max(kept or getattr(settings, 'DBCOPY_PROGRESS_SAMPLES_KEPT', 20), 2)
+    jobs = (RequestJob.objects.all() if jobs is None else jobs).filter(overall_status__in=ENDED_STATUSES)
+    deleted = 0
+    for job_id in jobs.annotate(samples=Count('progress_samples')).filter(samples__gt=kept).values_list(
+            'pk', flat=True).iterator():
+        sample_ids = list(ProgressSample.objects.filter(job_id=job_id).order_by('sampled_at').values_list(
+            'pk', flat=True))
+        step = (len(sample_ids) - 1) / (kept - 1)
+        kept_ids = {sample_ids[round(i * step)] for i in range(kept)}
+        deleted += ProgressSample.objects.filter(job_id=job_id).exclude(pk__in=kept_ids).delete()[0]
+    return deleted
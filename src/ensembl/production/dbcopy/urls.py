@@ -13,6 +13,7 @@ from django.urls import path
 
 from .views import reset_failed_jobs, requestjob_checks_warning, group_choice
 from .lookups import SrcHostLookup, TgtHostLookup, DbLookup, TableLookup
+from .async_lookups import db_lookup, table_lookup
 from django.contrib.admin.views.decorators import staff_member_required
 
 app_name = 'ensembl_dbcopy'
@@ -24,5 +25,7 @@ urlpatterns = [
     path('lookups/tgthost', staff_member_required(TgtHostLookup.as_view()), name='tgt-host-autocomplete'),
     path('lookups/srcdb', staff_member_required(DbLookup.as_view()), name='host-db-autocomplete'),
     path('lookups/srctables', staff_member_required(TableLookup.as_view()), name='host-db-table-autocomplete'),
+    path('lookups/async/srcdb', db_lookup, name='host-db-autocomplete-async'),
+    path('lookups/async/srctables', table_lookup, name='host-db-table-autocomplete-async'),
     path('jobschecks/dbnames/', requestjob_checks_warning, name='job-checks-host'),
 ]
@@ -1,11 +1,120 @@
+import asyncio
+import functools
+import hashlib
 import logging
+import threading
+import time
+from concurrent import futures
 
+from django.conf import settings
+from django.db import connections
 
 logger = logging.getLogger(__name__)
 
 
 def get_filters(values):
-    named_filters = {v.replace('%', '.*') for v in values if v}.difference({''})
+    """
+    Non empty name patterns (see ensembl.production.dbcopy.patterns)
+    """
+    named_filters = {v.strip() for v in values if v}.difference({''})
     logger.debug("from %s", values)
     logger.debug("filters %s", named_filters)
     return named_filters
+
+
+def _names(value):
+    return [name.strip().lower() for name in (value or '').split(',') if name.strip()]
+
+
+def params_fingerprint(params):
+    """
+    Case, whitespace and order insensitive hash of job parameters, e.g. for equivalent jobs lookup.
+    Target db names being the renaming of the included dbs, their order follows the included dbs one.
+    :param params: dict of comma separated names lists, None for unset
+    :return: str, sha256 hex digest
+    """
+    names = {key: sorted(set(_names(value))) for key, value in params.items()}
+    incl_db, tgt_db = _names(params.get('src_incl_db')), _names(params.get('tgt_db_name'))
+    if tgt_db and len(tgt_db) == len(incl_db):
+        names['src_incl_db'], names['tgt_db_name'] = map(list, zip(*sorted(set(zip(incl_db, tgt_db)))))
+    digest = hashlib.sha256()
+    for key in sorted(names):
+        digest.update(('%s=%s\n' % (key, ','.join(names[key]))).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _call_and_close(func, *args, **kwargs):
+    try:
+        return func(*args, **kwargs)
+    finally:
+        connections.close_all()
+
+
+FANOUT_WORKERS = getattr(settings, 'DBCOPY_FANOUT_WORKERS', 8)
+FANOUT_TIMEOUT = getattr(settings, 'DBCOPY_FANOUT_TIMEOUT', 30)
+
+
+def fan_out(func, items, timeout=FANOUT_TIMEOUT, max_workers=FANOUT_WORKERS):
+    """
+    Call func on every item concurrently, in a bounded thread pool.
+    Each call is given `timeout` seconds once a worker is available for it, a call still running
+    after that is reported as failed with a TimeoutError (the thread itself is left to finish).
+    Database connections opened by func through the Django ORM are closed once it returns.
+    :param func: callable taking one item
+    :param items: iterable of items
+    :param timeout: seconds per call, None to wait indefinitely
+    :param max_workers: maximum number of concurrent calls
+    :return: list of (item, result, exception) tuples, in items order
+    """
+    items = list(items)
+    if not items:
+        return []
+    workers = max(1, min(len(items), max_workers))
+    executor = futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dbcopy-fanout')
+    started = time.monotonic()
+    submitted = []
+    results = []
+    try:
+        submitted = [executor.submit(_call_and_close, func, item) for item in items]
+        for position, (item, future) in enumerate(zip(items, submitted)):
+            remaining = None
+            if timeout is not None:
+                remaining = max(0, started + timeout * (position // workers + 1) - time.monotonic())
+            try:
+                results.append((item, future.result(timeout=remaining), None))
+            except futures.TimeoutError:
+                future.cancel()
+                logger.warning("Call for %s timed out after %ss", item, timeout)
+                results.append((item, None, TimeoutError('Timed out after {}s'.format(timeout))))
+            except Exception as e:
+                results.append((item, None, e))
+    finally:
+        for future in submitted:
+            future.cancel()
+        executor.shutdown(wait=False)
+    return results
+
+
+INTROSPECTION_WORKERS = getattr(settings, 'DBCOPY_ASYNC_WORKERS', 32)
+_introspection_executor = None
+_introspection_executor_lock = threading.Lock()
+
+
+def get_introspection_executor():
+    global _introspection_executor
+    with _introspection_executor_lock:
+        if _introspection_executor is None:
+            _introspection_executor = futures.ThreadPoolExecutor(max_workers=INTROSPECTION_WORKERS,
+                                                                 thread_name_prefix='dbcopy-introspect')
+    return _introspection_executor
+
+
+async def run_introspection(func, *args, **kwargs):
+    """
+    Await a blocking introspection call (e.g. catalog.get_database_set) without blocking the event loop.
+    Calls run in a dedicated pool of `DBCOPY_ASYNC_WORKERS` threads, so that slow hosts can't starve the
+    default executor used by sync_to_async.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_introspection_executor(),
+                                      functools.partial(_call_and_close, func, *args, **kwargs))
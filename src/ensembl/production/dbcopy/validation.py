@@ -0,0 +1,125 @@
+#   See the NOTICE file distributed with this work for additional information
+#   regarding copyright ownership.
+#   Licensed under the Apache License, Version 2.0 (the "License");
+#   you may not use this file except in compliance with the License.
+#   You may obtain a copy of the License at
+#       http://www.apache.org/licenses/LICENSE-2.0
+#   Unless required by applicable law or agreed to in writing, software
+#   distributed under the License is distributed on an "AS IS" BASIS,
+#   WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#   See the License for the specific language governing permissions and
+#   limitations under the License.
+"""
+Request scoped memo of the hosts introspection, shared by the validation steps of one or more jobs.
+"""
+import threading
+from concurrent import futures
+
+from ensembl.production.dbcopy.catalog import get_database_names, get_table_names_set, query_database_names, \
+    query_table_names
+from ensembl.production.dbcopy.models import Dbs2Exclude, Host
+from ensembl.production.dbcopy.patterns import NamePatterns
+
+
+class ValidationContext:
+    """
+    Each registered host, host schemas list and database tables list is fetched once per context, failures
+    included, whatever the number of validation steps or validated jobs using it.
+    Schemas and tables lists can be fetched from concurrent threads.
+    Checks guarding against data loss (names already present on a target) ask for fresh lists, read from the
+    server and not from the catalog or the local index, which may be minutes old.
+    """
+
+    def __init__(self):
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    def memo(self, key, loader):
+        """
+        Concurrent lookups of a key wait for the first one, so loader is called once per key.
+        :param key: hashable
+        :param loader: callable, called on the first lookup of key. Its result or exception is kept.
+        :return: loader result
+        """
+        with self._lock:
+            future = self._memo.get(key)
+            owner = future is None
+            if owner:
+                future = self._memo[key] = futures.Future()
+        if owner:
+            try:
+                future.set_result(loader())
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+
+    def prefetch_hosts(self, hostnames):
+        """
+        Load the registered hosts named hostnames in one query
+        """
+        hostnames = set(hostnames)
+        hosts = {}
+        for host in Host.objects.filter(name__in=hostnames):
+            hosts.setdefault(host.name, []).append(host)
+        with self._lock:
+            for hostname in hostnames:
+                if ('hosts', hostname) not in self._memo:
+                    future = self._memo[('hosts', hostname)] = futures.Future()
+                    future.set_result(hosts.get(hostname, []))
+
+    def hosts(self, hostname):
+        """
+        :return: list of registered Host named hostname, whatever their port
+        """
+        return self.memo(('hosts', hostname), lambda: list(Host.objects.filter(name=hostname)))
+
+    def host(self, hostname, port):
+        """
+        :return: registered Host or None
+        """
+        return next((host for host in self.hosts(hostname) if str(host.port) == str(port)), None)
+
+    def user(self, hostname, port):
+        host = self.host(hostname, port)
+        return host.mysql_user if host else 'ensro'
+
+    def excluded_schemas(self):
+        return self.memo('excluded_schemas', Dbs2Exclude.objects.excluded_schemas)
+
+    def database_names(self, hostname, port, fresh=False):
+        """
+        :param fresh: read the list from the server, bypassing the catalog
+        :return: frozenset of all the schema names present on the server
+        :raise: ValueError when the server can't be introspected
+        """
+        user = self.user(hostname, port)
+        if fresh:
+            return self.memo(('databases', hostname, str(port), 'fresh'),
+                             lambda: frozenset(query_database_names(hostname, port, user=user)))
+        return self.memo(('databases', hostname, str(port)), lambda: get_database_names(hostname, port, user=user))
+
+    def database_set(self, hostname, port, incl_filters=None, skip_filters=None, contains=False, fresh=False):
+        """
+        Schema names matching the filters (see ensembl.production.dbcopy.patterns)
+        :param fresh: read the list from the server, bypassing the catalog
+        :return: set
+        """
+        return NamePatterns(incl_filters, skip_filters, contains).filter(self.database_names(hostname, port, fresh))
+
+    def table_names(self, hostname, port, database, fresh=False):
+        """
+        :param fresh: read the list from the server, bypassing the catalog
+        :return: frozenset of all the table names present in database
+        :raise: ValueError when the database does not exist
+        """
+        user = self.user(hostname, port)
+        if fresh:
+            return self.memo(('tables', hostname, str(port), database, 'fresh'),
+                             lambda: frozenset(query_table_names(hostname, port, database, user=user)))
+        return self.memo(('tables', hostname, str(port), database),
+                         lambda: get_table_names_set(hostname, port, database, user=user))
+
+    def table_set(self, hostname, port, database, incl_filters=None, skip_filters=None, contains=False,
+                  fresh=False):
+        return NamePatterns(incl_filters, skip_filters, contains).filter(
+            self.table_names(hostname, port, database, fresh))
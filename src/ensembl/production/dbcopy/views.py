@@ -14,14 +14,13 @@ import logging
 from django.contrib import messages
 from django.contrib.admin.views.decorators import staff_member_required
 from django.core.exceptions import ValidationError
-from django.shortcuts import redirect
+from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse
 from django.views.decorators.http import require_http_methods
-from ensembl.production.core.db_introspects import get_database_set, get_table_set
 
-from ensembl.production.dbcopy.lookups import get_excluded_schemas
-from ensembl.production.dbcopy.models import RequestJob, Host
-from ensembl.production.dbcopy.utils import get_filters
+from ensembl.production.dbcopy.models import RequestJob
+from ensembl.production.dbcopy.utils import fan_out, get_filters
+from ensembl.production.dbcopy.validation import ValidationContext
 
 logger = logging.getLogger(__name__)
 
@@ -30,11 +29,18 @@ logger = logging.getLogger(__name__)
 @staff_member_required
 def reset_failed_jobs(request, *args, **kwargs):
     job_id = kwargs['job_id']
-    request_job = RequestJob.objects.filter(job_id=job_id)
-    request_job.update(status='Manually Launched by Production team')
-    obj = request_job[0]
+    obj = get_object_or_404(RequestJob, job_id=job_id)
+    obj.status = 'Manually Launched by Production team'
+    # the job starts over: its previous tries progress no longer applies
+    obj.current_try = obj.max_tries = obj.copied = obj.total_copies = None
     url = reverse('admin:%s_%s_change' % (obj._meta.app_label, obj._meta.model_name),
                   args=[obj.job_id])
+    try:
+        # saved for the overall status and the equivalent jobs fingerprint to follow the status
+        obj.save()
+    except ValidationError as e:
+        messages.error(request, "The failed jobs for %s could not be reset: %s" % (job_id, '; '.join(e.messages)))
+        return redirect(url)
     messages.success(request, "All the failed jobs for %s have been successfully reset" % job_id)
     return redirect(url)
 
@@ -54,9 +60,10 @@ def requestjob_checks_warning(request):
         posted = {k: v for k, v in request.POST.items() if 'FORMS' not in k}
         posted.pop('csrfmiddlewaretoken')
         request_job = RequestJob(**posted)
+        context = ValidationContext()
         try:
             exclude = ['tgt_host', 'src_incl_db']
-            request_job.full_clean(exclude=exclude, validate_unique=False)
+            request_job.full_clean(exclude=exclude, validate_unique=False, context=context)
         except ValidationError as e:
             ajax_vars['dberrors'].update(e)
             return HttpResponse(json.dumps(ajax_vars), status=400, content_type='application/json')
@@ -64,17 +71,17 @@ def requestjob_checks_warning(request):
         #   All dbnames which match src_incl_db and retire all matching src_skip_dbs
         src_incl_filters = get_filters(request.POST.getlist('src_incl_db', []))
         src_skip_filters = get_filters(request.POST.getlist('src_skip_db', []))
-        excluded_schemas = get_excluded_schemas()
+        excluded_schemas = context.excluded_schemas()
         src_skip_db_set = excluded_schemas.union(src_skip_filters)
         logger.debug("src_incl_filters %s", src_incl_filters)
         logger.debug("src_skip_filters %s", src_skip_filters)
         logger.debug("src_skip_db_set %s", src_skip_db_set)
         try:
-            server_host = Host.objects.get(name=src_hostname, port=src_port)
-            src_db_set = get_database_set(hostname=src_hostname, port=src_port,
-                                          user=server_host.mysql_user,
-                                          incl_filters=src_incl_filters,
-                                          skip_filters=src_skip_db_set)
+            if context.host(src_hostname, src_port) is None:
+                raise ValueError("Host matching query does not exist: %s" % src_host)
+            src_db_set = context.database_set(src_hostname, src_port,
+                                              incl_filters=src_incl_filters,
+                                              skip_filters=src_skip_db_set)
             logger.debug("result_db_set %s", src_db_set)
             if (not src_db_set) and (src_incl_filters or src_skip_filters):
                 # only raise error if no match, but only if any filter specified
@@ -84,53 +91,59 @@ def requestjob_checks_warning(request):
             ajax_vars.update({'dberrors': {src_hostname: [str(e)]}})
             return HttpResponse(json.dumps(ajax_vars), status=400, content_type='application/json')
 
-        # 2. For each target:
+        # 2. For each target, concurrently:
         #   Retrieve all dbnames which match tgt_db_name
         #   Diff with src_dbames
         tgt_db_names = set(request.POST.getlist('tgt_db_name', [])).difference({""}) or src_db_set
-        for tgt_host in tgt_hosts:
-            tgt_hostname, tgt_port = tgt_host.split(':')
-            try:
-                logger.debug("tgt db names %s %s", tgt_hostname, tgt_db_names)
-                server_host = Host.objects.get(name=tgt_hostname, port=tgt_port)
-                tgt_db_set = get_database_set(hostname=tgt_hostname, port=tgt_port,
-                                              user=server_host.mysql_user,
+        incl_table_filter = get_filters(request.POST.getlist('src_incl_tables', []))
+        skip_table_filter = get_filters(request.POST.getlist('src_skip_tables', []))
+        targets = [tgt_host.split(':') for tgt_host in tgt_hosts]
+        context.prefetch_hosts(tgt_hostname for tgt_hostname, _ in targets)
+
+        def check_target(target):
+            tgt_hostname, tgt_port = target
+            if context.host(tgt_hostname, tgt_port) is None:
+                raise ValueError("Host matching query does not exist: %s:%s" % (tgt_hostname, tgt_port))
+            logger.debug("tgt db names %s %s", tgt_hostname, tgt_db_names)
+            tgt_db_set = context.database_set(tgt_hostname, tgt_port,
                                               incl_filters=tgt_db_names,
-                                              skip_filters=excluded_schemas)
-                logger.debug("Found on target %s", tgt_db_set)
-                if len(tgt_db_set) > 0:
-                    ajax_vars['dbwarnings'].update({tgt_hostname: list(sorted(tgt_db_set))})
-                    if len(tgt_db_set) == 1 and len(src_db_set) == 1:
-                        src_database = src_db_set.pop()
-                        tgt_database = tgt_db_set.pop()
-                        incl_table_filter = get_filters(request.POST.getlist('src_incl_tables', []))
-                        skip_table_filter = get_filters(request.POST.getlist('src_skip_tables', []))
-                        logger.debug('incl_table_filter %s tgt_db_set %s', incl_table_filter, tgt_db_set)
-                        try:
-                            logger.debug('src_db: %s:%s/%s, incl_table_filters: %s skip_table_filters: %s',
-                                         src_hostname, src_port, src_database, incl_table_filter, skip_table_filter)
-                            src_table_names = get_table_set(hostname=src_hostname, port=src_port,
-                                                            database=src_database,
-                                                            incl_filters=incl_table_filter,
-                                                            skip_filters=skip_table_filter)
-                            logger.debug('tgt_db: %s:%s/%s, incl_table_filters: %s',
-                                         tgt_hostname, tgt_port, tgt_database, src_table_names)
-                            tgt_table_names = get_table_set(hostname=tgt_hostname, port=tgt_port,
-                                                            database=tgt_database,
-                                                            incl_filters=src_table_names,
-                                                            skip_filters=skip_table_filter)
-                            logger.debug("tgt_table_names %s", tgt_table_names)
-                            if len(tgt_table_names) > 0:
-                                ajax_vars['tablewarnings'].update({tgt_database: sorted(tgt_table_names)})
-                        except Exception as e:
-                            # Error most likely raised when target db doesn't exists, this is no error!
-                            # TODO check the above statement twice!
-                            # ajax_vars['tableerrors'].update({host: [str(e)]})
-                            logger.error("Unable to fetch tables: %s", e)
-            except Exception as e:
-                logger.error("Inspect error %s", str(e))
-                ajax_vars['dberrors'].update({tgt_hostname: [str(e)]})
-            return HttpResponse(json.dumps(ajax_vars), status=400, content_type='application/json')
+                                              skip_filters=excluded_schemas,
+                                              fresh=True)
+            logger.debug("Found on target %s", tgt_db_set)
+            tgt_table_names = set()
+            if len(tgt_db_set) == 1 and len(src_db_set) == 1:
+                src_database = next(iter(src_db_set))
+                tgt_database = next(iter(tgt_db_set))
+                logger.debug('incl_table_filter %s tgt_db_set %s', incl_table_filter, tgt_db_set)
+                try:
+                    logger.debug('src_db: %s:%s/%s, incl_table_filters: %s skip_table_filters: %s',
+                                 src_hostname, src_port, src_database, incl_table_filter, skip_table_filter)
+                    src_table_names = context.table_set(src_hostname, src_port, src_database,
+                                                        incl_filters=incl_table_filter,
+                                                        skip_filters=skip_table_filter)
+                    logger.debug('tgt_db: %s:%s/%s, incl_table_filters: %s',
+                                 tgt_hostname, tgt_port, tgt_database, src_table_names)
+                    tgt_table_names = context.table_set(tgt_hostname, tgt_port, tgt_database,
+                                                        incl_filters=src_table_names,
+                                                        skip_filters=skip_table_filter,
+                                                        fresh=True)
+                    logger.debug("tgt_table_names %s", tgt_table_names)
+                except Exception as e:
+                    # Error most likely raised when target db doesn't exists, this is no error!
+                    # TODO check the above statement twice!
+                    logger.error("Unable to fetch tables: %s", e)
+            return tgt_db_set, tgt_table_names
+
+        for (tgt_hostname, tgt_port), result, error in fan_out(check_target, targets):
+            if error is not None:
+                logger.error("Inspect error %s", str(error))
+                ajax_vars['dberrors'].update({tgt_hostname: [str(error)]})
+                continue
+            tgt_db_set, tgt_table_names = result
+            if tgt_db_set:
+                ajax_vars['dbwarnings'].update({tgt_hostname: sorted(tgt_db_set)})
+            if tgt_table_names:
+                ajax_vars['tablewarnings'].update({next(iter(tgt_db_set)): sorted(tgt_table_names)})
 
     if len(ajax_vars['dberrors']) > 0 or len(ajax_vars['tableerrors']) > 0:
         status_code = 400